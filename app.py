@@ -7,6 +7,10 @@ Gradio多功能工具平台 - 模块化主应用
 作者: MiniMax Agent
 """
 
+import time
+
+_STARTUP_BEGIN = time.perf_counter()
+
 import gradio as gr
 import sys
 import os
@@ -20,18 +24,26 @@ from config import (
     APP_CONFIG, 
     MODULE_CATEGORIES, 
     CUSTOM_CSS,
-    MODULE_IMPORTS
+    MODULE_IMPORTS,
+    MODULE_LOADER_CONFIG,
+    QUEUE_CONFIG,
+    STATIC_ASSETS_CONFIG,
+    COMPRESSION_CONFIG,
+    IMAGE_API_CONFIG
 )
 
-# 导入各个功能模块
-from modules.photo_restoration import create_photo_restoration_interface
-from modules.photo_colorization import create_photo_colorization_interface
-from modules.image_enhancement import create_image_enhancement_interface
-from modules.video_processing import create_video_processing_interface
-from modules.document_processing import create_document_processing_interface
-from modules.image_tools import create_image_tools_interface
-from modules.video_tools import create_video_tools_interface
-from modules.navigation import create_navigation_interface
+# 功能模块由加载器按配置导入
+from modules.module_loader import ModuleLoader
+from modules.system_monitor import get_system_sampler, render_sparkline
+from modules.metrics import REGISTRY as METRICS_REGISTRY, create_metrics_routes
+from modules.profiling import PROFILER
+from modules.queue_config import event_options, total_concurrency
+from modules.result_cache import RESULT_CACHE
+from modules.request_coalescing import SINGLE_FLIGHT
+from modules.batching import batcher_stats
+from modules.compression import create_compression_middleware
+from modules.image_api import create_image_api_routes
+from modules.static_assets import create_asset_routes, file_fingerprint, fingerprint, get_asset_cache
 
 class ModularGradioApp:
     """模块化Gradio应用管理器"""
@@ -41,21 +53,25 @@ class ModularGradioApp:
         self.module_categories = MODULE_CATEGORIES
         self.custom_css = CUSTOM_CSS
         
-        # 模块接口映射
-        self.module_interfaces = {
-            "photo_restoration": create_photo_restoration_interface,
-            "photo_colorization": create_photo_colorization_interface,
-            "image_enhancement": create_image_enhancement_interface,
-            "video_processing": create_video_processing_interface,
-            "document_processing": create_document_processing_interface,
-            "image_tools": create_image_tools_interface,
-            "video_tools": create_video_tools_interface,
-            "navigation": create_navigation_interface
-        }
+        # 模块加载器（按MODULE_IMPORTS顺序构建标签页）
+        self.module_loader = ModuleLoader(
+            MODULE_IMPORTS,
+            lazy=MODULE_LOADER_CONFIG.get("lazy_imports", True)
+        )
         
-    def create_header(self) -> gr.HTML:
-        """创建应用头部"""
-        header_html = f"""
+        # 后台系统状态采样（刷新状态时直接读取快照）
+        self.system_sampler = get_system_sampler()
+        
+        # 静态内容的预编译缓存：模板写在本文件中，来源指纹包含本文件内容和应用配置
+        self.assets = get_asset_cache(
+            cache_dir=STATIC_ASSETS_CONFIG["cache_dir"],
+            compress_min_size=STATIC_ASSETS_CONFIG["compress_min_size"]
+        )
+        self.asset_source = fingerprint(file_fingerprint(os.path.abspath(__file__)), self.app_config)
+        
+    def render_header(self) -> str:
+        """渲染应用头部HTML"""
+        return f"""
         <div style="text-align: center; margin: 30px 0;">
             <h1 class="main-title">{self.app_config['title']}</h1>
             {self.app_config['description']}
@@ -67,11 +83,14 @@ class ModularGradioApp:
             </div>
         </div>
         """
-        return gr.HTML(header_html)
     
-    def create_footer(self) -> gr.HTML:
-        """创建应用底部"""
-        footer_html = """
+    def create_header(self) -> gr.HTML:
+        """创建应用头部"""
+        return gr.HTML(self.assets.text("header", self.asset_source, self.render_header))
+    
+    def render_footer(self) -> str:
+        """渲染应用底部HTML"""
+        return """
         <div style="text-align: center; margin: 30px 0; padding: 20px; 
                     background: #f8fafc; border-radius: 12px; border-top: 3px solid #3b82f6;">
             <p style="color: #64748b; margin: 0; font-size: 0.9em;">
@@ -82,14 +101,26 @@ class ModularGradioApp:
             </p>
         </div>
         """
-        return gr.HTML(footer_html)
+    
+    def create_footer(self) -> gr.HTML:
+        """创建应用底部"""
+        return gr.HTML(self.assets.text("footer", self.asset_source, self.render_footer))
     
     def build_interface(self) -> gr.Blocks:
         """构建完整的用户界面"""
+        build_start = time.perf_counter()
+        
+        # CSS以带版本号的外链样式表加载：页面中不再内联，浏览器可长期缓存
+        css_asset = self.assets.get("custom-css", fingerprint(self.custom_css), lambda: self.custom_css, suffix=".css")
+        if STATIC_ASSETS_CONFIG["external_css"]:
+            style_kwargs = {"head": f'<link rel="stylesheet" href="{css_asset["url"]}">'}
+        else:
+            style_kwargs = {"css": css_asset["content"]}
+        
         with gr.Blocks(
             title=self.app_config["title"],
             theme=gr.themes.Soft(),
-            css=self.custom_css
+            **style_kwargs
         ) as app:
             
             # 应用头部
@@ -98,29 +129,9 @@ class ModularGradioApp:
             # 主要功能标签页
             with gr.Tabs() as main_tabs:
                 
-                # 老照片修复
-                self.module_interfaces["photo_restoration"]()
-
-                # 照片上色
-                self.module_interfaces["photo_colorization"]()
-
-                # 高清放大
-                self.module_interfaces["image_enhancement"]()
-
-                # 视频处理模块
-                self.module_interfaces["video_processing"]()
-
-                # 文档处理模块
-                self.module_interfaces["document_processing"]()
-                
-                # 图像工具模块
-                self.module_interfaces["image_tools"]()
-                
-                # 视频工具模块
-                self.module_interfaces["video_tools"]()
-                
-                # 平台导航模块
-                self.module_interfaces["navigation"]()
+                # 按配置顺序加载各功能模块（导入失败的模块显示为错误提示标签页）
+                for module_key in self.module_loader.enabled_modules():
+                    self.module_loader.get_factory(module_key)()
                 
                 # 系统信息和帮助
                 with gr.Tab("ℹ️ 系统信息"):
@@ -128,12 +139,15 @@ class ModularGradioApp:
             
             # 应用底部
             self.create_footer()
-            
+        
+        # 清理来源变化后不再引用的旧版本资源
+        self.assets.prune()
+        self.module_loader.build_time = time.perf_counter() - build_start
         return app
     
-    def create_system_info(self):
-        """创建系统信息页面"""
-        gr.Markdown("""
+    def render_system_info(self) -> str:
+        """系统信息页面的说明文档（Markdown）"""
+        return """
         ## 📊 系统信息
         
         ### 🏗️ 架构设计
@@ -214,29 +228,48 @@ class ModularGradioApp:
         - 自动错误恢复机制
         - 完整的异常处理
         - 优雅的降级策略
-        """)
+        """
+    
+    def create_system_info(self):
+        """创建系统信息页面"""
+        gr.Markdown(self.assets.text("system-info", self.asset_source, self.render_system_info, suffix=".md"))
         
         # 实时状态显示
         with gr.Accordion("🔍 实时状态", open=False):
-            status_info = gr.HTML(self.get_system_status())
+            # 传入函数而非字符串，每次页面加载时读取最新快照
+            status_info = gr.HTML(self.get_system_status)
             
             refresh_btn = gr.Button("🔄 刷新状态", variant="secondary")
             refresh_btn.click(
                 fn=self.get_system_status,
-                outputs=[status_info]
+                outputs=[status_info],
+                **event_options("html")
             )
     
     def get_system_status(self) -> str:
-        """获取系统状态信息"""
-        import psutil
-        import time
+        """获取系统状态信息（读取后台采样器的最新快照，不阻塞）"""
         from datetime import datetime
         
         try:
-            # 系统资源信息
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            sampler = self.system_sampler
+            snapshot = sampler.latest()
+            if snapshot is None:
+                return """
+                <div style="background: #f8fafc; padding: 15px; border-radius: 8px; color: #64748b;">
+                    ⏳ 正在采集系统状态，请稍后刷新
+                </div>
+                """
+            
+            cpu_trend = render_sparkline(sampler.series("cpu_percent"), maximum=100)
+            memory_trend = render_sparkline(sampler.series("memory_percent"), maximum=100)
+            rss_trend = render_sparkline(sampler.series("process_rss"))
+            open_files = snapshot["process_open_files"]
+            metrics = METRICS_REGISTRY.summary()
+            cache = RESULT_CACHE.get_stats()
+            batching = " | ".join(
+                f"{name} {stats['batches']} 批 / 平均 {stats['avg_batch']:.1f} / 最大 {stats['max_batch']}"
+                for name, stats in batcher_stats().items()
+            ) or "暂无模型推理"
             
             status_html = f"""
             <div style="background: #f8fafc; padding: 20px; border-radius: 12px; margin: 10px 0;">
@@ -244,24 +277,41 @@ class ModularGradioApp:
                 <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px;">
                     <div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #10b981;">
                         <strong style="color: #10b981;">CPU使用率</strong><br>
-                        <span style="font-size: 1.2em;">{cpu_percent}%</span>
+                        <span style="font-size: 1.2em;">{snapshot['cpu_percent']}%</span><br>
+                        <small style="font-family: monospace;">{cpu_trend}</small>
                     </div>
                     <div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #3b82f6;">
                         <strong style="color: #3b82f6;">内存使用</strong><br>
-                        <span style="font-size: 1.2em;">{memory.percent}%</span><br>
-                        <small>{memory.used//1024//1024}MB / {memory.total//1024//1024}MB</small>
+                        <span style="font-size: 1.2em;">{snapshot['memory_percent']}%</span><br>
+                        <small>{snapshot['memory_used']//1024//1024}MB / {snapshot['memory_total']//1024//1024}MB</small><br>
+                        <small style="font-family: monospace;">{memory_trend}</small>
                     </div>
                     <div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #f59e0b;">
                         <strong style="color: #f59e0b;">磁盘使用</strong><br>
-                        <span style="font-size: 1.2em;">{disk.percent}%</span><br>
-                        <small>{disk.used//1024//1024//1024}GB / {disk.total//1024//1024//1024}GB</small>
+                        <span style="font-size: 1.2em;">{snapshot['disk_percent']}%</span><br>
+                        <small>{snapshot['disk_used']//1024//1024//1024}GB / {snapshot['disk_total']//1024//1024//1024}GB</small>
+                    </div>
+                    <div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #8b5cf6;">
+                        <strong style="color: #8b5cf6;">应用进程</strong><br>
+                        <span style="font-size: 1.2em;">{snapshot['process_rss']//1024//1024}MB</span><br>
+                        <small>线程 {snapshot['process_threads']} | 打开文件 {open_files if open_files >= 0 else '未知'}</small><br>
+                        <small style="font-family: monospace;">{rss_trend}</small>
                     </div>
                 </div>
                 
                 <div style="margin-top: 15px; padding: 10px; background: white; border-radius: 8px;">
-                    <strong>📅 更新时间：</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}<br>
+                    <strong>📅 采样时间：</strong> {datetime.fromtimestamp(snapshot['timestamp']).strftime('%Y-%m-%d %H:%M:%S')}<br>
                     <strong>🏃 运行时长：</strong> 系统正常运行中<br>
-                    <strong>📦 加载模块：</strong> {len(self.module_interfaces)} 个模块已加载<br>
+                    <strong>📦 加载模块：</strong> {len(self.module_loader.loaded_modules)} 个模块已加载<br>
+                    <strong>⚡ 处理统计：</strong> {int(metrics['calls'])} 次调用 | 平均耗时 {metrics['avg_seconds']*1000:.1f} ms | 
+                    错误率 {metrics['error_rate']*100:.1f}% | 处理中 {int(metrics['in_flight'])}（详见 <a href="/metrics" target="_blank">/metrics</a>）<br>
+                    <strong>🗃️ 结果缓存：</strong> 命中率 {cache['hit_rate']*100:.1f}% | 
+                    命中 {cache['memory_hits']}（内存）/ {cache['disk_hits']}（磁盘）| 未命中 {cache['misses']} | 
+                    淘汰 {cache['memory_evictions']}（内存）/ {cache['disk_evictions']}（磁盘）| 
+                    占用 {cache['memory_bytes']//1024//1024}MB（内存）/ {cache['disk_bytes']//1024//1024}MB（磁盘）<br>
+                    <strong>🔗 请求合并：</strong> 实际计算 {SINGLE_FLIGHT.stats['executions']} 次 | 
+                    合并重复请求 {SINGLE_FLIGHT.stats['coalesced']} 次 | 进行中 {SINGLE_FLIGHT.in_flight()}<br>
+                    <strong>📦 推理合批：</strong> {batching}<br>
                     <strong>🔧 架构版本：</strong> 模块化架构 v1.0.0
                 </div>
             </div>
@@ -276,8 +326,21 @@ class ModularGradioApp:
             </div>
             """
     
-    def launch(self, **kwargs):
-        """启动应用"""
+    def build_app_kwargs(self, app_kwargs: Dict[str, Any] = None) -> Dict[str, Any]:
+        """组装传给底层FastAPI应用的参数，挂载 /metrics、/static-assets、/api/image 等附加路由和响应压缩中间件"""
+        app_kwargs = dict(app_kwargs or {})
+        app_kwargs["routes"] = (list(app_kwargs.get("routes", [])) + create_metrics_routes()
+                                + create_asset_routes(self.assets)
+                                + create_image_api_routes(**IMAGE_API_CONFIG))
+        app_kwargs["middleware"] = (list(app_kwargs.get("middleware", []))
+                                    + create_compression_middleware(**COMPRESSION_CONFIG))
+        return app_kwargs
+    
+    def launch(self, profile_requests: bool = None, **kwargs):
+        """启动应用（profile_requests=True 时对每次处理进行采样分析）"""
+        if profile_requests is not None:
+            PROFILER.enabled = profile_requests
+        
         app = self.build_interface()
         
         # 默认启动参数
@@ -292,13 +355,21 @@ class ModularGradioApp:
         
         # 合并用户自定义参数
         launch_kwargs = {**default_kwargs, **kwargs}
+        launch_kwargs["app_kwargs"] = self.build_app_kwargs(launch_kwargs.get("app_kwargs"))
+        # 工作线程数需覆盖各类别并发上限之和，否则线程池会成为共享瓶颈
+        launch_kwargs.setdefault("max_threads", max(40, total_concurrency() + 8))
+        
+        app.queue(
+            default_concurrency_limit=QUEUE_CONFIG["default_concurrency_limit"],
+            max_size=QUEUE_CONFIG["max_size"]
+        )
         
         print(f"""
 🚀 启动Gradio多功能工具平台 - 模块化版本
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 📊 架构信息:
    • 架构类型: 分离式模块化设计
-   • 模块数量: {len(self.module_interfaces)} 个
+   • 模块数量: {len(self.module_loader.loaded_modules)} 个
    • 配置驱动: config.py
    • 扩展支持: ✅
 
@@ -307,10 +378,18 @@ class ModularGradioApp:
    • 后端语言: Python {sys.version.split()[0]}
    • 架构设计: ComfyUI风格模块化
 
+⏱️ 启动耗时:
+   • 进程启动至界面就绪: {(time.perf_counter() - _STARTUP_BEGIN) * 1000:.1f} ms
+{self.module_loader.format_import_report()}
+
 🌐 访问信息:
    • 本地地址: http://localhost:{launch_kwargs['server_port']}
    • 网络地址: http://{launch_kwargs['server_name']}:{launch_kwargs['server_port']}
    • 公开分享: {'是' if launch_kwargs['share'] else '否'}
+   • 性能指标: http://localhost:{launch_kwargs['server_port']}/metrics
+   • 图像接口: {f"http://localhost:{launch_kwargs['server_port']}{IMAGE_API_CONFIG['prefix']}（需要令牌）" if IMAGE_API_CONFIG['enabled'] and IMAGE_API_CONFIG['api_token'] else '未开启'}
+   • 请求分析: {'已开启' if PROFILER.enabled else '未开启'}
+   • 并发配置: {', '.join(f"{name}={opts.get('concurrency_limit', '不排队')}" for name, opts in QUEUE_CONFIG['categories'].items())}
 
 📁 文件结构:
    • 主程序: app.py
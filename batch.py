@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gradio多功能工具平台 - 命令行批处理
+不启动Web界面，对文件、目录或通配符匹配的文件批量执行图像工具的操作（适合cron定时运行）。
+多进程并行；每处理完一个文件向清单追加一条记录，中断后重新运行即从清单继续：
+输出文件未被改动、参数相同且输入未变化（修改时间相同，或修改时间变了但内容哈希相同）的文件直接跳过。
+只导入图像处理需要的模块，不导入gradio。
+视频工具的各操作目前是演示实现（等待后返回原文件，不生成处理结果），实现前不提供 video 子命令
+创建时间: 2025-06-19
+
+用法:
+    python batch.py image resize "photos/**/*.jpg" -o out -p width=800 -p height=600 --jobs 4
+    python batch.py image pipeline photos -r -o out --steps '[{"op": "resize", "width": 800, "height": 600}, {"op": "compress", "quality": 80}]'
+    python batch.py image list
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from modules.content_hash import file_fingerprint
+from modules.image_codec import FILE_EXTENSIONS
+from modules.image_pipeline import (
+    OPERATIONS as IMAGE_OPERATIONS, PipelineError, describe_operations, output_encoding, parse_params,
+    parse_steps, process_bytes
+)
+
+# 目录输入时按扩展名筛选（文件和通配符输入不筛选）
+INPUT_EXTENSIONS = {
+    "image": {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+}
+
+_FORMAT_BY_EXTENSION = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+DEFAULT_MANIFEST = ".batch_manifest.jsonl"
+
+
+def _is_pattern(text: str) -> bool:
+    return any(char in text for char in "*?[")
+
+
+def expand_inputs(inputs: Iterable[str], recursive: bool, extensions: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """展开输入，产出 (文件路径, 相对路径)；相对路径用于在输出目录中保持目录结构"""
+    extensions = set(extensions)
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                if not recursive:
+                    dirs.clear()
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in extensions:
+                        path = os.path.join(root, name)
+                        yield path, os.path.relpath(path, item)
+        elif _is_pattern(item):
+            # 通配符之前的目录部分作为相对路径的起点
+            parts = item.replace("\\", "/").split("/")
+            base_parts = []
+            for part in parts[:-1]:
+                if _is_pattern(part):
+                    break
+                base_parts.append(part)
+            base = "/".join(base_parts) or "."
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isfile(path):
+                    yield path, os.path.relpath(path, base)
+        elif os.path.isfile(item):
+            yield item, os.path.basename(item)
+        else:
+            print(f"⚠️ 输入不存在: {item}", file=sys.stderr)
+
+
+def build_job(args) -> Dict[str, Any]:
+    """由命令行参数生成任务描述（参数已校验并转换类型）"""
+    values = {}
+    for item in args.param:
+        key, separator, value = item.partition("=")
+        if not separator:
+            raise PipelineError(f"参数格式应为 KEY=VALUE: {item}")
+        values[key.strip()] = value
+
+    job = {"tool": args.tool, "operation": args.operation}
+    if args.operation == "pipeline":
+        if not args.steps:
+            raise PipelineError("pipeline 需要 --steps")
+        steps = args.steps
+        if steps.startswith("@"):
+            with open(steps[1:], encoding="utf-8") as f:
+                steps = f.read()
+        job["steps"] = parse_steps(steps, max_steps=1000)
+    else:
+        job["steps"] = [(args.operation, parse_params(args.operation, values))]
+    job["output_format"] = args.output_format
+    job["quality"] = args.quality
+    return job
+
+
+def job_fingerprint(job: Dict[str, Any]) -> str:
+    """任务指纹：操作或参数变化时已有输出视为过期"""
+    return hashlib.sha1(json.dumps(job, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def output_extension(job: Dict[str, Any], input_path: str) -> Tuple[str, str]:
+    """输出文件扩展名和图像输出格式"""
+    extension = os.path.splitext(input_path)[1].lower()
+    image_format = job["output_format"] or output_encoding(job["steps"], _FORMAT_BY_EXTENSION.get(extension))[0]
+    return FILE_EXTENSIONS[image_format], image_format
+
+
+class BatchManifest:
+    """处理清单：JSON Lines，每处理完一个文件追加一条（同一输出的后一条覆盖前一条），中断后已写入的记录不会丢失"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程被强制结束时最后一行可能不完整
+                        continue
+                    self.entries[entry["output"]] = entry
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def get(self, output: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(output)
+
+    def record(self, entry: Dict[str, Any]):
+        self.entries[entry["output"]] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self, compact: bool = False):
+        """关闭清单；compact=True 时只保留每个输出的最新记录"""
+        self._file.close()
+        if compact:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+
+
+def check_up_to_date(entry: Optional[Dict[str, Any]], input_path: str, job_id: str) -> Optional[Dict[str, Any]]:
+    """输出是否已是最新：是则返回（可能更新了输入修改时间的）清单记录，否则返回None"""
+    if entry is None or entry.get("status") != "done" or entry.get("job") != job_id or entry.get("input") != input_path:
+        return None
+    if entry.get("output_size") is not None:
+        try:
+            output_stat = os.stat(entry["output"])
+        except OSError:
+            return None
+        if (output_stat.st_size, output_stat.st_mtime_ns) != (entry["output_size"], entry["output_mtime_ns"]):
+            return None
+    try:
+        input_stat = os.stat(input_path)
+    except OSError:
+        return None
+    if (input_stat.st_size, input_stat.st_mtime_ns) == (entry["input_size"], entry["input_mtime_ns"]):
+        return entry
+    if input_stat.st_size != entry["input_size"]:
+        return None
+    # 只有修改时间变化（如重新拷贝、touch）时比较内容哈希
+    if file_fingerprint(input_path) != entry["input_hash"]:
+        return None
+    return dict(entry, input_mtime_ns=input_stat.st_mtime_ns)
+
+
+# 子进程中的处理器（每个进程创建一次）
+_processor = None
+
+
+def _init_worker(tool: str):
+    global _processor
+    # 批处理结果直接写入输出目录，不再写入界面使用的处理结果缓存
+    from config import RESULT_CACHE_CONFIG
+    RESULT_CACHE_CONFIG["enabled"] = False
+    from modules.image_tools import ImageToolProcessor
+    _processor = ImageToolProcessor()
+
+
+def _replace_atomic(output: str, data: bytes):
+    """先写临时文件再替换，中断时不会留下不完整的输出"""
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def run_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """处理一个文件，返回清单记录（在子进程中执行）"""
+    start = time.perf_counter()
+    entry = {"input": task["input"], "output": task["output"], "job": task["job_id"],
+             "status": "done", "error": "", "output_size": None, "output_mtime_ns": None}
+    input_stat = os.stat(task["input"])
+    entry.update(input_size=input_stat.st_size, input_mtime_ns=input_stat.st_mtime_ns)
+    try:
+        with open(task["input"], "rb") as f:
+            data = f.read()
+        body, _, _ = process_bytes(_processor, data, task["steps"], task["image_format"], task["quality"])
+        _replace_atomic(task["output"], body)
+        output_stat = os.stat(task["output"])
+        entry.update(output_size=output_stat.st_size, output_mtime_ns=output_stat.st_mtime_ns)
+        entry["input_hash"] = file_fingerprint(task["input"])
+    except PipelineError as e:
+        entry.update(status="failed", error=str(e))
+    except Exception as e:
+        # 单个文件失败不影响其他文件，下次运行会重试
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+    entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    entry["finished_at"] = time.time()
+    return entry
+
+
+def _iter_results(tasks: List[Dict[str, Any]], tool: str, jobs: int) -> Iterator[Dict[str, Any]]:
+    if jobs <= 1 or len(tasks) <= 1:
+        _init_worker(tool)
+        for task in tasks:
+            yield run_task(task)
+        return
+    executor = ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), initializer=_init_worker, initargs=(tool,))
+    try:
+        futures = [executor.submit(run_task, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def run_batch(args) -> int:
+    """执行批处理，返回进程退出码（有失败文件时为1）"""
+    try:
+        job = build_job(args)
+    except (PipelineError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    job_id = job_fingerprint(job)
+    output_dir = os.path.abspath(args.output_dir)
+    manifest = BatchManifest(args.manifest or os.path.join(output_dir, DEFAULT_MANIFEST))
+
+    tasks = []
+    planned = set()
+    skipped = 0
+    for path, relative in expand_inputs(args.inputs, args.recursive, INPUT_EXTENSIONS[args.tool]):
+        path = os.path.abspath(path)
+        extension, image_format = output_extension(job, path)
+        output = os.path.join(output_dir, os.path.splitext(relative)[0] + extension)
+        if output in planned or output == path:
+            print(f"⚠️ 跳过 {path}：输出 {output} 与其他文件冲突", file=sys.stderr)
+            continue
+        planned.add(output)
+        if not args.force:
+            entry = check_up_to_date(manifest.get(output), path, job_id)
+            if entry is not None:
+                skipped += 1
+                if entry is not manifest.get(output):
+                    manifest.record(entry)
+                continue
+        tasks.append({"tool": args.tool, "operation": args.operation, "job_id": job_id, "input": path,
+                      "output": output, "steps": job["steps"], "image_format": image_format,
+                      "quality": job["quality"]})
+
+    print(f"共 {len(tasks) + skipped} 个文件：{skipped} 个已是最新，{len(tasks)} 个待处理")
+    if args.dry_run:
+        for task in tasks:
+            print(f"  {task['input']} -> {task['output']}")
+        manifest.close()
+        return 0
+
+    start = time.perf_counter()
+    done = failed = 0
+    try:
+        for index, entry in enumerate(_iter_results(tasks, args.tool, args.jobs or os.cpu_count() or 1), 1):
+            manifest.record(entry)
+            if entry["status"] == "done":
+                done += 1
+                if not args.quiet:
+                    print(f"[{index}/{len(tasks)}] ✅ {entry['input']} -> {entry['output']} ({entry['elapsed_ms']:.0f} ms)")
+            else:
+                failed += 1
+                print(f"[{index}/{len(tasks)}] ❌ {entry['input']}: {entry['error']}", file=sys.stderr)
+    except KeyboardInterrupt:
+        manifest.close()
+        print(f"\n已中断：完成 {done} 个，重新运行相同命令将从清单继续", file=sys.stderr)
+        return 130
+    manifest.close(compact=True)
+
+    elapsed = time.perf_counter() - start
+    rate = f"，{done / elapsed:.1f} 个/秒" if elapsed > 0 and done else ""
+    print(f"完成 {done} 个，失败 {failed} 个，跳过 {skipped} 个，耗时 {elapsed:.1f} 秒{rate}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图像工具命令行批处理（不启动Web界面）")
+    subparsers = parser.add_subparsers(dest="tool", required=True)
+
+    for tool, operations, help_text in (
+        ("image", list(IMAGE_OPERATIONS) + ["pipeline"], "图像工具"),
+    ):
+        tool_parser = subparsers.add_parser(tool, help=help_text)
+        tool_parser.add_argument("operation", choices=operations + ["list"], help="操作（list 列出各操作的参数）")
+        tool_parser.add_argument("inputs", nargs="*", help='输入文件、目录或通配符（如 "photos/**/*.jpg"，需加引号）')
+        tool_parser.add_argument("-o", "--output-dir", help="输出目录（保持输入的相对目录结构）")
+        tool_parser.add_argument("-r", "--recursive", action="store_true", help="递归处理输入目录的子目录")
+        tool_parser.add_argument("-p", "--param", action="append", default=[], metavar="KEY=VALUE",
+                                 help="操作参数，可重复（如 -p width=800）")
+        tool_parser.add_argument("-j", "--jobs", type=int, default=1, help="并行进程数（0为CPU核数）")
+        tool_parser.add_argument("--manifest", help=f"处理清单路径（默认为输出目录下的 {DEFAULT_MANIFEST}）")
+        tool_parser.add_argument("--force", action="store_true", help="忽略清单，全部重新处理")
+        tool_parser.add_argument("--dry-run", action="store_true", help="只列出待处理的文件")
+        tool_parser.add_argument("-q", "--quiet", action="store_true", help="只输出失败的文件和汇总")
+        tool_parser.add_argument("--steps", help="pipeline 的步骤：JSON数组或 @文件路径")
+        tool_parser.add_argument("--output-format", type=str.upper, choices=list(FILE_EXTENSIONS),
+                                 help="输出格式（默认由压缩/格式转换步骤或原图格式决定）")
+        tool_parser.add_argument("--quality", type=int, help="输出编码质量")
+
+    args = parser.parse_args()
+    if args.operation == "list":
+        print(json.dumps(describe_operations(), ensure_ascii=False, indent=2))
+        return
+    if not args.inputs or not args.output_dir:
+        parser.error("需要指定输入和 -o/--output-dir")
+    sys.exit(run_batch(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gradio多功能工具平台 - 性能基准脚本
+各子命令对应一项性能测试，结果以文本表格输出
+创建时间: 2025-06-19
+
+用法:
+    python benchmark.py queue --url http://localhost:7860
+    python benchmark.py colorize --model models/colorizer.onnx
+    python benchmark.py models --model models/colorizer.onnx
+    python benchmark.py convert --pages 100
+    python benchmark.py wire --url http://localhost:7860
+"""
+
+import argparse
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def format_latency_table(results: Dict[str, List[float]]) -> str:
+    """输出各操作的延迟分位数表格"""
+    lines = [f"{'操作':<20}{'次数':>6}{'p50(ms)':>12}{'p90(ms)':>12}{'p99(ms)':>12}"]
+    for name, latencies in results.items():
+        lines.append(
+            f"{name:<20}{len(latencies):>6}"
+            f"{percentile(latencies, 50) * 1000:>12.1f}"
+            f"{percentile(latencies, 90) * 1000:>12.1f}"
+            f"{percentile(latencies, 99) * 1000:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def run_queue_benchmark(args):
+    """队列隔离测试：持续提交慢速视频压缩的同时测量滤镜请求的延迟"""
+    from gradio_client import Client, handle_file
+    from PIL import Image
+
+    work_dir = tempfile.mkdtemp(prefix="chainsuite_bench_")
+    image_path = os.path.join(work_dir, "sample.png")
+    Image.new("RGB", (640, 480), (120, 160, 200)).save(image_path)
+    video_path = os.path.join(work_dir, "sample.mp4")
+    with open(video_path, "wb") as f:
+        f.write(os.urandom(1024 * 1024))
+
+    results: Dict[str, List[float]] = {"apply_filter": [], "compress_video": []}
+    results_lock = threading.Lock()
+
+    def call(api_name: str, *call_args):
+        client = Client(args.url, verbose=False)
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            client.predict(*call_args, api_name=f"/{api_name}")
+            with results_lock:
+                results[api_name].append(time.perf_counter() - start)
+
+    threads = [
+        threading.Thread(target=call, args=("compress_video", handle_file(video_path), "中等质量"))
+        for _ in range(args.video_clients)
+    ]
+    # 先让视频请求占满队列，再开始测量滤镜请求
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+    filter_threads = [
+        threading.Thread(target=call, args=("apply_filter", handle_file(image_path), "模糊"))
+        for _ in range(args.image_clients)
+    ]
+    for thread in filter_threads:
+        thread.start()
+    for thread in threads + filter_threads:
+        thread.join()
+
+    print(f"视频并发客户端: {args.video_clients} | 图像并发客户端: {args.image_clients} | 每客户端请求: {args.requests}")
+    print(format_latency_table(results))
+
+
+def run_colorize_benchmark(args):
+    """图片上色吞吐测试：不同输入尺寸和并发数下的每秒处理张数"""
+    from concurrent.futures import ThreadPoolExecutor
+    from PIL import Image
+    from config import PHOTO_COLORIZATION_CONFIG
+    from modules.photo_colorization import PhotoColorizationProcessor
+
+    if args.model:
+        PHOTO_COLORIZATION_CONFIG["engine"]["model_path"] = args.model
+    processor = PhotoColorizationProcessor()
+    pool = processor._pool()
+    if pool is None:
+        print("❌ 请通过 --model 指定ONNX上色模型，或在 config.py 中配置模型路径")
+        return
+    pool.prewarm()
+
+    print(f"{'输入尺寸':<14}{'并发':>6}{'批大小':>8}{'张/秒':>10}{'平均延迟(ms)':>16}")
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        image = Image.new("L", (width, height), 128).convert("RGB")
+        for concurrency in args.concurrency:
+            latencies = []
+
+            def work(_):
+                start = time.perf_counter()
+                processor.colorize_batch([image] * args.batch)
+                latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(work, range(args.iterations)))
+            elapsed = time.perf_counter() - start
+            throughput = args.iterations * args.batch / elapsed
+            print(f"{size:<14}{concurrency:>6}{args.batch:>8}{throughput:>10.2f}"
+                  f"{sum(latencies) / len(latencies) * 1000:>16.1f}")
+
+
+def _model_worker(model_path: str, mmap_weights: bool, loaded, results):
+    """子进程：加载模型并推理一次，所有进程都加载完成后再统计内存"""
+    import numpy as np
+    from modules.inference import create_onnx_session
+    from modules.model_registry import MODEL_REGISTRY, process_memory
+
+    MODEL_REGISTRY.mmap_weights = mmap_weights
+    session = create_onnx_session(model_path)
+    feeds = {
+        meta.name: np.zeros([dim if isinstance(dim, int) and dim > 0 else (1 if index == 0 else 64)
+                             for index, dim in enumerate(meta.shape)], dtype=np.float32)
+        for meta in session.get_inputs()
+    }
+    session.run(None, feeds)
+    loaded.wait()
+    results.put(process_memory())
+    loaded.wait()
+
+
+def run_models_benchmark(args):
+    """模型内存测试：1/2/4个工作进程同时加载同一模型时每个进程的内存占用"""
+    import multiprocessing
+    from modules.model_registry import MODEL_REGISTRY
+
+    model_path = args.model
+    if not model_path:
+        from config import IMAGE_ENHANCEMENT_CONFIG, PHOTO_COLORIZATION_CONFIG, PHOTO_RESTORATION_CONFIG
+        model_path = next((config["engine"]["model_path"] for config in (
+            PHOTO_RESTORATION_CONFIG, PHOTO_COLORIZATION_CONFIG, IMAGE_ENHANCEMENT_CONFIG
+        ) if config["engine"]["model_path"]), None)
+    if not model_path:
+        print("❌ 请通过 --model 指定ONNX模型，或在 config.py 中配置模型路径")
+        return
+    # 在父进程中完成转换，避免子进程同时转换
+    MODEL_REGISTRY.resolve(model_path)
+
+    context = multiprocessing.get_context("spawn")
+    mib = 1024 * 1024
+    print(f"{'加载方式':<10}{'进程数':>8}{'RSS/进程(MB)':>16}{'PSS/进程(MB)':>16}{'共享/进程(MB)':>16}{'PSS合计(MB)':>14}")
+    for mmap_weights in (False, True):
+        for workers in args.workers:
+            loaded = context.Barrier(workers + 1)
+            results = context.Queue()
+            processes = [
+                context.Process(target=_model_worker, args=(model_path, mmap_weights, loaded, results))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            loaded.wait()
+            memory = [results.get() for _ in range(workers)]
+            loaded.wait()
+            for process in processes:
+                process.join()
+
+            rss = sum(item["rss"] for item in memory) / workers / mib
+            pss = sum(item["pss"] for item in memory) / mib
+            shared = sum(item["shared"] for item in memory) / workers / mib
+            print(f"{'mmap' if mmap_weights else '复制':<10}{workers:>8}{rss:>16.1f}"
+                  f"{pss / workers:>16.1f}{shared:>16.1f}{pss:>14.1f}")
+
+
+def run_convert_benchmark(args):
+    """PDF转换吞吐测试：图片合并PDF（JPEG直接嵌入 vs PNG重新编码）和PDF转JPEG/WEBP"""
+    import shutil
+    from PIL import Image, ImageDraw
+    from modules import pdf_engine
+    from modules.pdf_writer import iter_images_to_pdf
+
+    width, height = (int(v) for v in args.size.split("x"))
+    work_dir = tempfile.mkdtemp(prefix="chainsuite_convert_")
+    try:
+        # 生成带内容的测试页，避免纯色图像的编码速度失真
+        sources = {"JPEG": [], "PNG": []}
+        for index in range(args.pages):
+            image = Image.new("RGB", (width, height), (250, 250, 245))
+            draw = ImageDraw.Draw(image)
+            for line in range(0, height, 40):
+                draw.text((60, line), f"Page {index + 1} line {line // 40} " * 4, fill=(20, 20, 20))
+            for image_format, extension in (("JPEG", ".jpg"), ("PNG", ".png")):
+                path = os.path.join(work_dir, f"page_{index:04d}{extension}")
+                image.save(path, format=image_format, quality=args.quality)
+                sources[image_format].append(path)
+
+        mib = 1024 * 1024
+        print(f"{'操作':<26}{'页数':>6}{'页/秒':>10}{'输出(MB)':>12}{'耗时(s)':>10}")
+        for image_format, paths in sources.items():
+            output_path = os.path.join(work_dir, f"merged_{image_format.lower()}.pdf")
+            start = time.perf_counter()
+            for _ in iter_images_to_pdf(paths, output_path, quality=args.quality, workers=args.workers):
+                pass
+            elapsed = time.perf_counter() - start
+            print(f"{'图片合并PDF（' + image_format + '输入）':<26}{len(paths):>6}{len(paths) / elapsed:>10.1f}"
+                  f"{os.path.getsize(output_path) / mib:>12.2f}{elapsed:>10.2f}")
+
+        if not pdf_engine.pymupdf_available():
+            print("未安装PyMuPDF，跳过PDF转图片测试")
+            return
+        merged = os.path.join(work_dir, "merged_jpeg.pdf")
+        for image_format in ("JPEG", "WEBP"):
+            output_dir = os.path.join(work_dir, image_format.lower())
+            os.makedirs(output_dir)
+            start = time.perf_counter()
+            paths = [path for _, _, path in pdf_engine.iter_rendered_pages(
+                merged, args.dpi, output_dir, image_format, args.quality)]
+            elapsed = time.perf_counter() - start
+            output_size = sum(os.path.getsize(path) for path in paths)
+            print(f"{'PDF转' + image_format + f'（{args.dpi} DPI）':<26}{len(paths):>6}{len(paths) / elapsed:>10.1f}"
+                  f"{output_size / mib:>12.2f}{elapsed:>10.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _fetch_raw(url: str, headers: Dict[str, str]):
+    """GET请求，返回 (状态码, 响应头, 未解压的正文, 头部字节数)"""
+    import http.client
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parts.netloc, timeout=30)
+    try:
+        connection.request("GET", parts.path + (f"?{parts.query}" if parts.query else "") or "/", headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        header_bytes = len(f"HTTP/1.1 {response.status} {response.reason}\r\n") + len(str(response.msg))
+        return response.status, response.msg, body, header_bytes
+    finally:
+        connection.close()
+
+
+def run_wire_benchmark(args):
+    """每次页面加载的传输字节数：未压缩（相当于加中间件之前）、压缩、带ETag再次访问"""
+    from urllib.parse import urljoin, urlsplit
+
+    base = args.url.rstrip("/") + "/"
+    origin = urlsplit(base).netloc
+    # 页面、配置（包含各组件的初始HTML）以及页面和配置中引用的同源脚本、样式表和静态资源
+    reference_pattern = re.compile(r'''(?:src|href)=["\']?([^"\' >]+\.(?:js|css|svg))|(/static-assets/[\w.\-]+)''')
+    resources = ["", "config"]
+    for name in ("", "config"):
+        _, _, body, _ = _fetch_raw(urljoin(base, name), {"Accept-Encoding": "identity"})
+        for match in reference_pattern.finditer(body.decode("utf-8", errors="replace").replace("\\/", "/")):
+            reference = urljoin(base, match.group(1) or match.group(2))
+            if urlsplit(reference).netloc == origin and reference not in resources:
+                resources.append(reference)
+
+    scenarios = [
+        ("未压缩", {"Accept-Encoding": "identity"}, False),
+        ("gzip", {"Accept-Encoding": "gzip"}, False),
+        ("br, gzip", {"Accept-Encoding": "br, gzip"}, False),
+        ("再次访问(304)", {"Accept-Encoding": "br, gzip"}, True)
+    ]
+    kib = 1024
+    baseline = None
+    etags: Dict[str, str] = {}
+    print(f"资源数: {len(resources)}（{base}）")
+    print(f"{'场景':<16}{'请求':>6}{'304':>6}{'头部(KB)':>12}{'正文(KB)':>12}{'合计(KB)':>12}{'相对':>8}")
+    for name, headers, revalidate in scenarios:
+        header_total = body_total = not_modified = 0
+        for resource in resources:
+            url = urljoin(base, resource)
+            request_headers = dict(headers)
+            if revalidate and url in etags:
+                request_headers["If-None-Match"] = etags[url]
+            status, response_headers, body, header_bytes = _fetch_raw(url, request_headers)
+            if response_headers.get("ETag") and not revalidate:
+                etags[url] = response_headers["ETag"]
+            not_modified += status == 304
+            header_total += header_bytes
+            body_total += len(body)
+        total = header_total + body_total
+        baseline = baseline or total
+        print(f"{name:<16}{len(resources):>6}{not_modified:>6}{header_total / kib:>12.1f}"
+              f"{body_total / kib:>12.1f}{total / kib:>12.1f}{total / baseline:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gradio多功能工具平台性能基准")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    queue_parser = subparsers.add_parser("queue", help="测试视频任务对图像任务延迟的影响")
+    queue_parser.add_argument("--url", default="http://localhost:7860", help="已启动的应用地址")
+    queue_parser.add_argument("--video-clients", type=int, default=8, help="并发提交视频压缩的客户端数")
+    queue_parser.add_argument("--image-clients", type=int, default=4, help="并发提交滤镜的客户端数")
+    queue_parser.add_argument("--requests", type=int, default=10, help="每个客户端的请求数")
+    queue_parser.set_defaults(func=run_queue_benchmark)
+
+    colorize_parser = subparsers.add_parser("colorize", help="图片上色吞吐测试（直接调用处理器）")
+    colorize_parser.add_argument("--model", help="ONNX上色模型路径（默认使用config.py中的配置）")
+    colorize_parser.add_argument("--sizes", nargs="+", default=["640x480", "1920x1080", "4000x3000"])
+    colorize_parser.add_argument("--concurrency", nargs="+", type=int, default=[1, os.cpu_count() or 1])
+    colorize_parser.add_argument("--batch", type=int, default=1, help="每次调用的图片数")
+    colorize_parser.add_argument("--iterations", type=int, default=20)
+    colorize_parser.set_defaults(func=run_colorize_benchmark)
+
+    models_parser = subparsers.add_parser("models", help="多进程加载模型的内存占用（复制 vs mmap）")
+    models_parser.add_argument("--model", help="ONNX模型路径（默认使用config.py中第一个已配置的模型）")
+    models_parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    models_parser.set_defaults(func=run_models_benchmark)
+
+    convert_parser = subparsers.add_parser("convert", help="图片合并PDF与PDF转图片的吞吐测试")
+    convert_parser.add_argument("--pages", type=int, default=50)
+    convert_parser.add_argument("--size", default="1240x1754", help="测试页像素尺寸（默认A4 150DPI）")
+    convert_parser.add_argument("--quality", type=int, default=85, help="JPEG/WEBP质量（与图片压缩默认值一致）")
+    convert_parser.add_argument("--dpi", type=int, default=150, help="PDF转图片的渲染分辨率")
+    convert_parser.add_argument("--workers", type=int, default=None, help="合并PDF的编码线程数")
+    convert_parser.set_defaults(func=run_convert_benchmark)
+
+    wire_parser = subparsers.add_parser("wire", help="每次页面加载的传输字节数（压缩与ETag/304的效果）")
+    wire_parser.add_argument("--url", default="http://localhost:7860", help="已启动的应用地址")
+    wire_parser.set_defaults(func=run_wire_benchmark)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,12 @@ Gradio多功能工具平台 - 配置文件
 创建时间: 2025-06-19
 """
 
+import os
+import tempfile
+
+# 运行时数据目录（缓存、分析结果等，位于系统临时目录以便Gradio提供下载）
+RUNTIME_DATA_DIR = os.path.join(tempfile.gettempdir(), "chainsuite")
+
 # 应用基本信息
 APP_CONFIG = {
     "title": "🚀 AI多功能工具平台",
@@ -69,6 +75,19 @@ PHOTO_RESTORATION_CONFIG = {
             "inputs": ["image"],
             "outputs": ["image"]
         }
+    },
+    "engine": {
+        # 可选ONNX修复模型（NCHW、RGB、0~1输入输出，尺寸不变）；未配置时使用传统算法
+        "model_path": None,
+        "intra_op_threads": None,   # None表示由ONNX Runtime按核心数决定
+        "tile_size": 512,           # 分块边长，决定单次推理的内存占用
+        "tile_overlap": 32,         # 相邻图块重叠像素，用于融合消除接缝
+        "tile_batch_size": 4,       # 每个请求每次提交给批处理调度器的图块数
+        # 传统算法的缺陷形状筛选（像素）：细长的划痕或小而紧凑的污点才修补，避免把文字边缘、发丝等细节当作缺陷
+        "min_scratch_length": 24,   # 划痕的最小长度
+        "scratch_elongation": 6.0,  # 划痕长度至少为平均宽度的倍数
+        "min_spot_area": 4,         # 污点的最小面积（更小的孤立点多为纹理和噪点）
+        "max_spot_area": 64         # 污点的最大面积
     }
 }
 
@@ -82,6 +101,18 @@ PHOTO_COLORIZATION_CONFIG = {
             "inputs": ["image"],
             "outputs": ["image"]
         }
+    },
+    "engine": {
+        # ONNX上色模型：输入 Nx1xSxS 的归一化L，输出 Nx2xSxS 的归一化ab（如ECCV16/SIGGRAPH17导出模型）
+        # 上色没有传统算法可回退，未配置模型时不加载图片上色标签页（见 MODULE_IMPORTS）
+        "model_path": None,
+        "input_size": 256,          # 模型固定输入分辨率
+        "l_center": 50.0,           # L归一化：(L - l_center) / l_scale
+        "l_scale": 100.0,
+        "ab_scale": 110.0,          # 模型输出乘以该系数得到ab
+        "pool_size": None,          # 会话池大小，None表示CPU核心数
+        "intra_op_threads": 1,      # 每个会话的线程数
+        "prewarm": False            # 为True时启动即在后台预热全部会话；默认在首次请求时加载
     }
 }
 
@@ -95,6 +126,15 @@ IMAGE_ENHANCEMENT_CONFIG = {
             "inputs": ["image"],
             "outputs": ["image"]
         }
+    },
+    "engine": {
+        # 可选ONNX超分模型（NCHW、RGB、0~1，输出放大 model_scale 倍）；未配置时使用传统算法
+        "model_path": None,
+        "model_scale": 4,
+        "tile_size": 256,                   # 图块核心区域边长
+        "tile_margin": 16,                  # 图块上下文边距，覆盖重采样/模型感受野以消除接缝
+        "workers": None,                    # 图块并行线程数，None表示CPU核心数
+        "max_output_pixels": 200_000_000    # 输出像素上限，防止超大图耗尽内存
     }
 }
 
@@ -102,7 +142,52 @@ IMAGE_ENHANCEMENT_CONFIG = {
 VIDEO_PROCESSING_CONFIG = {}
 
 # 文档处理配置
-DOCUMENT_PROCESSING_CONFIG = {}
+DOCUMENT_PROCESSING_CONFIG = {
+    "name": "文档处理",
+    "description": "PDF文本提取、页面转图片和PDF压缩",
+    "functions": {
+        "文本提取": {
+            "description": "逐页提取PDF中的文字",
+            "inputs": ["file"],
+            "outputs": ["text", "file"]
+        },
+        "页面转图片": {
+            "description": "将PDF每一页渲染为PNG/JPEG/WEBP图片",
+            "inputs": ["file", "dpi", "format", "quality"],
+            "outputs": ["gallery", "file"]
+        },
+        "图片合并PDF": {
+            "description": "将多张图片按顺序合并为一个PDF，每张图片一页",
+            "inputs": ["files", "quality"],
+            "outputs": ["file"]
+        },
+        "PDF压缩": {
+            "description": "降低PDF内嵌图片的分辨率和质量以减小文件",
+            "inputs": ["file", "max_dpi", "quality"],
+            "outputs": ["file"]
+        },
+        "全文搜索": {
+            "description": "搜索您提取过文本的文档（只能搜索自己处理过的文档）",
+            "inputs": ["text"],
+            "outputs": ["dataframe"]
+        }
+    },
+    "engine": {
+        # PDF解析依赖PyMuPDF（可选依赖：pip install pymupdf）
+        "workers": None,                    # 页面渲染进程数，None表示CPU核心数
+        "pages_per_task": 4,                # 每个渲染任务的页数（首个任务只渲染第一页，尽快返回）
+        "render_dpi": 150,
+        "image_pdf_dpi": 150,               # 合并PDF时，图片未记录DPI则按该值确定页面尺寸
+        "encode_workers": None,             # 合并PDF时并行解码/编码的线程数，None表示CPU核心数
+        "preview_chars": 5000,              # 文本提取界面预览的最大字符数
+        "gallery_limit": 60,                # 页面转图片界面最多预览的页数，完整结果见打包下载
+        "output_dir": os.path.join(RUNTIME_DATA_DIR, "documents"),
+        "job_ttl": 24 * 3600,               # 处理结果保留时间（秒）
+        "index_path": os.path.join(RUNTIME_DATA_DIR, "document_index.sqlite3"),
+        "index_batch_pages": 32,            # 每个写入事务包含的页数
+        "search_limit": 50                  # 全文搜索返回的最大结果数
+    }
+}
 
 # 图像工具配置
 IMAGE_TOOLS_CONFIG = {
@@ -219,7 +304,49 @@ NAVIGATION_CONFIG = {
     "custom_links": [
         # 用户可以在这里添加自定义链接
         # {"name": "自定义网站", "url": "https://example.com", "description": "描述", "category": "其他"}
-    ]
+    ],
+    # 自定义链接存储（按用户隔离，SQLite持久化）
+    "store": {
+        "path": os.path.join(RUNTIME_DATA_DIR, "navigation.sqlite3"),
+        "flush_interval": 0.2,      # 排队写入的最长提交间隔（秒）
+        "flush_batch": 200,         # 排队写入达到该数量时立即提交
+        "cache_owners": 256         # 内存中缓存链接的最大用户数
+    },
+    "search": {
+        "limit": 20                 # 搜索结果最多显示的链接数
+    },
+    "http": {
+        # 链接检查和网站预览共用的异步HTTP连接池
+        "timeout": 10.0,            # 单次请求超时（秒）
+        "connect_timeout": 5.0,     # 建立连接超时（秒）
+        "max_connections": 64,      # 连接池最大连接数
+        "per_host": 4,              # 同一主机的最大并发请求数
+        "block_private": True       # 拒绝访问本机、内网、链路本地和保留地址（每次重定向后重新检查）
+    },
+    "health": {
+        "background": True,         # 启动后台定期检查全部链接
+        "interval": 6 * 3600,       # 后台检查周期（秒）
+        "ttl": 1800,                # 正常结果的缓存时间（秒）
+        "failure_ttl": 300,         # 失败结果的缓存时间（秒），较短以便尽快重试
+        "cache_entries": 20000,     # 缓存的检查结果数上限（按最近使用淘汰）
+        "max_urls": 5000            # 后台检查和预取每轮最多包含的自定义链接数（最近添加的优先）
+    },
+    "preview": {
+        "enabled": True,            # 链接卡片显示网站图标和标题
+        "cache_dir": os.path.join(RUNTIME_DATA_DIR, "link_previews"),
+        "interval": 24 * 3600,      # 后台预取周期（秒）
+        "ttl": 24 * 3600,           # 超过该时间的预览重新验证（ETag条件请求）
+        "concurrency": 16,          # 同时抓取的网站数
+        "icon_size": 32,            # 图标统一缩放的像素尺寸（高分屏显示清晰）
+        "display_size": 20,         # 卡片中图标的显示尺寸
+        "max_html_bytes": 256 * 1024,   # 页面最多读取的字节数（只需<head>）
+        "max_icon_bytes": 256 * 1024    # 图标文件大小上限
+    },
+    "transfer": {
+        "max_links": 100000,        # 单次导入的最大链接数
+        "export_dir": os.path.join(RUNTIME_DATA_DIR, "link_exports"),
+        "export_ttl": 24 * 3600     # 导出文件保留时间（秒）
+    }
 }
 
 # 样式配置
@@ -331,14 +458,175 @@ CUSTOM_CSS = """
 }
 """
 
-# 模块导入配置
+# 模块导入配置（按标签页顺序排列，由模块加载器按需导入）
+# dependencies 为模块处理器首次使用时才导入的重量级依赖
 MODULE_IMPORTS = {
-    "ai_image": "modules.ai_image",
-    "ai_chat": "modules.ai_chat", 
-    "ai_video": "modules.ai_video",
-    "image_tools": "modules.image_tools",
-    "video_tools": "modules.video_tools",
-    "navigation": "modules.navigation"
+    "photo_restoration": {
+        "module": "modules.photo_restoration",
+        "factory": "create_photo_restoration_interface",
+        "dependencies": [],
+        "enabled": True
+    },
+    "photo_colorization": {
+        "module": "modules.photo_colorization",
+        "factory": "create_photo_colorization_interface",
+        "dependencies": [],
+        "enabled": PHOTO_COLORIZATION_CONFIG["engine"]["model_path"] is not None
+    },
+    "image_enhancement": {
+        "module": "modules.image_enhancement",
+        "factory": "create_image_enhancement_interface",
+        "dependencies": [],
+        "enabled": True
+    },
+    "video_processing": {
+        "module": "modules.video_processing",
+        "factory": "create_video_processing_interface",
+        "dependencies": [],
+        "enabled": True
+    },
+    "document_processing": {
+        "module": "modules.document_processing",
+        "factory": "create_document_processing_interface",
+        "dependencies": [],
+        "enabled": True
+    },
+    "image_tools": {
+        "module": "modules.image_tools",
+        "factory": "create_image_tools_interface",
+        "dependencies": ["PIL.Image", "PIL.ImageEnhance", "PIL.ImageFilter", "PIL.ImageOps"],
+        "enabled": True
+    },
+    "video_tools": {
+        "module": "modules.video_tools",
+        "factory": "create_video_tools_interface",
+        "dependencies": [],
+        "enabled": True
+    },
+    "navigation": {
+        "module": "modules.navigation",
+        "factory": "create_navigation_interface",
+        "dependencies": [],
+        "enabled": True
+    },
+    "profiling": {
+        "module": "modules.profiling",
+        "factory": "create_profiling_interface",
+        "dependencies": [],
+        "enabled": True
+    }
+}
+
+# 模块加载器配置
+MODULE_LOADER_CONFIG = {
+    # True: 构建界面时导入模块（所有标签页都在启动时构建），PIL/numpy等依赖在处理器首次使用时导入
+    # False: 启动时导入全部模块和依赖（用于对比启动耗时）
+    "lazy_imports": True
+}
+
+# 系统状态采样配置
+SYSTEM_MONITOR_CONFIG = {
+    "interval": 2.0,       # 采样周期（秒）
+    "history_size": 60,    # 环形缓冲区保留的快照数量
+    "disk_path": "/"       # 统计磁盘使用率的挂载点
+}
+
+# 请求性能分析配置（也可通过 launch(profile_requests=True) 开启；只在启动时开启，开启后才显示性能分析标签页）
+PROFILING_CONFIG = {
+    "enabled": False,
+    "interval": 0.005,     # 采样间隔（秒）
+    "max_profiles": 50,    # 最多保留的分析结果数量
+    "output_dir": os.path.join(RUNTIME_DATA_DIR, "profiles")
+}
+
+# 队列与并发配置
+# 每个类别拥有独立的 concurrency_id，慢速视频任务不会占满图像工具的并发名额；
+# queue=False 的类别（纯HTML刷新等轻量操作）不进入队列直接执行
+QUEUE_CONFIG = {
+    "default_concurrency_limit": 1,
+    "max_size": 100,               # 队列最大排队数
+    "categories": {
+        "image": {
+            "concurrency_limit": os.cpu_count() or 1,
+            "concurrency_id": "image_tools"
+        },
+        "video": {
+            "concurrency_limit": 2,
+            "concurrency_id": "video_tools"
+        },
+        "document": {
+            # 页面渲染在进程池中并行，同时处理的文档数不宜过多
+            "concurrency_limit": 2,
+            "concurrency_id": "document_tools"
+        },
+        "ai": {
+            # 模型推理由批处理调度器合并执行，允许多个请求同时进入以便合批
+            "concurrency_limit": os.cpu_count() or 1,
+            "concurrency_id": "ai_models"
+        },
+        "links": {
+            # 链接批量导入导出、链接检查和嵌入检查（解析大文件、整批写入数据库、等待网络请求）
+            "concurrency_limit": 2,
+            "concurrency_id": "link_transfer"
+        },
+        "html": {
+            "queue": False
+        }
+    }
+}
+
+# 处理结果缓存配置（内存LRU + 磁盘两级缓存）
+RESULT_CACHE_CONFIG = {
+    "enabled": True,
+    "memory_items": 128,                # 内存缓存最大条目数
+    "memory_bytes": 512 * 1024 ** 2,    # 内存缓存最大像素字节数
+    "disk_dir": os.path.join(RUNTIME_DATA_DIR, "result_cache"),
+    "disk_bytes": 2 * 1024 ** 3         # 磁盘缓存上限，超出后淘汰最久未访问的结果
+}
+
+# 模型注册配置：权重转换为可mmap的外部数据文件，多进程共享物理内存
+MODEL_REGISTRY_CONFIG = {
+    "mmap_weights": True,
+    "cache_dir": os.path.join(RUNTIME_DATA_DIR, "models"),
+    "size_threshold": 1024      # 大于该字节数的权重张量写入外部文件
+}
+
+# 模型推理动态批处理配置（老照片修复、图片上色、高清放大共用）
+BATCHING_CONFIG = {
+    "enabled": True,
+    "max_batch_size": 8,        # 单次推理最多合并的输入数
+    "max_latency_ms": 10.0      # 等待凑批的最长时间（每个请求增加的最大延迟）
+}
+
+# 静态资源预编译配置：页头页脚、说明文档、导航分类和CSS只在来源变化时重新渲染
+STATIC_ASSETS_CONFIG = {
+    "cache_dir": os.path.join(RUNTIME_DATA_DIR, "static_assets"),
+    "compress_min_size": 512,   # 小于该字节数的资源不生成预压缩文件
+    "external_css": True        # CUSTOM_CSS 以带版本号的外链样式表加载（浏览器长期缓存），否则内联
+}
+
+# 响应压缩中间件配置：大于阈值的HTML/JSON/CSS/JS响应即时压缩（brotli可选），GET响应带ETag支持304
+COMPRESSION_CONFIG = {
+    "enabled": True,
+    "minimum_size": 1024,               # 小于该字节数的响应不压缩
+    "gzip_level": 6,
+    "brotli_quality": 5,                # 即时压缩用中等质量，预压缩的静态资源使用最高质量
+    "max_buffer": 4 * 1024 * 1024,      # 超过该大小的响应改为流式压缩（不计算ETag）
+    "cache_bytes": 32 * 1024 * 1024,    # 压缩结果缓存上限（按内容哈希）
+    "immutable_paths": ["/assets/"]     # Gradio前端构建产物（文件名含哈希），设置一年强缓存
+}
+
+# 图像处理HTTP接口配置（multipart或原始字节上传，直接返回图片字节）
+# 接口直接挂载在底层应用上，不经过 launch(auth=...) 的登录校验：默认关闭，开启时必须设置令牌，
+# 调用方在请求头中携带 Authorization: Bearer <令牌>
+IMAGE_API_CONFIG = {
+    "enabled": False,
+    "api_token": os.environ.get("CHAINSUITE_IMAGE_API_TOKEN", ""),
+    "prefix": "/api/image",
+    "max_upload_bytes": 50 * 1024 * 1024,
+    "concurrency": os.cpu_count() or 1,     # 同时处理的请求数，其余在事件循环中等待
+    "max_steps": 16,                        # 流水线最多步骤数
+    "max_output_pixels": 100_000_000        # 输出像素上限（与PIL的 MAX_IMAGE_PIXELS 取较小者），防止超大尺寸耗尽内存
 }
 
 # 默认设置
@@ -9,13 +9,17 @@ Gradio多功能工具平台 - 模块包
 __version__ = "1.0.0"
 __author__ = "MiniMax Agent"
 
-# 模块导入
-from . import image_tools
-from . import video_tools
-from . import navigation
+import importlib
 
 __all__ = [
     "image_tools",
     "video_tools",
     "navigation"
 ]
+
+
+def __getattr__(name):
+    """按需导入子模块，避免导入包时加载全部功能模块"""
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
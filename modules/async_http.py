@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步HTTP连接池模块
+独立线程运行asyncio事件循环，持有一个httpx.AsyncClient（连接池复用连接）和按主机的并发限制，
+同步代码通过 run() 提交协程。链接检查和网站预览共用同一个连接池。
+请求的URL来自访客输入，默认在每次发出请求前（包括每次重定向）解析主机，
+拒绝本机、内网、链路本地和保留地址，避免被用来探测服务器所在的内部网络
+创建时间: 2025-06-19
+"""
+
+import asyncio
+import ipaddress
+import socket
+import threading
+from typing import Any, Coroutine, Dict, Optional
+from urllib.parse import urlsplit
+
+from modules.module_loader import lazy_import
+
+httpx = lazy_import("httpx")
+
+
+class BlockedAddressError(ValueError):
+    """目标主机是本机、内网、链路本地或保留地址"""
+
+
+def is_public_address(address: str) -> bool:
+    """是否为公网地址（本机、内网、链路本地、保留、组播和未指定地址均不是）"""
+    try:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified or not ip.is_global)
+
+
+async def resolve_public(host: str, port: int):
+    """解析主机，任一地址不是公网地址时抛出 BlockedAddressError"""
+    host = host.strip("[]")
+    try:
+        ipaddress.ip_address(host.split("%", 1)[0])
+        addresses = [host]
+    except ValueError:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise httpx.ConnectError(f"无法解析主机 {host}: {e.strerror or e}") from None
+        addresses = [info[4][0] for info in infos]
+    if not addresses or not all(is_public_address(address) for address in addresses):
+        raise BlockedAddressError(f"不允许访问本机、内网或保留地址: {host}")
+
+
+class AsyncHttpPool:
+    """事件循环线程 + 共享的异步HTTP客户端"""
+
+    def __init__(self, timeout: float = 10.0, connect_timeout: float = 5.0, max_connections: int = 64,
+                 per_host: int = 4, user_agent: str = "Mozilla/5.0 (compatible; ChainSuiteLinkBot)",
+                 block_private: bool = True):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.user_agent = user_agent
+        self.block_private = block_private
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        # 以下对象只在事件循环线程中访问
+        self._client = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-http-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    @property
+    def client(self):
+        """共享客户端（只能在事件循环线程中使用）"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                headers={"User-Agent": self.user_agent},
+                # 请求钩子在每次重定向后也会执行
+                event_hooks={"request": [self._check_request]} if self.block_private else {}
+            )
+        return self._client
+
+    @staticmethod
+    async def _check_request(request):
+        url = request.url
+        await resolve_public(url.host, url.port or (443 if url.scheme == "https" else 80))
+
+    def host_limit(self, url: str) -> asyncio.Semaphore:
+        """URL所在主机的并发限制（只能在事件循环线程中使用）"""
+        try:
+            host = urlsplit(url).netloc.lower()
+        except ValueError:
+            # 无法解析的URL在请求时报错，这里归入同一组即可
+            host = ""
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return limit
+
+    def run(self, coroutine: Coroutine, timeout: Optional[float] = None) -> Any:
+        """在事件循环线程中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result(timeout)
+
+    def submit(self, coroutine: Coroutine):
+        """在事件循环线程中执行协程，不等待结果"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def close(self):
+        """关闭连接池并停止事件循环"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(self.timeout)
+            self._client = None
+        self._host_limits.clear()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_pool: Optional[AsyncHttpPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool(**options) -> AsyncHttpPool:
+    """获取进程内共享的连接池（参数只在首次创建时生效）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AsyncHttpPool(**options)
+        return _pool
+
+
+# 导出接口
+__all__ = ["BlockedAddressError", "is_public_address", "resolve_public", "AsyncHttpPool", "get_http_pool"]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+动态微批处理模块
+在很短的时间窗口内收集多个推理请求，按输入尺寸分桶后合并为一次批量推理，
+再将结果分发回各自的请求
+创建时间: 2025-06-19
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from config import BATCHING_CONFIG
+
+
+class _PendingItem:
+    """等待批处理的单个输入"""
+
+    __slots__ = ("item", "future", "arrival")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.future: Future = Future()
+        self.arrival = time.monotonic()
+
+
+def shape_bucket(item: Any) -> Hashable:
+    """默认分桶规则：按数组形状分桶，同形状输入才能直接堆叠"""
+    return getattr(item, "shape", None)
+
+
+class MicroBatcher:
+    """微批调度器
+
+    一个批次在以下任一条件满足时执行：
+    - 同一分桶内的请求数达到 max_batch_size
+    - 分桶内最早的请求已等待 max_latency_ms
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 8,
+                 max_latency_ms: float = 10.0, bucket_fn: Callable[[Any], Hashable] = shape_bucket,
+                 workers: int = 1, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency = max_latency_ms / 1000.0
+        self.bucket_fn = bucket_fn
+        self.workers = max(1, workers)
+        self.name = name
+
+        self._pending: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self.stats = {"batches": 0, "items": 0, "max_batch": 0}
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, item: Any) -> Future:
+        """提交单个输入，返回结果Future"""
+        pending = _PendingItem(item)
+        key = self.bucket_fn(item)
+        with self._cond:
+            self._ensure_workers()
+            bucket = self._pending.get(key)
+            if bucket is None:
+                bucket = deque()
+                self._pending[key] = bucket
+            bucket.append(pending)
+            self._cond.notify_all()
+        return pending.future
+
+    def run(self, items: List[Any]) -> List[Any]:
+        """提交一组输入并等待全部结果（同一请求的多个图块也会与其他请求合批）"""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def _next_batch(self) -> List[_PendingItem]:
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+
+                # 优先处理最早到达的分桶
+                key, bucket = min(self._pending.items(), key=lambda entry: entry[1][0].arrival)
+                remaining = bucket[0].arrival + self.max_latency - time.monotonic()
+                if len(bucket) >= self.max_batch_size or remaining <= 0:
+                    batch = [bucket.popleft() for _ in range(min(len(bucket), self.max_batch_size))]
+                    if not bucket:
+                        del self._pending[key]
+                    return batch
+                self._cond.wait(remaining)
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.batch_fn([pending.item for pending in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"批处理结果数量不匹配：输入 {len(batch)}，输出 {len(results)}")
+            except Exception as e:
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
+
+            with self._cond:
+                self.stats["batches"] += 1
+                self.stats["items"] += len(batch)
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+    def get_stats(self) -> Dict[str, float]:
+        """批处理统计"""
+        with self._cond:
+            stats = dict(self.stats)
+        stats["avg_batch"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(name: str, batch_fn: Callable[[List[Any]], List[Any]], workers: int = 1,
+                bucket_fn: Callable[[Any], Hashable] = shape_bucket) -> Optional[MicroBatcher]:
+    """获取按名称共享的调度器；BATCHING_CONFIG未启用时返回None，由调用方直接推理"""
+    if not BATCHING_CONFIG["enabled"]:
+        return None
+    with _batchers_lock:
+        batcher = _batchers.get(name)
+        if batcher is None:
+            batcher = MicroBatcher(
+                batch_fn,
+                max_batch_size=BATCHING_CONFIG["max_batch_size"],
+                max_latency_ms=BATCHING_CONFIG["max_latency_ms"],
+                bucket_fn=bucket_fn,
+                workers=workers,
+                name=name
+            )
+            _batchers[name] = batcher
+        return batcher
+
+
+def batcher_stats() -> Dict[str, Dict[str, float]]:
+    """所有调度器的统计信息"""
+    with _batchers_lock:
+        return {name: batcher.get_stats() for name, batcher in _batchers.items()}
+
+
+# 导出接口
+__all__ = ["MicroBatcher", "shape_bucket", "get_batcher", "batcher_stats"]
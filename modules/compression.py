@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应压缩中间件模块
+挂在Gradio底层ASGI应用上：超过阈值的HTML/JSON/CSS/JS响应按Accept-Encoding即时压缩为brotli或gzip
+（相同内容的压缩结果按内容哈希缓存，不重复压缩），GET响应附带ETag并处理 If-None-Match 返回304；
+带内容哈希的前端资源设置一年强缓存。/static-assets/ 的预压缩文件已带 Content-Encoding，直接透传，
+SSE等流式响应不缓冲
+创建时间: 2025-06-19
+"""
+
+import asyncio
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 可压缩的内容类型（text/event-stream 单独排除）
+_COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/x-javascript",
+    "application/xml", "application/manifest+json", "image/svg+xml"
+)
+
+# 超过该大小的压缩放到线程池执行，避免阻塞事件循环
+_OFFLOAD_SIZE = 256 * 1024
+
+IMMUTABLE_CACHE_CONTROL = b"public, max-age=31536000, immutable"
+
+
+def _load_brotli():
+    """brotli为可选依赖，未安装时只提供gzip"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 编码 -> q值"""
+    accepted = {}
+    for token in value.lower().split(","):
+        name, _, params = token.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, number = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip()] = quality
+    return accepted
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 弱比较（忽略 W/ 前缀）"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _variant_etag(etag: str, encoding: str) -> str:
+    """压缩后的表示使用不同的ETag（"abc" -> "abc-gzip"）"""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return f"{etag}-{encoding}"
+
+
+class CompressionMiddleware:
+    """ASGI响应压缩 + ETag/304 中间件"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5,
+                 max_buffer: int = 4 * 1024 * 1024, cache_bytes: int = 32 * 1024 * 1024,
+                 immutable_paths: Iterable[str] = ()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.max_buffer = max_buffer
+        self.cache_bytes = cache_bytes
+        self.immutable_paths = tuple(immutable_paths)
+        self.brotli = _load_brotli()
+
+        # (内容哈希, 编码) -> 压缩结果
+        self._cache: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"responses": 0, "compressed": 0, "streamed": 0, "not_modified": 0,
+                      "cache_hits": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        """按客户端声明选择编码：优先brotli，其次gzip"""
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        candidates = (["br"] if self.brotli is not None else []) + ["gzip"]
+        best, best_quality = None, 0.0
+        for encoding in candidates:
+            quality = accepted.get(encoding, wildcard)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def _compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return self.brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress(self, data: bytes, encoding: str, digest: bytes) -> bytes:
+        """压缩（结果按内容哈希缓存）"""
+        key = (digest, encoding)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return cached
+        compressed = self._compress(data, encoding)
+        if len(compressed) <= self.cache_bytes // 8:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = compressed
+                    self._cached_bytes += len(compressed)
+                while self._cached_bytes > self.cache_bytes and self._cache:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_bytes -= len(evicted)
+        return compressed
+
+    def compressor(self, encoding: str):
+        """流式压缩器：返回 (压缩一块, 结束) 两个函数"""
+        if encoding == "br":
+            stream = self.brotli.Compressor(quality=self.brotli_quality)
+            return (lambda chunk: stream.process(chunk) + stream.flush()), stream.finish
+        # wbits=31 输出gzip格式
+        stream = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return (lambda chunk: stream.compress(chunk) + stream.flush(zlib.Z_SYNC_FLUSH)), stream.flush
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "POST"):
+            await self.app(scope, receive, send)
+            return
+        request_headers = {}
+        for key, value in scope["headers"]:
+            request_headers[key.decode("latin-1").lower()] = value.decode("latin-1")
+        responder = _Responder(
+            self, send,
+            encoding=self.choose_encoding(request_headers.get("accept-encoding", "")),
+            conditional=scope["method"] == "GET",
+            if_none_match=request_headers.get("if-none-match", ""),
+            immutable=bool(self.immutable_paths) and scope["path"].startswith(self.immutable_paths)
+        )
+        await self.app(scope, receive, responder.send)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats, cached=len(self._cache), cached_bytes=self._cached_bytes)
+        stats["ratio"] = stats["bytes_out"] / stats["bytes_in"] if stats["bytes_in"] else 1.0
+        return stats
+
+
+class _Responder:
+    """单个请求的响应处理：缓冲完整正文后压缩；正文超过缓冲上限时改为流式压缩"""
+
+    def __init__(self, middleware: CompressionMiddleware, send, encoding: Optional[str],
+                 conditional: bool, if_none_match: str, immutable: bool):
+        self.middleware = middleware
+        self._send = send
+        self.encoding = encoding
+        self.conditional = conditional
+        self.if_none_match = if_none_match
+        self.immutable = immutable
+
+        self.start: Optional[Dict[str, Any]] = None
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.passthrough = False
+        self.chunks: List[bytes] = []
+        self.buffered = 0
+        self.stream = None
+
+    def _header(self, name: bytes) -> Optional[bytes]:
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    def _set_header(self, name: bytes, value: Optional[bytes]):
+        self.headers = [(key, old) for key, old in self.headers if key.lower() != name]
+        if value is not None:
+            self.headers.append((name, value))
+
+    def _add_vary(self):
+        vary = self._header(b"vary")
+        if vary is None:
+            self._set_header(b"vary", b"Accept-Encoding")
+        elif b"accept-encoding" not in vary.lower():
+            self._set_header(b"vary", vary + b", Accept-Encoding")
+
+    def _eligible(self) -> bool:
+        if self.start["status"] != 200:
+            return False
+        if self._header(b"content-encoding") is not None:
+            # 已压缩（如 /static-assets/ 的预压缩文件）
+            return False
+        cache_control = (self._header(b"cache-control") or b"").lower()
+        if b"no-transform" in cache_control:
+            return False
+        content_type = (self._header(b"content-type") or b"").decode("latin-1").lower()
+        if content_type.startswith("text/event-stream"):
+            return False
+        return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+    async def send(self, message: Dict[str, Any]):
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.headers = list(message.get("headers", []))
+            if self.immutable and self.start["status"] == 200 and self._header(b"cache-control") is None:
+                self._set_header(b"cache-control", IMMUTABLE_CACHE_CONTROL)
+            self.middleware.stats["responses"] += 1
+            self.passthrough = not self._eligible()
+            if self.passthrough:
+                await self._send(dict(message, headers=self.headers))
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is not None:
+            await self._send_stream(body, more_body)
+            return
+
+        self.chunks.append(body)
+        self.buffered += len(body)
+        if not more_body:
+            await self._finish(b"".join(self.chunks))
+        elif self.buffered > self.middleware.max_buffer:
+            await self._start_stream(more_body)
+
+    async def _finish(self, body: bytes):
+        middleware = self.middleware
+        digest = hashlib.sha1(body).digest()
+
+        etag = None
+        if self.conditional:
+            existing = self._header(b"etag")
+            etag = existing.decode("latin-1") if existing else f'W/"{digest.hex()[:20]}"'
+
+        compressible = len(body) >= middleware.minimum_size
+        if compressible:
+            # 表示随Accept-Encoding变化，即使本次未压缩也需告知缓存
+            self._add_vary()
+        encoding = self.encoding if compressible else None
+        if encoding is not None:
+            if etag is not None:
+                etag = _variant_etag(etag, encoding)
+        if etag is not None:
+            self._set_header(b"etag", etag.encode("latin-1"))
+            if etag_matches(self.if_none_match, etag):
+                middleware.stats["not_modified"] += 1
+                self._set_header(b"content-length", None)
+                self._set_header(b"content-type", None)
+                await self._send(dict(self.start, status=304, headers=self.headers))
+                await self._send({"type": "http.response.body", "body": b""})
+                return
+
+        if encoding is not None:
+            if len(body) >= _OFFLOAD_SIZE:
+                loop = asyncio.get_running_loop()
+                compressed = await loop.run_in_executor(None, middleware.compress, body, encoding, digest)
+            else:
+                compressed = middleware.compress(body, encoding, digest)
+            # 压缩后反而更大时发送原文
+            if len(compressed) < len(body):
+                middleware.stats["compressed"] += 1
+                middleware.stats["bytes_in"] += len(body)
+                middleware.stats["bytes_out"] += len(compressed)
+                self._set_header(b"content-encoding", encoding.encode("latin-1"))
+                body = compressed
+        self._set_header(b"content-length", str(len(body)).encode("latin-1"))
+        await self._send(dict(self.start, headers=self.headers))
+        await self._send({"type": "http.response.body", "body": body})
+
+    async def _start_stream(self, more_body: bool):
+        buffered = b"".join(self.chunks)
+        self.chunks = []
+        if self.encoding is None:
+            # 不压缩，原样转发
+            self.passthrough = True
+            await self._send(dict(self.start, headers=self.headers))
+            await self._send({"type": "http.response.body", "body": buffered, "more_body": more_body})
+            return
+        self.middleware.stats["streamed"] += 1
+        self.stream = self.middleware.compressor(self.encoding)
+        self._add_vary()
+        self._set_header(b"content-length", None)
+        self._set_header(b"content-encoding", self.encoding.encode("latin-1"))
+        etag = self._header(b"etag")
+        if etag is not None:
+            self._set_header(b"etag", _variant_etag(etag.decode("latin-1"), self.encoding).encode("latin-1"))
+        await self._send(dict(self.start, headers=self.headers))
+        await self._send_stream(buffered, more_body)
+
+    async def _send_stream(self, body: bytes, more_body: bool):
+        process, finish = self.stream
+        data = process(body) if body else b""
+        self.middleware.stats["bytes_in"] += len(body)
+        if not more_body:
+            data += finish()
+        self.middleware.stats["bytes_out"] += len(data)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+def create_compression_middleware(enabled: bool = True, **options) -> List[Any]:
+    """创建传给FastAPI的中间件列表（app_kwargs["middleware"]）"""
+    if not enabled:
+        return []
+    from starlette.middleware import Middleware
+    return [Middleware(CompressionMiddleware, **options)]
+
+
+# 导出接口
+__all__ = [
+    "CompressionMiddleware", "parse_accept_encoding", "etag_matches",
+    "create_compression_middleware"
+]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容哈希模块
+为图像、文件和调用参数生成稳定的内容哈希，供结果缓存和请求合并使用
+创建时间: 2025-06-19
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+def image_fingerprint(image) -> str:
+    """对解码后的图像像素计算快速哈希（与文件格式、元数据无关）"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+# 文件哈希记忆：(路径, 大小, 修改时间) -> 哈希，避免对同一大文件重复读取
+_file_fingerprints: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_file_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """对文件内容分块计算哈希（文件未变化时复用上次结果）"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_fingerprints_lock:
+        if memo_key in _file_fingerprints:
+            _file_fingerprints.move_to_end(memo_key)
+            return _file_fingerprints[memo_key]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()
+
+    with _file_fingerprints_lock:
+        _file_fingerprints[memo_key] = fingerprint
+        while len(_file_fingerprints) > 1024:
+            _file_fingerprints.popitem(last=False)
+    return fingerprint
+
+
+def _fingerprint_value(value: Any) -> str:
+    if hasattr(value, "tobytes") and hasattr(value, "mode") and hasattr(value, "size"):
+        return "img:" + image_fingerprint(value)
+    if isinstance(value, str) and os.path.isfile(value):
+        return "file:" + file_fingerprint(value)
+    return "val:" + repr(value)
+
+
+def make_cache_key(operation: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """由操作名、输入内容和参数生成缓存键"""
+    parts = [operation]
+    parts.extend(_fingerprint_value(arg) for arg in args)
+    parts.extend(f"{key}={_fingerprint_value(kwargs[key])}" for key in sorted(kwargs))
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=20).hexdigest()
+
+
+# 导出接口
+__all__ = ["image_fingerprint", "file_fingerprint", "make_cache_key"]
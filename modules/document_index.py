@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档全文索引模块
+以SQLite FTS5（trigram分词，支持中文任意子串）索引提取出的逐页文本。文档按用户隔离，
+每个用户只能搜索自己处理过的文档；同一用户重复上传按内容哈希直接从索引读取文本，
+其他用户处理过的相同文件复制已提取的文本，都无需重新解析。
+trigram无法匹配少于3个字符的词（中文常见的两字词），另建一个双字（bigram）索引查询短词
+创建时间: 2025-06-19
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import DOCUMENT_PROCESSING_CONFIG
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    page_count INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0,
+    indexed_at REAL NOT NULL,
+    UNIQUE (owner, content_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (content_hash, complete);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (document_id, page)
+);
+CREATE TRIGGER IF NOT EXISTS pages_after_insert AFTER INSERT ON pages BEGIN
+    INSERT INTO page_fts (rowid, text) VALUES (new.id, new.text);
+    INSERT INTO page_bigrams (rowid, grams) VALUES (new.id, bigrams(new.text));
+END;
+CREATE TRIGGER IF NOT EXISTS pages_after_delete AFTER DELETE ON pages BEGIN
+    INSERT INTO page_fts (page_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO page_bigrams (page_bigrams, rowid, grams) VALUES ('delete', old.id, bigrams(old.text));
+END;
+"""
+
+# trigram分词需要 SQLite 3.34+，更早的版本退回按词分词（中文只能整句匹配）
+_FTS_TABLE = "CREATE VIRTUAL TABLE IF NOT EXISTS page_fts USING fts5(text, content='pages', content_rowid='id', tokenize='{}')"
+
+# 双字索引：每段连续的文字/数字拆为相邻两字的词元，段末字符单独作为一个词元（无正文，只存倒排表）；
+# 单字查询为前缀匹配，prefix='1' 为其建立前缀索引
+_BIGRAM_TABLE = "CREATE VIRTUAL TABLE IF NOT EXISTS page_bigrams USING fts5(grams, content='', prefix='1')"
+
+# trigram索引只能匹配3个字符及以上的片段，更短的词使用双字索引
+_MIN_INDEXED_QUERY = 3
+
+# 与FTS5 unicode61分词的词元字符一致（下划线为分隔符）
+_WORD_RUN = re.compile(r"[^\W_]+")
+
+
+def bigrams(text: str) -> str:
+    """文本转为双字词元序列，如 "文档处理" -> "文档 档处 处理 理"（SQL函数，触发器中调用）"""
+    grams = []
+    for run in _WORD_RUN.findall(text or ""):
+        grams.extend(run[i:i + 2] for i in range(len(run) - 1))
+        grams.append(run[-1])
+    return " ".join(grams)
+
+
+def _bigram_query(term: str) -> str:
+    """单个词转为双字索引查询：相邻双字组成短语（连续出现即为原文子串），单个字按前缀匹配"""
+    parts = []
+    for run in _WORD_RUN.findall(term):
+        if len(run) == 1:
+            parts.append('"' + run + '"*')
+        else:
+            parts.append('"' + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+    return " AND ".join(parts)
+
+
+def _fts_query(terms: List[str]) -> str:
+    """将用户输入转为FTS5查询：每个词作为短语，多个词同时出现"""
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _make_snippet(text: str, term: str, context: int = 24) -> str:
+    position = text.find(term)
+    if position < 0:
+        return text[:context * 2]
+    start = max(0, position - context)
+    end = min(len(text), position + len(term) + context)
+    return ("…" if start else "") + text[start:position] + "[" + term + "]" + \
+        text[position + len(term):end] + ("…" if end < len(text) else "")
+
+
+class DocumentIndex:
+    """逐页文本的全文索引（每个线程一个连接，写入串行化）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tokenizer = "trigram"
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            return connection
+
+        with self._init_lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.create_function("bigrams", 1, bigrams, deterministic=True)
+            if not self._initialized:
+                self._migrate(connection)
+                connection.execute(_BIGRAM_TABLE)
+                try:
+                    connection.execute(_FTS_TABLE.format("trigram"))
+                except sqlite3.OperationalError:
+                    self.tokenizer = "unicode61"
+                    connection.execute(_FTS_TABLE.format("unicode61"))
+                connection.executescript(_SCHEMA)
+                connection.commit()
+                self._initialized = True
+
+        self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection):
+        """旧版本的索引没有归属，无法确定文档属于哪个用户：删除后由各用户重新处理时建立"""
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(documents)")]
+        if columns and "owner" not in columns:
+            connection.executescript("""
+                DROP TABLE IF EXISTS pages;
+                DROP TABLE IF EXISTS documents;
+                DROP TABLE IF EXISTS page_fts;
+                DROP TABLE IF EXISTS page_bigrams;
+            """)
+
+    def lookup(self, content_hash: str, owner: str) -> Optional[Dict[str, Any]]:
+        """按内容哈希查找用户已完整索引的文档；其他用户索引过相同文件时复制其文本，无需重新解析"""
+        connection = self._connect()
+        query = "SELECT id, name, page_count, indexed_at FROM documents WHERE content_hash = ? AND complete = 1"
+        row = connection.execute(query + " AND owner = ?", (content_hash, owner)).fetchone()
+        if row:
+            return dict(row)
+        source = connection.execute(query + " ORDER BY id LIMIT 1", (content_hash,)).fetchone()
+        if source is None:
+            return None
+
+        with self._write_lock, connection:
+            connection.execute("DELETE FROM documents WHERE owner = ? AND content_hash = ?", (owner, content_hash))
+            document_id = connection.execute(
+                "INSERT INTO documents (owner, content_hash, name, page_count, complete, indexed_at) "
+                "VALUES (?, ?, ?, ?, 1, ?)",
+                (owner, content_hash, source["name"], source["page_count"], time.time())
+            ).lastrowid
+            connection.execute(
+                "INSERT INTO pages (document_id, page, text) SELECT ?, page, text FROM pages WHERE document_id = ?",
+                (document_id, source["id"])
+            )
+        return {"id": document_id, "name": source["name"], "page_count": source["page_count"],
+                "indexed_at": time.time()}
+
+    def iter_pages(self, document_id: int) -> Iterator[Tuple[int, int, str]]:
+        """按页码顺序读取已索引的文本，产出 (页码, 总页数, 文本)"""
+        connection = self._connect()
+        total = connection.execute("SELECT page_count FROM documents WHERE id = ?", (document_id,)).fetchone()[0]
+        cursor = connection.execute("SELECT page, text FROM pages WHERE document_id = ? ORDER BY page", (document_id,))
+        for row in cursor:
+            yield row["page"], total, row["text"]
+
+    def begin_document(self, content_hash: str, name: str, owner: str) -> int:
+        """开始为用户索引一个文档（清除此前未完成的同一文档），返回文档ID"""
+        connection = self._connect()
+        with self._write_lock, connection:
+            connection.execute("DELETE FROM documents WHERE owner = ? AND content_hash = ?", (owner, content_hash))
+            cursor = connection.execute(
+                "INSERT INTO documents (owner, content_hash, name, indexed_at) VALUES (?, ?, ?, ?)",
+                (owner, content_hash, name, time.time())
+            )
+            return cursor.lastrowid
+
+    def add_pages(self, document_id: int, pages: Iterable[Tuple[int, str]]):
+        """批量写入若干页（单个事务）"""
+        connection = self._connect()
+        with self._write_lock, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO pages (document_id, page, text) VALUES (?, ?, ?)",
+                [(document_id, page, text) for page, text in pages]
+            )
+
+    def finish_document(self, document_id: int, page_count: int):
+        """标记文档索引完成，之后的重复上传直接命中"""
+        connection = self._connect()
+        with self._write_lock, connection:
+            connection.execute(
+                "UPDATE documents SET page_count = ?, complete = 1, indexed_at = ? WHERE id = ?",
+                (page_count, time.time(), document_id)
+            )
+
+    def search(self, query: str, owner: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """在用户的文档中全文搜索，按相关度排序返回 文档名、页码、摘要"""
+        terms = [term for term in query.split() if _WORD_RUN.search(term)]
+        if not terms:
+            return []
+        connection = self._connect()
+
+        if self.tokenizer == "trigram":
+            long_terms = [term for term in terms if len(term) >= _MIN_INDEXED_QUERY]
+            short_terms = [term for term in terms if len(term) < _MIN_INDEXED_QUERY]
+        else:
+            # 按词分词无法匹配中文子串，全部使用双字索引
+            long_terms, short_terms = [], terms
+        bigram_query = " AND ".join(_bigram_query(term) for term in short_terms)
+
+        if long_terms:
+            # 长词走trigram索引并按其相关度排序，短词作为双字索引的附加条件
+            bigram_filter = "AND p.id IN (SELECT rowid FROM page_bigrams WHERE page_bigrams MATCH ?)" \
+                if short_terms else ""
+            rows = connection.execute(
+                f"""SELECT d.name, p.page, snippet(page_fts, 0, '[', ']', '…', 16) AS snippet
+                    FROM page_fts JOIN pages p ON p.id = page_fts.rowid JOIN documents d ON d.id = p.document_id
+                    WHERE page_fts MATCH ? AND d.owner = ? AND d.complete = 1 {bigram_filter}
+                    ORDER BY bm25(page_fts) LIMIT ?""",
+                (_fts_query(long_terms), owner, *([bigram_query] if short_terms else []), limit)
+            ).fetchall()
+            return [{"name": row["name"], "page": row["page"] + 1, "snippet": row["snippet"]} for row in rows]
+
+        # 双字索引不保存正文，摘要从页面文本生成
+        rows = connection.execute(
+            """SELECT d.name, p.page, p.text
+               FROM page_bigrams JOIN pages p ON p.id = page_bigrams.rowid JOIN documents d ON d.id = p.document_id
+               WHERE page_bigrams MATCH ? AND d.owner = ? AND d.complete = 1
+               ORDER BY bm25(page_bigrams) LIMIT ?""",
+            (bigram_query, owner, limit)
+        ).fetchall()
+        return [
+            {"name": row["name"], "page": row["page"] + 1, "snippet": _make_snippet(row["text"], terms[0])}
+            for row in rows
+        ]
+
+    def stats(self, owner: str) -> Dict[str, int]:
+        """用户的索引规模"""
+        row = self._connect().execute(
+            """SELECT COUNT(DISTINCT d.id), COUNT(p.id) FROM documents d LEFT JOIN pages p ON p.document_id = d.id
+               WHERE d.owner = ? AND d.complete = 1""",
+            (owner,)
+        ).fetchone()
+        return {"documents": row[0], "pages": row[1]}
+
+
+DOCUMENT_INDEX = DocumentIndex(DOCUMENT_PROCESSING_CONFIG["engine"]["index_path"])
+
+
+# 导出接口
+__all__ = ["bigrams", "DocumentIndex", "DOCUMENT_INDEX"]
@@ -1,5 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档处理模块
+PDF文本提取、页面转图片和PDF压缩，逐页流式处理，首页结果先行返回界面
+创建时间: 2025-06-19
+"""
+
 import gradio as gr
+import os
+import time
+import zipfile
+from typing import Iterator, Optional, Tuple
+from config import DOCUMENT_PROCESSING_CONFIG
+from modules import pdf_engine
+from modules.content_hash import file_fingerprint
+from modules.document_index import DOCUMENT_INDEX
+from modules.image_codec import DEFAULT_QUALITY
+from modules.pdf_writer import iter_images_to_pdf
+from modules.metrics import instrument_processor
+from modules.navigation import DEFAULT_OWNER, resolve_owner
+from modules.queue_config import event_options
+
+MISSING_ENGINE_MESSAGE = "❌ 未安装PDF解析引擎，请执行 pip install pymupdf 后重启应用"
+
+
+class DocumentProcessor:
+    """文档处理器（各方法为生成器，逐页产出界面更新）"""
+
+    def __init__(self):
+        self.name = DOCUMENT_PROCESSING_CONFIG["name"]
+        self.description = DOCUMENT_PROCESSING_CONFIG["description"]
+        self.engine_config = DOCUMENT_PROCESSING_CONFIG["engine"]
+
+    def _parse_and_index(self, pdf_file, content_hash: str, owner: str) -> Iterator[Tuple[int, int, str]]:
+        """解析PDF并按批写入用户的全文索引，全部页面写入后才标记完成"""
+        document_id = DOCUMENT_INDEX.begin_document(content_hash, os.path.basename(pdf_file), owner)
+        batch_size = self.engine_config["index_batch_pages"]
+        batch = []
+        total = 0
+        for number, total, text in pdf_engine.iter_page_text(pdf_file):
+            batch.append((number, text))
+            if len(batch) >= batch_size:
+                DOCUMENT_INDEX.add_pages(document_id, batch)
+                batch = []
+            yield number, total, text
+        if batch:
+            DOCUMENT_INDEX.add_pages(document_id, batch)
+        DOCUMENT_INDEX.finish_document(document_id, total)
+
+    def extract_text(self, pdf_file, owner: str = DEFAULT_OWNER) -> Iterator[Tuple[str, Optional[str], str]]:
+        """提取文本：全文逐页写入文件并加入用户的全文索引，界面只预览开头部分
+
+        同一文件（按内容哈希）已索引过时直接从索引读取，不再解析PDF。
+        """
+        if pdf_file is None:
+            yield "", None, "❌ 请上传PDF文件"
+            return
+
+        try:
+            start = time.perf_counter()
+            content_hash = file_fingerprint(pdf_file)
+            document = DOCUMENT_INDEX.lookup(content_hash, owner)
+            if document is not None:
+                pages = DOCUMENT_INDEX.iter_pages(document["id"])
+                source = "全文索引（已处理过的文件，未重新解析）"
+            elif pdf_engine.pymupdf_available():
+                pages = self._parse_and_index(pdf_file, content_hash, owner)
+                source = "PyMuPDF解析，已加入全文索引"
+            else:
+                yield "", None, MISSING_ENGINE_MESSAGE
+                return
+
+            preview_limit = self.engine_config["preview_chars"]
+            output_path = os.path.join(pdf_engine.new_job_dir("text_"), "text.txt")
+            preview = []
+            preview_length = 0
+            characters = 0
+            total = 0
+
+            with open(output_path, "w", encoding="utf-8") as f:
+                for number, total, text in pages:
+                    page_text = f"===== 第 {number + 1} 页 =====\n{text}\n"
+                    f.write(page_text)
+                    characters += len(text)
+                    if preview_length < preview_limit:
+                        preview.append(page_text[:preview_limit - preview_length])
+                        preview_length += len(preview[-1])
+                        yield "".join(preview), None, f"⏳ 正在提取文本：{number + 1} / {total} 页"
+                    elif number % 20 == 0:
+                        yield "".join(preview), None, f"⏳ 正在提取文本：{number + 1} / {total} 页"
+
+            status = f"""✅ 文本提取完成！
+
+**提取信息：**
+• 文本来源：{source}
+• 总页数：{total}
+• 字符数：{characters}
+• 界面预览：前 {min(preview_length, preview_limit)} 个字符（完整内容请下载文本文件）
+• 处理耗时：{time.perf_counter() - start:.2f} 秒"""
+            yield "".join(preview), output_path, status
+
+        except Exception as e:
+            yield "", None, f"❌ 文本提取失败: {str(e)}"
+
+    def pdf_to_images(self, pdf_file, dpi: int = 150, image_format: str = "PNG",
+                      quality: int = DEFAULT_QUALITY) -> Iterator[Tuple[list, Optional[str], str]]:
+        """页面转图片：多进程渲染，每完成一页更新预览，结束后提供打包下载"""
+        if pdf_file is None:
+            yield [], None, "❌ 请上传PDF文件"
+            return
+        if not pdf_engine.pymupdf_available():
+            yield [], None, MISSING_ENGINE_MESSAGE
+            return
+
+        try:
+            start = time.perf_counter()
+            dpi = int(dpi)
+            gallery_limit = self.engine_config["gallery_limit"]
+            job_dir = pdf_engine.new_job_dir("render_")
+            archive_path = os.path.join(job_dir, "pages.zip")
+            gallery = []
+            first_page_time = None
+            total = 0
+
+            # 图片本身已压缩，打包时直接存储
+            with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                pages = pdf_engine.iter_rendered_pages(pdf_file, dpi, job_dir, image_format, int(quality))
+                for number, total, image_path in pages:
+                    archive.write(image_path, os.path.basename(image_path))
+                    if first_page_time is None:
+                        first_page_time = time.perf_counter() - start
+                    if len(gallery) < gallery_limit:
+                        gallery.append((image_path, f"第 {number + 1} 页"))
+                    yield gallery, None, f"⏳ 正在渲染：{number + 1} / {total} 页"
+
+            status = f"""✅ 页面转图片完成！
+
+**渲染信息：**
+• 总页数：{total}
+• 分辨率：{dpi} DPI
+• 图片格式：{image_format}{f"（质量 {int(quality)}%）" if image_format != "PNG" else ""}
+• 首页耗时：{first_page_time or 0:.2f} 秒
+• 界面预览：{len(gallery)} 页（全部页面请下载压缩包）
+• 处理耗时：{time.perf_counter() - start:.2f} 秒"""
+            yield gallery, archive_path, status
+
+        except Exception as e:
+            yield [], None, f"❌ 页面渲染失败: {str(e)}"
+
+    def images_to_pdf(self, image_files, quality: int = DEFAULT_QUALITY) -> Iterator[Tuple[Optional[str], str]]:
+        """图片合并PDF：逐张编码后直接写入PDF，不在内存中保留已写入的页面"""
+        if not image_files:
+            yield None, "❌ 请上传图片"
+            return
+
+        try:
+            start = time.perf_counter()
+            paths = [getattr(item, "name", item) for item in image_files]
+            output_path = os.path.join(pdf_engine.new_job_dir("merge_"), "merged.pdf")
+
+            total = len(paths)
+            pages = iter_images_to_pdf(
+                paths,
+                output_path,
+                quality=int(quality),
+                default_dpi=self.engine_config["image_pdf_dpi"],
+                workers=self.engine_config.get("encode_workers")
+            )
+            for done, total in pages:
+                if done == 1 or done % 10 == 0:
+                    yield None, f"⏳ 正在合并：{done} / {total} 张"
+
+            input_size = sum(os.path.getsize(path) for path in paths)
+            output_size = os.path.getsize(output_path)
+            elapsed = time.perf_counter() - start
+            status = f"""✅ 图片合并完成！
+
+**合并信息：**
+• 页数：{total}
+• 图片质量：{int(quality)}%（原本为JPEG的图片直接嵌入，不重新编码）
+• 输入大小：{input_size / 1024:.1f} KB
+• PDF大小：{output_size / 1024:.1f} KB
+• 处理速度：{total / elapsed if elapsed > 0 else 0:.1f} 页/秒
+• 处理耗时：{elapsed:.2f} 秒"""
+            yield output_path, status
+
+        except Exception as e:
+            yield None, f"❌ 合并失败: {str(e)}"
+
+    def compress_pdf(self, pdf_file, max_dpi: int = 150, quality: int = 75) -> Iterator[Tuple[Optional[str], str]]:
+        """PDF压缩：逐页降低内嵌图片分辨率"""
+        if pdf_file is None:
+            yield None, "❌ 请上传PDF文件"
+            return
+        if not pdf_engine.pymupdf_available():
+            yield None, MISSING_ENGINE_MESSAGE
+            return
+
+        try:
+            start = time.perf_counter()
+            original_size = os.path.getsize(pdf_file)
+            name = os.path.splitext(os.path.basename(pdf_file))[0]
+            output_path = os.path.join(pdf_engine.new_job_dir("compress_"), f"{name}_compressed.pdf")
+
+            total = 0
+            for done, total, _ in pdf_engine.iter_compress_pdf(pdf_file, output_path, int(max_dpi), int(quality)):
+                if done == 1 or done % 10 == 0:
+                    yield None, f"⏳ 正在压缩：{done} / {total} 页"
+
+            compressed_size = os.path.getsize(output_path)
+            status = f"""✅ PDF压缩完成！
+
+**压缩信息：**
+• 总页数：{total}
+• 图片分辨率上限：{int(max_dpi)} DPI
+• 图片质量：{int(quality)}%
+• 原始大小：{original_size / 1024:.1f} KB
+• 压缩后：{compressed_size / 1024:.1f} KB
+• 压缩率：{(1 - compressed_size / original_size) * 100:.1f}%
+• 处理耗时：{time.perf_counter() - start:.2f} 秒"""
+            yield output_path, status
+
+        except Exception as e:
+            yield None, f"❌ PDF压缩失败: {str(e)}"
+
+    def search_documents(self, query: str, owner: str = DEFAULT_OWNER) -> Tuple[list, str]:
+        """在用户提取过文本的文档中搜索"""
+        if not query or not query.strip():
+            return [], "❌ 请输入搜索内容"
+
+        try:
+            start = time.perf_counter()
+            results = DOCUMENT_INDEX.search(query, owner, self.engine_config["search_limit"])
+            elapsed = (time.perf_counter() - start) * 1000
+            stats = DOCUMENT_INDEX.stats(owner)
+            rows = [[item["name"], item["page"], item["snippet"]] for item in results]
+            return rows, f"✅ 找到 {len(rows)} 条结果（{elapsed:.1f} ms，已索引 {stats['documents']} 个文档 / {stats['pages']} 页）"
+
+        except Exception as e:
+            return [], f"❌ 搜索失败: {str(e)}"
+
 
 def create_document_processing_interface():
+    """创建文档处理界面"""
+    processor = instrument_processor(DocumentProcessor(), "document_processing")
+    functions = DOCUMENT_PROCESSING_CONFIG["functions"]
+    engine_config = DOCUMENT_PROCESSING_CONFIG["engine"]
+
     with gr.Tab("📄 文档处理"):
-        gr.Markdown("## 文档处理功能正在开发中...")
\ No newline at end of file
+        gr.Markdown(f"## {DOCUMENT_PROCESSING_CONFIG['name']}")
+        gr.Markdown(DOCUMENT_PROCESSING_CONFIG['description'])
+
+        # 全文索引按用户隔离：浏览器本地保存随机ID，登录用户使用用户名
+        if hasattr(gr, "BrowserState"):
+            owner_id = gr.BrowserState("", storage_key="chainsuite_document_owner")
+        else:
+            owner_id = gr.State("")
+
+        with gr.Tabs():
+            # 文本提取
+            with gr.Tab("📝 文本提取"):
+                gr.Markdown(functions["文本提取"]["description"])
+                with gr.Row():
+                    with gr.Column():
+                        text_input = gr.File(label="上传PDF文件", file_types=[".pdf"], type="filepath")
+                        text_btn = gr.Button("📝 提取文本", variant="primary")
+                        text_file = gr.File(label="下载文本文件", interactive=False)
+
+                    with gr.Column():
+                        text_preview = gr.Textbox(label="文本预览", interactive=False, lines=16)
+                        text_status = gr.Textbox(label="处理状态", interactive=False, lines=6)
+
+                def extract_text(pdf_file, browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    for update in processor.extract_text(pdf_file, owner):
+                        yield (*update, browser_id)
+
+                text_btn.click(
+                    fn=extract_text,
+                    inputs=[text_input, owner_id],
+                    outputs=[text_preview, text_file, text_status, owner_id],
+                    **event_options("document")
+                )
+
+            # 页面转图片
+            with gr.Tab("🖼️ 页面转图片"):
+                gr.Markdown(functions["页面转图片"]["description"])
+                with gr.Row():
+                    with gr.Column():
+                        render_input = gr.File(label="上传PDF文件", file_types=[".pdf"], type="filepath")
+                        render_dpi = gr.Slider(
+                            minimum=72,
+                            maximum=300,
+                            step=1,
+                            value=engine_config["render_dpi"],
+                            label="分辨率（DPI）"
+                        )
+                        render_format = gr.Radio(choices=["PNG", "JPEG", "WEBP"], value="PNG", label="图片格式")
+                        render_quality = gr.Slider(
+                            minimum=10,
+                            maximum=100,
+                            step=5,
+                            value=DEFAULT_QUALITY,
+                            label="图片质量（JPEG/WEBP，与图片压缩一致）"
+                        )
+                        render_btn = gr.Button("🖼️ 开始转换", variant="primary")
+                        render_file = gr.File(label="下载全部页面", interactive=False)
+
+                    with gr.Column():
+                        render_gallery = gr.Gallery(label="页面预览", columns=3, height="auto")
+                        render_status = gr.Textbox(label="处理状态", interactive=False, lines=6)
+
+                render_btn.click(
+                    fn=processor.pdf_to_images,
+                    inputs=[render_input, render_dpi, render_format, render_quality],
+                    outputs=[render_gallery, render_file, render_status],
+                    **event_options("document")
+                )
+
+            # 图片合并PDF
+            with gr.Tab("📚 图片合并PDF"):
+                gr.Markdown(functions["图片合并PDF"]["description"])
+                with gr.Row():
+                    with gr.Column():
+                        merge_input = gr.File(
+                            label="上传图片（按上传顺序排列）",
+                            file_count="multiple",
+                            file_types=["image"],
+                            type="filepath"
+                        )
+                        merge_quality = gr.Slider(
+                            minimum=10,
+                            maximum=100,
+                            step=5,
+                            value=DEFAULT_QUALITY,
+                            label="图片质量（与图片压缩一致）"
+                        )
+                        merge_btn = gr.Button("📚 合并为PDF", variant="primary")
+
+                    with gr.Column():
+                        merge_output = gr.File(label="合并后的PDF", interactive=False)
+                        merge_status = gr.Textbox(label="合并状态", interactive=False, lines=10)
+
+                merge_btn.click(
+                    fn=processor.images_to_pdf,
+                    inputs=[merge_input, merge_quality],
+                    outputs=[merge_output, merge_status],
+                    **event_options("document")
+                )
+
+            # PDF压缩
+            with gr.Tab("📦 PDF压缩"):
+                gr.Markdown(functions["PDF压缩"]["description"])
+                with gr.Row():
+                    with gr.Column():
+                        compress_input = gr.File(label="上传PDF文件", file_types=[".pdf"], type="filepath")
+                        compress_dpi = gr.Slider(
+                            minimum=72,
+                            maximum=300,
+                            step=1,
+                            value=150,
+                            label="图片分辨率上限（DPI）"
+                        )
+                        compress_quality = gr.Slider(
+                            minimum=10,
+                            maximum=95,
+                            step=5,
+                            value=75,
+                            label="图片质量"
+                        )
+                        compress_btn = gr.Button("📦 开始压缩", variant="primary")
+
+                    with gr.Column():
+                        compress_output = gr.File(label="压缩后的PDF", interactive=False)
+                        compress_status = gr.Textbox(label="压缩状态", interactive=False, lines=10)
+
+                compress_btn.click(
+                    fn=processor.compress_pdf,
+                    inputs=[compress_input, compress_dpi, compress_quality],
+                    outputs=[compress_output, compress_status],
+                    **event_options("document")
+                )
+
+            # 全文搜索
+            with gr.Tab("🔍 全文搜索"):
+                gr.Markdown(functions["全文搜索"]["description"] + "（在“文本提取”中处理过的文档会自动加入索引）")
+                with gr.Row():
+                    search_query = gr.Textbox(label="搜索内容", placeholder="输入关键词，多个词用空格分隔", scale=4)
+                    search_btn = gr.Button("🔍 搜索", variant="primary", scale=1)
+                search_status = gr.Textbox(label="搜索状态", interactive=False)
+                search_results = gr.Dataframe(
+                    headers=["文档", "页码", "摘要"],
+                    datatype=["str", "number", "str"],
+                    interactive=False,
+                    wrap=True
+                )
+
+                def search_documents(query, browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    return (*processor.search_documents(query, owner), browser_id)
+
+                # 索引查询为毫秒级，不经过队列
+                for trigger in (search_btn.click, search_query.submit):
+                    trigger(
+                        fn=search_documents,
+                        inputs=[search_query, owner_id],
+                        outputs=[search_results, search_status, owner_id],
+                        **event_options("html")
+                    )
+
+
+# 导出接口
+__all__ = ["DocumentProcessor", "create_document_processing_interface"]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图像处理HTTP接口模块
+与Gradio界面挂载在同一服务上，供后端服务批量调用：上传图片（multipart表单或原始字节），
+直接返回编码后的图片字节，不经过界面的JSON/base64传输。每个操作一个端点，另有链式流水线端点
+
+    GET  /api/image                    操作和参数说明
+    POST /api/image/{操作}             参数放在表单字段或查询参数中
+    POST /api/image/pipeline           steps 为JSON数组，如 [{"op": "resize", "width": 800, "height": 600}]
+
+output_format / output_quality 可覆盖输出编码。所有端点都要求请求头 Authorization: Bearer <令牌>
+创建时间: 2025-06-19
+"""
+
+import asyncio
+import hmac
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.image_codec import FILE_EXTENSIONS
+from modules.image_pipeline import (
+    OPERATIONS, PipelineError, describe_operations, parse_params, parse_steps, process_bytes
+)
+
+logger = logging.getLogger(__name__)
+
+_MEDIA_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+class RequestTooLarge(Exception):
+    """上传超过大小限制"""
+
+
+async def _read_input(request, max_upload_bytes: int) -> Tuple[bytes, Dict[str, str]]:
+    """读取上传的图片和参数：multipart表单的 image 字段，或整个请求体为图片字节；参数合并查询参数和表单字段"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_upload_bytes:
+        raise RequestTooLarge()
+    params = dict(request.query_params)
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        try:
+            upload = form.get("image")
+            if upload is None or isinstance(upload, str):
+                raise PipelineError("缺少图片：表单字段 image")
+            # 没有Content-Length时表单文件大小未知，最多读取上限加一个字节用于判断是否超限
+            data = await upload.read(max_upload_bytes + 1)
+            params.update({key: value for key, value in form.items() if isinstance(value, str)})
+        finally:
+            await form.close()
+    else:
+        chunks = []
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_upload_bytes:
+                raise RequestTooLarge()
+            chunks.append(chunk)
+        data = b"".join(chunks)
+
+    if len(data) > max_upload_bytes:
+        raise RequestTooLarge()
+    if not data:
+        raise PipelineError("缺少图片")
+    return data, params
+
+
+def _authorized(request, api_token: str) -> bool:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), api_token.encode())
+
+
+def create_image_api_routes(processor: Any = None, enabled: bool = False, api_token: str = "",
+                            prefix: str = "/api/image", max_upload_bytes: int = 50 * 1024 * 1024,
+                            concurrency: int = 4, max_steps: int = 16,
+                            max_output_pixels: int = 100_000_000) -> List[Any]:
+    """创建图像处理接口路由（processor 默认为带指标统计的 ImageToolProcessor）
+
+    接口不经过Gradio的登录校验，未设置 api_token 时不挂载。
+    """
+    if not enabled:
+        return []
+    if not api_token:
+        logger.warning("图像处理接口已开启但未设置 api_token，不挂载 %s", prefix)
+        return []
+    from starlette.concurrency import run_in_threadpool
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    if processor is None:
+        from modules.image_tools import ImageToolProcessor
+        from modules.metrics import instrument_processor
+        processor = instrument_processor(ImageToolProcessor(), "image_api")
+
+    # 在事件循环中首次使用时创建
+    limits: Dict[str, asyncio.Semaphore] = {}
+
+    def error(status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        return JSONResponse({"error": message}, status_code=status_code, headers=headers)
+
+    def authenticated(endpoint):
+        async def wrapper(request):
+            if not _authorized(request, api_token):
+                return error(401, "缺少或错误的令牌", {"WWW-Authenticate": "Bearer"})
+            return await endpoint(request)
+        return wrapper
+
+    async def handle(request, steps_source) -> Any:
+        try:
+            data, params = await _read_input(request, max_upload_bytes)
+            steps = steps_source(params)
+            image_format = params.get("output_format") or None
+            quality = int(params["output_quality"]) if params.get("output_quality") else None
+        except RequestTooLarge:
+            return error(413, f"图片超过大小限制 {max_upload_bytes // (1024 * 1024)} MB")
+        except PipelineError as e:
+            return error(400, str(e))
+        except ValueError as e:
+            return error(400, f"参数错误: {e}")
+
+        limit = limits.get("process")
+        if limit is None:
+            limit = limits["process"] = asyncio.Semaphore(concurrency)
+        start = time.perf_counter()
+        async with limit:
+            try:
+                body, image_format, result = await run_in_threadpool(
+                    process_bytes, processor, data, steps, image_format, quality)
+            except PipelineError as e:
+                return error(422, str(e))
+        return Response(body, media_type=_MEDIA_TYPES[image_format], headers={
+            "Content-Disposition": f'inline; filename="result{FILE_EXTENSIONS[image_format]}"',
+            "X-Image-Width": str(result.width),
+            "X-Image-Height": str(result.height),
+            "X-Processing-Time-Ms": f"{(time.perf_counter() - start) * 1000:.1f}"
+        })
+
+    async def list_operations(request):
+        return JSONResponse({"operations": describe_operations(), "pipeline": f"{prefix}/pipeline"})
+
+    async def pipeline_endpoint(request):
+        def steps_source(params: Dict[str, str]):
+            if "steps" not in params:
+                raise PipelineError("缺少参数 steps")
+            return parse_steps(params["steps"], max_steps, max_output_pixels)
+        return await handle(request, steps_source)
+
+    async def operation_endpoint(request):
+        operation = request.path_params["operation"]
+        if operation not in OPERATIONS:
+            return error(404, f"未知操作: {operation}（可用: {', '.join(OPERATIONS)}）")
+        return await handle(request, lambda params: [
+            (operation, parse_params(operation, params, max_output_pixels=max_output_pixels))
+        ])
+
+    return [
+        Route(prefix, authenticated(list_operations), methods=["GET"]),
+        Route(f"{prefix}/pipeline", authenticated(pipeline_endpoint), methods=["POST"]),
+        Route(prefix + "/{operation}", authenticated(operation_endpoint), methods=["POST"])
+    ]
+
+
+# 导出接口
+__all__ = ["create_image_api_routes"]
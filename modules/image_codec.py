@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图像编码模块
+图片压缩、PDF导入导出共用的编码参数（不依赖gradio，可在进程池子进程中使用）
+创建时间: 2025-06-19
+"""
+
+import io
+
+from config import DEFAULT_SETTINGS
+from modules.module_loader import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+DEFAULT_QUALITY = DEFAULT_SETTINGS["image_quality"]
+
+FILE_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+
+def flatten_to_rgb(image):
+    """带透明通道或调色板的图像合成到白色背景上（JPEG不支持透明）"""
+    if image.mode in ("RGBA", "LA", "P"):
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    if image.mode not in ("RGB", "L"):
+        return image.convert("RGB")
+    return image
+
+
+def save_image(image, output, image_format: str = "JPEG", quality: int = DEFAULT_QUALITY):
+    """按统一参数编码图像：JPEG与图片压缩功能一致（optimize），WEBP使用相同质量"""
+    image_format = image_format.upper()
+    if image_format == "JPEG":
+        flatten_to_rgb(image).save(output, format="JPEG", quality=quality, optimize=True)
+    elif image_format == "WEBP":
+        image.save(output, format="WEBP", quality=quality, method=4)
+    elif image_format == "PNG":
+        image.save(output, format="PNG")
+    else:
+        raise ValueError(f"不支持的图片格式: {image_format}")
+
+
+def encode_image(image, image_format: str = "JPEG", quality: int = DEFAULT_QUALITY) -> bytes:
+    """编码为字节"""
+    output = io.BytesIO()
+    save_image(image, output, image_format, quality)
+    return output.getvalue()
+
+
+# 导出接口
+__all__ = ["DEFAULT_QUALITY", "FILE_EXTENSIONS", "flatten_to_rgb", "save_image", "encode_image"]
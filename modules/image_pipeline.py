@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图像处理流水线模块
+ImageToolProcessor 各操作的参数说明、参数解析（字符串参数转换为对应类型）和链式执行，
+HTTP接口与命令行批处理共用（不依赖gradio）
+创建时间: 2025-06-19
+"""
+
+import io
+import json
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from modules.image_codec import DEFAULT_QUALITY, FILE_EXTENSIONS, encode_image
+from modules.module_loader import lazy_import
+
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+# 操作名 -> 处理器方法和参数 {参数名: (类型, 默认值)}，默认值为None的参数必填
+OPERATIONS: Dict[str, Dict[str, Any]] = {
+    "compress": {
+        "method": "compress_image",
+        "params": {"quality": (int, DEFAULT_QUALITY)},
+        "description": "JPEG压缩"
+    },
+    "convert": {
+        "method": "convert_format",
+        "params": {"format_type": (str, "JPEG")},
+        "description": "格式转换（JPEG/PNG/WEBP）"
+    },
+    "enhance": {
+        "method": "enhance_image",
+        "params": {"brightness": (float, 1.0), "contrast": (float, 1.0),
+                   "saturation": (float, 1.0), "sharpness": (float, 1.0)},
+        "description": "亮度、对比度、饱和度、锐度调整"
+    },
+    "filter": {
+        "method": "apply_filter",
+        "params": {"filter_type": (str, "模糊")},
+        "description": "滤镜"
+    },
+    "resize": {
+        "method": "resize_image",
+        "params": {"width": (int, None), "height": (int, None), "keep_ratio": (bool, True)},
+        "description": "尺寸调整"
+    }
+}
+
+# 滤镜的英文别名（界面使用中文名称）
+FILTER_ALIASES = {
+    "blur": "模糊", "sharpen": "锐化", "edges": "边缘检测", "emboss": "浮雕", "contour": "轮廓",
+    "detail": "细节增强", "smooth": "平滑", "grayscale": "黑白", "invert": "反色",
+    "mirror": "镜像翻转", "flip": "上下翻转"
+}
+
+# 参数的简写（如 format=PNG、filter=blur）
+_PARAM_ALIASES = {"format": "format_type", "filter": "filter_type"}
+
+# convert_format 的编码质量
+_CONVERT_QUALITY = 95
+
+_TRUE_VALUES = {"1", "true", "yes", "on", "是"}
+_FALSE_VALUES = {"0", "false", "no", "off", "否", ""}
+
+
+class PipelineError(ValueError):
+    """参数错误或处理失败（消息可直接返回给调用方）"""
+
+
+def _coerce(name: str, kind: type, value: Any) -> Any:
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE_VALUES:
+            return True
+        if text in _FALSE_VALUES:
+            return False
+        raise PipelineError(f"参数 {name} 应为布尔值: {value!r}")
+    try:
+        if kind is int:
+            return int(float(value))
+        return kind(value)
+    except (TypeError, ValueError):
+        raise PipelineError(f"参数 {name} 类型错误: {value!r}") from None
+
+
+def check_output_pixels(operation: str, params: Dict[str, Any], max_output_pixels: Optional[int] = None):
+    """拒绝输出像素数超过上限（max_output_pixels 和 PIL 的 Image.MAX_IMAGE_PIXELS 中较小者）的操作
+
+    只有不保持比例的尺寸调整会放大图片（保持比例时只缩小）。
+    """
+    if operation != "resize" or params["keep_ratio"]:
+        return
+    limits = [limit for limit in (max_output_pixels, Image.MAX_IMAGE_PIXELS) if limit]
+    if limits and params["width"] * params["height"] > min(limits):
+        raise PipelineError(f"输出尺寸 {params['width']} x {params['height']} 超过上限"
+                            f"（{min(limits) // 1_000_000} 百万像素）")
+
+
+def parse_params(operation: str, values: Mapping[str, Any],
+                 operations: Optional[Dict[str, Dict[str, Any]]] = None,
+                 max_output_pixels: Optional[int] = None) -> Dict[str, Any]:
+    """按操作的参数说明解析参数（未列出的键忽略）；operations 默认为图像操作表，格式相同的其他操作表也可使用
+
+    图像操作的输出像素数超过上限时抛出 PipelineError（见 check_output_pixels）。
+    """
+    operations = OPERATIONS if operations is None else operations
+    spec = operations.get(operation)
+    if spec is None:
+        raise PipelineError(f"未知操作: {operation}（可用: {', '.join(operations)}）")
+    values = {_PARAM_ALIASES.get(key, key): value for key, value in values.items()}
+    params = {}
+    for name, (kind, default) in spec["params"].items():
+        value = values.get(name)
+        if value is None or value == "":
+            if default is None:
+                raise PipelineError(f"操作 {operation} 缺少参数 {name}")
+            value = default
+        params[name] = _coerce(name, kind, value)
+    if "filter_type" in params:
+        params["filter_type"] = FILTER_ALIASES.get(params["filter_type"].lower(), params["filter_type"])
+    if "format_type" in params:
+        params["format_type"] = params["format_type"].upper().replace("JPG", "JPEG")
+        if params["format_type"] not in FILE_EXTENSIONS:
+            raise PipelineError(f"不支持的格式: {params['format_type']}")
+    if operations is OPERATIONS:
+        check_output_pixels(operation, params, max_output_pixels)
+    return params
+
+
+def parse_steps(steps: Any, max_steps: int = 16,
+                max_output_pixels: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """解析流水线步骤：JSON字符串或列表，每步为 {"op": 操作名, 参数...}"""
+    if isinstance(steps, (str, bytes)):
+        try:
+            steps = json.loads(steps)
+        except ValueError as e:
+            raise PipelineError(f"steps 不是合法的JSON: {e}") from None
+    if not isinstance(steps, list) or not steps:
+        raise PipelineError("steps 应为非空数组")
+    if len(steps) > max_steps:
+        raise PipelineError(f"步骤数超过上限 {max_steps}")
+    parsed = []
+    for step in steps:
+        if not isinstance(step, dict) or "op" not in step:
+            raise PipelineError(f"步骤格式错误: {step!r}")
+        parsed.append((step["op"], parse_params(step["op"], step, max_output_pixels=max_output_pixels)))
+    return parsed
+
+
+def decode_image(data: bytes) -> Tuple["Image.Image", Optional[str]]:
+    """解码上传的图片（按EXIF方向旋转，与界面上传一致），返回 (图像, 原格式)"""
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except Image.UnidentifiedImageError:
+        raise PipelineError("无法识别的图片格式") from None
+    except Image.DecompressionBombError as e:
+        raise PipelineError(f"图片像素数过大: {e}") from None
+    except (OSError, SyntaxError, ValueError) as e:
+        raise PipelineError(f"无法识别的图片: {e}") from None
+    return image, source_format
+
+
+def output_encoding(steps: List[Tuple[str, Dict[str, Any]]], source_format: Optional[str]) -> Tuple[str, int]:
+    """输出编码：最后一个压缩/格式转换步骤决定格式和质量，否则沿用原图格式"""
+    image_format = source_format if source_format in FILE_EXTENSIONS else "PNG"
+    quality = DEFAULT_QUALITY
+    for operation, params in steps:
+        if operation == "compress":
+            image_format, quality = "JPEG", params["quality"]
+        elif operation == "convert":
+            image_format, quality = params["format_type"], _CONVERT_QUALITY
+    return image_format, quality
+
+
+def apply_operation(processor: Any, operation: str, image: "Image.Image",
+                    params: Dict[str, Any]) -> Tuple["Image.Image", str]:
+    """执行单个操作；处理器返回失败状态时抛出 PipelineError"""
+    result, status = getattr(processor, OPERATIONS[operation]["method"])(image, **params)
+    if result is None:
+        raise PipelineError(status.lstrip("❌ ").strip())
+    return result, status
+
+
+def run_pipeline(processor: Any, image: "Image.Image",
+                 steps: List[Tuple[str, Dict[str, Any]]]) -> Tuple["Image.Image", List[str]]:
+    """依次执行各步骤，返回 (结果图像, 各步骤状态)"""
+    statuses = []
+    for operation, params in steps:
+        image, status = apply_operation(processor, operation, image, params)
+        statuses.append(status)
+    return image, statuses
+
+
+def process_bytes(processor: Any, data: bytes, steps: List[Tuple[str, Dict[str, Any]]],
+                  image_format: Optional[str] = None, quality: Optional[int] = None) -> Tuple[bytes, str, "Image.Image"]:
+    """字节进、字节出：解码、执行流水线、编码，返回 (编码结果, 格式, 结果图像)"""
+    image, source_format = decode_image(data)
+    result, _ = run_pipeline(processor, image, steps)
+    default_format, default_quality = output_encoding(steps, source_format)
+    image_format = (image_format or default_format).upper().replace("JPG", "JPEG")
+    if image_format not in FILE_EXTENSIONS:
+        raise PipelineError(f"不支持的输出格式: {image_format}")
+    return encode_image(result, image_format, quality or default_quality), image_format, result
+
+
+def describe_operations(operations: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """操作和参数说明（JSON可序列化）"""
+    operations = OPERATIONS if operations is None else operations
+    return {
+        name: {
+            "description": spec["description"],
+            "params": {
+                param: {"type": kind.__name__, "default": default, "required": default is None}
+                for param, (kind, default) in spec["params"].items()
+            }
+        }
+        for name, spec in operations.items()
+    }
+
+
+# 导出接口
+__all__ = [
+    "OPERATIONS", "FILTER_ALIASES", "PipelineError", "check_output_pixels", "parse_params", "parse_steps", "decode_image",
+    "output_encoding", "apply_operation", "run_pipeline", "process_bytes", "describe_operations"
+]
@@ -6,12 +6,22 @@
 创建时间: 2025-06-19
 """
 
-import gradio as gr
+from __future__ import annotations
+
 import io
 import time
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps
-import numpy as np
 from typing import Optional, Tuple
+from modules.image_codec import save_image
+from modules.metrics import instrument_processor
+from modules.module_loader import lazy_import
+from modules.queue_config import event_options
+from modules.result_cache import cached_operation
+
+# PIL在处理器首次使用时才导入
+Image = lazy_import("PIL.Image")
+ImageEnhance = lazy_import("PIL.ImageEnhance")
+ImageFilter = lazy_import("PIL.ImageFilter")
+ImageOps = lazy_import("PIL.ImageOps")
 
 class ImageToolProcessor:
     """图像工具处理器"""
@@ -20,6 +30,7 @@ class ImageToolProcessor:
         self.name = "图像工具"
         self.description = "图像处理和编辑功能"
         
+    @cached_operation
     def compress_image(self, image: Image.Image, quality: int = 85) -> Tuple[Image.Image, str]:
         """压缩图像"""
         if image is None:
@@ -29,17 +40,9 @@ class ImageToolProcessor:
             # 获取原始文件大小（估算）
             original_size = len(image.tobytes())
             
-            # 转换为RGB模式（如果需要）
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            
-            # 使用BytesIO进行压缩
+            # 使用BytesIO进行压缩（透明图像合成到白色背景，参数与PDF导入导出共用）
             output = io.BytesIO()
-            image.save(output, format='JPEG', quality=quality, optimize=True)
+            save_image(image, output, 'JPEG', quality)
             compressed_size = output.tell()
             output.seek(0)
             compressed_image = Image.open(output)
@@ -61,6 +64,7 @@ class ImageToolProcessor:
         except Exception as e:
             return None, f"❌ 压缩失败: {str(e)}"
     
+    @cached_operation
     def convert_format(self, image: Image.Image, format_type: str) -> Tuple[Image.Image, str]:
         """转换图像格式"""
         if image is None:
@@ -101,6 +105,7 @@ class ImageToolProcessor:
         except Exception as e:
             return None, f"❌ 转换失败: {str(e)}"
     
+    @cached_operation
     def enhance_image(self, image: Image.Image, brightness: float = 1.0, 
                      contrast: float = 1.0, saturation: float = 1.0, 
                      sharpness: float = 1.0) -> Tuple[Image.Image, str]:
@@ -144,6 +149,7 @@ class ImageToolProcessor:
         except Exception as e:
             return None, f"❌ 增强失败: {str(e)}"
     
+    @cached_operation
     def apply_filter(self, image: Image.Image, filter_type: str) -> Tuple[Image.Image, str]:
         """应用滤镜"""
         if image is None:
@@ -189,6 +195,7 @@ class ImageToolProcessor:
         except Exception as e:
             return None, f"❌ 滤镜应用失败: {str(e)}"
     
+    @cached_operation
     def resize_image(self, image: Image.Image, width: int, height: int, 
                     keep_ratio: bool = True) -> Tuple[Image.Image, str]:
         """调整图片尺寸"""
@@ -202,10 +209,10 @@ class ImageToolProcessor:
             original_size = image.size
             
             if keep_ratio:
-                # 保持宽高比
-                image.thumbnail((width, height), Image.Resampling.LANCZOS)
-                resized_image = image
-                new_size = image.size
+                # 保持宽高比（在副本上缩放，不修改输入及已缓存的图像）
+                resized_image = image.copy()
+                resized_image.thumbnail((width, height), Image.Resampling.LANCZOS)
+                new_size = resized_image.size
             else:
                 # 强制调整到指定尺寸
                 resized_image = image.resize((width, height), Image.Resampling.LANCZOS)
@@ -226,7 +233,10 @@ class ImageToolProcessor:
 
 def create_image_tools_interface():
     """创建图像工具界面"""
-    processor = ImageToolProcessor()
+    # gradio只在构建界面时导入，命令行批处理和HTTP接口只需处理器
+    import gradio as gr
+    
+    processor = instrument_processor(ImageToolProcessor(), "image_tools")
     
     with gr.Tab("🖼️ 图像工具"):
         gr.Markdown("""
@@ -269,7 +279,8 @@ def create_image_tools_interface():
                         compress_btn.click(
                             fn=processor.compress_image,
                             inputs=[compress_input, quality_slider],
-                            outputs=[compress_output, compress_status]
+                            outputs=[compress_output, compress_status],
+                            **event_options("image")
                         )
                     
                     # 格式转换
@@ -301,7 +312,8 @@ def create_image_tools_interface():
                         convert_btn.click(
                             fn=processor.convert_format,
                             inputs=[convert_input, format_choice],
-                            outputs=[convert_output, convert_status]
+                            outputs=[convert_output, convert_status],
+                            **event_options("image")
                         )
             
             # 图像增强
@@ -365,7 +377,8 @@ def create_image_tools_interface():
                             fn=processor.enhance_image,
                             inputs=[enhance_input, brightness_slider, contrast_slider, 
                                    saturation_slider, sharpness_slider],
-                            outputs=[enhance_output, enhance_status]
+                            outputs=[enhance_output, enhance_status],
+                            **event_options("image")
                         )
                     
                     # 滤镜效果
@@ -403,7 +416,8 @@ def create_image_tools_interface():
                         filter_btn.click(
                             fn=processor.apply_filter,
                             inputs=[filter_input, filter_choice],
-                            outputs=[filter_output, filter_status]
+                            outputs=[filter_output, filter_status],
+                            **event_options("image")
                         )
             
             # 尺寸调整
@@ -448,7 +462,8 @@ def create_image_tools_interface():
                 resize_btn.click(
                     fn=processor.resize_image,
                     inputs=[resize_input, width_input, height_input, keep_ratio],
-                    outputs=[resize_output, resize_status]
+                    outputs=[resize_output, resize_status],
+                    **event_options("image")
                 )
         
         # 使用说明
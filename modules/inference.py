@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型推理模块
+CPU推理会话的加载与共享（ONNX Runtime为可选依赖）
+创建时间: 2025-06-19
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from modules.model_registry import MODEL_REGISTRY
+
+_sessions: Dict[Tuple[str, Optional[int]], Any] = {}
+_sessions_lock = threading.Lock()
+
+
+def onnxruntime_available() -> bool:
+    """检查是否安装了ONNX Runtime"""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_onnx_session(model_path: str, intra_op_threads: Optional[int] = None):
+    """创建新的CPU推理会话（权重经模型注册表转换后以mmap方式加载）"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    for key, value in MODEL_REGISTRY.session_config().items():
+        options.add_session_config_entry(key, value)
+    return ort.InferenceSession(MODEL_REGISTRY.resolve(model_path), sess_options=options,
+                                providers=["CPUExecutionProvider"])
+
+
+def get_onnx_session(model_path: Optional[str], intra_op_threads: Optional[int] = None):
+    """获取进程内共享的推理会话（首次调用时加载，之后复用）
+
+    模型未配置、文件不存在或未安装ONNX Runtime时返回None，由调用方回退到传统算法。
+    ONNX Runtime的 InferenceSession.run 是线程安全的，多个请求可共享同一会话。
+    """
+    if not model_path or not os.path.exists(model_path) or not onnxruntime_available():
+        return None
+
+    key = (os.path.abspath(model_path), intra_op_threads)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = create_onnx_session(model_path, intra_op_threads)
+            _sessions[key] = session
+        return session
+
+
+class SessionPool:
+    """推理会话池：按需创建并预热最多 size 个会话，并发请求各自独占一个会话
+
+    每个会话使用较少的线程（默认1个），多个会话并行即可占满所有核心，
+    避免单个会话的线程池在并发请求间争抢。
+    """
+
+    def __init__(self, model_path: str, size: int, intra_op_threads: int = 1,
+                 warmup: Optional[Callable[[Any], None]] = None):
+        self.model_path = model_path
+        self.size = max(1, size)
+        self.intra_op_threads = intra_op_threads
+        self.warmup = warmup
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_session(self):
+        session = create_onnx_session(self.model_path, self.intra_op_threads)
+        if self.warmup is not None:
+            # 首次推理会触发内存分配和算子初始化，提前完成避免首个请求变慢
+            self.warmup(session)
+        return session
+
+    @contextmanager
+    def acquire(self):
+        """借出一个会话，用完自动归还（LIFO，优先复用最近使用过的热会话）"""
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    session = self._new_session()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                session = self._idle.get()
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def prewarm(self):
+        """创建并预热剩余的全部会话"""
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._new_session())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        """会话池状态"""
+        return {"size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+
+_pools: Dict[str, SessionPool] = {}
+
+
+def get_session_pool(model_path: Optional[str], size: Optional[int] = None, intra_op_threads: int = 1,
+                     warmup: Optional[Callable[[Any], None]] = None) -> Optional[SessionPool]:
+    """获取进程内共享的会话池，size 默认为CPU核心数；模型不可用时返回None"""
+    if not model_path or not os.path.exists(model_path) or not onnxruntime_available():
+        return None
+
+    key = os.path.abspath(model_path)
+    with _sessions_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SessionPool(model_path, size or os.cpu_count() or 1, intra_op_threads, warmup)
+            _pools[key] = pool
+        return pool
+
+
+# 导出接口
+__all__ = [
+    "onnxruntime_available", "create_onnx_session", "get_onnx_session",
+    "SessionPool", "get_session_pool"
+]
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+链接健康检查模块
+通过共享的异步HTTP连接池（httpx，gradio的依赖）并发探测链接：连接复用、
+按主机限制并发，HEAD失败时回退为只读取响应头的GET；同时根据 X-Frame-Options 和
+CSP frame-ancestors 判断网站是否允许被iframe嵌入。结果按TTL缓存，条目数有上限（按最近使用淘汰）
+创建时间: 2025-06-19
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from modules.async_http import AsyncHttpPool, httpx
+
+# HEAD返回这些状态码时改用GET重试（很多服务器不支持或拒绝HEAD）
+_HEAD_FALLBACK_STATUSES = {400, 403, 404, 405, 501}
+
+
+def frame_policy(headers: "httpx.Headers") -> Tuple[Optional[bool], str]:
+    """根据响应头判断是否允许被其他站点嵌入，返回 (是否允许, 原因)
+
+    CSP frame-ancestors 存在时优先于 X-Frame-Options；两者都没有时允许嵌入。
+    """
+    for policy in headers.get_list("content-security-policy"):
+        for directive in policy.split(";"):
+            parts = directive.split()
+            if not parts or parts[0].lower() != "frame-ancestors":
+                continue
+            sources = [source.lower() for source in parts[1:]]
+            if "*" in sources:
+                return True, "CSP frame-ancestors 允许任意来源"
+            if not sources or sources == ["'none'"]:
+                return False, "CSP frame-ancestors 'none'"
+            return False, f"CSP frame-ancestors 仅允许 {' '.join(parts[1:])}"
+
+    frame_options = headers.get("x-frame-options", "").strip().upper()
+    if frame_options:
+        return False, f"X-Frame-Options: {frame_options}"
+    return True, ""
+
+
+class LinkHealthChecker:
+    """并发链接检查器（同步接口，可在Gradio工作线程中直接调用）"""
+
+    def __init__(self, pool: Optional[AsyncHttpPool] = None, ttl: float = 1800.0, failure_ttl: float = 300.0,
+                 cache_entries: int = 20000):
+        self.pool = pool or AsyncHttpPool()
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.cache_entries = cache_entries
+
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # 只在事件循环线程中访问
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self.stats = {"probes": 0, "cache_hits": 0, "failures": 0, "get_fallbacks": 0}
+
+    def cached(self, url: str) -> Optional[Dict[str, Any]]:
+        """未过期的缓存结果"""
+        with self._cache_lock:
+            result = self._cache.get(url)
+            if result is not None:
+                self._cache.move_to_end(url)
+        if result is None:
+            return None
+        ttl = self.ttl if result["ok"] else self.failure_ttl
+        if time.time() - result["checked_at"] > ttl:
+            return None
+        return result
+
+    async def _probe(self, url: str) -> Dict[str, Any]:
+        client = self.pool.client
+        start = time.perf_counter()
+        result = {"url": url, "ok": False, "status": None, "final_url": url, "error": "",
+                  "embeddable": None, "embed_reason": "", "elapsed": 0.0, "checked_at": 0.0}
+        async with self.pool.host_limit(url):
+            try:
+                response = await client.head(url)
+                if response.status_code in _HEAD_FALLBACK_STATUSES:
+                    self.stats["get_fallbacks"] += 1
+                    # 只读取响应头，不下载正文
+                    async with client.stream("GET", url) as response:
+                        pass
+                result["status"] = response.status_code
+                result["final_url"] = str(response.url)
+                result["ok"] = response.status_code < 400
+                result["embeddable"], result["embed_reason"] = frame_policy(response.headers)
+            except httpx.TimeoutException:
+                result["error"] = f"超时（{self.pool.timeout:g} 秒）"
+            except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+                result["error"] = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        result["elapsed"] = time.perf_counter() - start
+        result["checked_at"] = time.time()
+
+        self.stats["probes"] += 1
+        if not result["ok"]:
+            self.stats["failures"] += 1
+        with self._cache_lock:
+            self._cache[url] = result
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    async def _check(self, url: str) -> Dict[str, Any]:
+        # 同一URL同时只探测一次，并发请求共享结果
+        future = self._in_flight.get(url)
+        if future is None:
+            future = asyncio.ensure_future(self._probe(url))
+            self._in_flight[url] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def _check_all(self, urls: List[str]) -> List[Dict[str, Any]]:
+        return await asyncio.gather(*(self._check(url) for url in urls))
+
+    def check_many(self, urls: Iterable[str], force: bool = False,
+                   timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """批量检查，返回 URL -> 结果（未过期的缓存结果直接返回，除非 force=True）"""
+        results = {}
+        pending = []
+        for url in dict.fromkeys(urls):
+            result = None if force else self.cached(url)
+            if result is not None:
+                self.stats["cache_hits"] += 1
+                results[url] = result
+            else:
+                pending.append(url)
+        if pending:
+            for result in self.pool.run(self._check_all(pending), timeout):
+                results[result["url"]] = result
+        return results
+
+    def check(self, url: str, force: bool = False) -> Dict[str, Any]:
+        """检查单个链接"""
+        return self.check_many([url], force=force)[url]
+
+    def start_background(self, url_source: Callable[[], Iterable[str]], interval: float):
+        """后台线程定期检查 url_source() 返回的全部链接（重复调用无副作用）"""
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop_event.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, args=(url_source, interval),
+                name="link-health-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def _sweep_loop(self, url_source: Callable[[], Iterable[str]], interval: float):
+        while not self._stop_event.is_set():
+            try:
+                self.check_many(url_source())
+            except Exception:
+                # 单轮检查失败不影响后续检查
+                pass
+            self._stop_event.wait(interval)
+
+    def stop(self):
+        """停止后台检查"""
+        self._stop_event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            results = list(self._cache.values())
+        stats = dict(self.stats)
+        stats["cached"] = len(results)
+        stats["broken"] = sum(1 for result in results if not result["ok"])
+        stats["not_embeddable"] = sum(1 for result in results if result["embeddable"] is False)
+        return stats
+
+
+_checker: Optional[LinkHealthChecker] = None
+_checker_lock = threading.Lock()
+
+
+def get_link_checker(**options) -> LinkHealthChecker:
+    """获取进程内共享的链接检查器（参数只在首次创建时生效）"""
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = LinkHealthChecker(**options)
+        return _checker
+
+
+# 导出接口
+__all__ = ["frame_policy", "LinkHealthChecker", "get_link_checker"]
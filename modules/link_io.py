@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+链接导入导出模块
+流式解析浏览器书签HTML（Netscape格式）、JSON数组/JSON Lines和CSV：按块读取文件，逐条产出链接，
+内存占用与文件大小无关（书签中内嵌的base64图标等属性直接丢弃）；单次遍历完成URL规范化和去重。
+导出同样逐条生成，不在内存中拼接整个文件
+创建时间: 2025-06-19
+"""
+
+import csv
+import html
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_CATEGORY = "其他"
+
+# 每次从文件读取的字符数
+CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {"HTML": ".html", "JSON": ".json", "CSV": ".csv"}
+
+_CSV_FIELDS = ["name", "url", "description", "category"]
+
+# 书签中内嵌的图标属性（ICON="data:..."、ICON_URI="..."）
+_ICON_ATTRIBUTE = re.compile(r'\s+ICON(?:_URI)?\s*=\s*"[^"]*"', re.IGNORECASE)
+
+# 常见的列名/键名别名（浏览器和其他书签工具导出的格式）
+_FIELD_ALIASES = {
+    "name": ("name", "title", "名称"),
+    "url": ("url", "href", "link", "网址"),
+    "description": ("description", "desc", "note", "描述"),
+    "category": ("category", "folder", "group", "分类")
+}
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """规范化URL用于去重：补全协议、协议和主机名小写、去掉默认端口和片段；非网页链接返回None"""
+    url = (url or "").strip()
+    if not url:
+        return None
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return None
+
+    host = parts.hostname
+    if ":" in host:
+        host = f"[{host}]"
+    if port and port != {"http": 80, "https": 443}[scheme]:
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+
+def _pick(record: Dict[str, str], field: str) -> str:
+    lowered = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    for alias in _FIELD_ALIASES[field]:
+        value = lowered.get(alias)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def _record_to_link(record: Dict[str, str]) -> Dict[str, str]:
+    return {field: _pick(record, field) for field in _CSV_FIELDS}
+
+
+class BookmarkParser(HTMLParser):
+    """浏览器书签HTML解析器：链接的分类取所在的最内层文件夹名"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[Dict[str, str]] = []
+        self._folders: List[Optional[str]] = []
+        self._pending_folder: Optional[str] = None
+        self._text_target: Optional[str] = None
+        self._text = ""
+        self._current: Optional[Dict[str, str]] = None
+
+    def _finish_text(self):
+        text = " ".join(self._text.split())
+        if self._text_target == "folder":
+            self._pending_folder = text
+        elif self._text_target == "name" and self._current is not None:
+            self._current["name"] = text
+        elif self._text_target == "description" and self.links:
+            self.links[-1]["description"] = text
+        self._text_target = None
+        self._text = ""
+
+    def _category(self) -> str:
+        for folder in reversed(self._folders):
+            if folder:
+                return folder
+        return DEFAULT_CATEGORY
+
+    def handle_starttag(self, tag, attrs):
+        if self._text_target is not None:
+            self._finish_text()
+        if tag == "h3":
+            self._text_target = "folder"
+        elif tag == "dl":
+            self._folders.append(self._pending_folder)
+            self._pending_folder = None
+        elif tag == "a":
+            # 只保留需要的属性，ICON等内嵌数据不保存
+            href = dict(attrs).get("href", "")
+            self._current = {"name": "", "url": href, "description": "", "category": self._category()}
+            self._text_target = "name"
+        elif tag == "dd":
+            self._text_target = "description"
+
+    def handle_endtag(self, tag):
+        if self._text_target is not None and tag in ("h3", "a"):
+            self._finish_text()
+        if tag == "a" and self._current is not None:
+            self.links.append(self._current)
+            self._current = None
+        elif tag == "dl" and self._folders:
+            if self._text_target is not None:
+                self._finish_text()
+            self._folders.pop()
+
+    def handle_data(self, data):
+        if self._text_target is not None:
+            self._text += data
+
+    def close(self):
+        super().close()
+        if self._text_target is not None:
+            self._finish_text()
+
+
+def iter_bookmarks_html(stream: TextIO) -> Iterator[Dict[str, str]]:
+    """流式解析书签HTML
+
+    Firefox等导出的书签为每个链接内嵌base64图标，占文件的大部分；
+    送入解析器前先按完整标签去掉这些属性，避免逐字符解析。
+    """
+    parser = BookmarkParser()
+    carry = ""
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        text = carry + chunk
+        # 末尾未闭合的标签留到下一块
+        cut = text.rfind("<")
+        if cut > text.rfind(">"):
+            text, carry = text[:cut], text[cut:]
+        else:
+            carry = ""
+        parser.feed(_ICON_ATTRIBUTE.sub("", text))
+        # <DD>描述可能跟在链接之后的下一块中，保留最后一条直到下一条出现
+        if len(parser.links) > 1:
+            yield from parser.links[:-1]
+            del parser.links[:-1]
+    parser.feed(carry)
+    parser.close()
+    yield from parser.links
+
+
+def iter_json_links(stream: TextIO) -> Iterator[Dict[str, str]]:
+    """流式解析JSON：顶层数组逐个元素解码；也支持每行一个对象的JSON Lines"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    in_array = None
+    exhausted = False
+
+    while True:
+        # 跳过空白和分隔符
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) or exhausted:
+                break
+            chunk = stream.read(CHUNK_SIZE)
+            buffer, position = buffer[position:] + chunk, 0
+            exhausted = not chunk
+        if position >= len(buffer):
+            return
+
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        if in_array and buffer[position] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            chunk = stream.read(CHUNK_SIZE)
+            buffer, position = buffer[position:] + chunk, 0
+            exhausted = not chunk
+            continue
+        position = end
+        if isinstance(record, dict):
+            yield _record_to_link(record)
+
+
+def iter_csv_links(stream: TextIO) -> Iterator[Dict[str, str]]:
+    """流式解析CSV（首行为列名）"""
+    for record in csv.DictReader(stream):
+        yield _record_to_link(record)
+
+
+def detect_format(path: str, stream: TextIO) -> str:
+    """根据扩展名判断格式，无法判断时检查文件开头"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".html", ".htm"):
+        return "HTML"
+    if extension in (".json", ".jsonl", ".ndjson"):
+        return "JSON"
+    if extension == ".csv":
+        return "CSV"
+    head = stream.read(1024)
+    stream.seek(0)
+    stripped = head.lstrip()
+    if stripped.startswith(("[", "{")):
+        return "JSON"
+    if "<!doctype netscape-bookmark-file" in head.lower() or "<dl" in head.lower():
+        return "HTML"
+    return "CSV"
+
+
+_READERS = {"HTML": iter_bookmarks_html, "JSON": iter_json_links, "CSV": iter_csv_links}
+
+
+def iter_import(path: str, stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, str]]:
+    """逐条产出文件中规范化、去重后的链接
+
+    stats（可选）累计 total/imported/invalid/duplicates 计数。
+    """
+    stats = stats if stats is not None else {}
+    for key in ("total", "imported", "invalid", "duplicates"):
+        stats.setdefault(key, 0)
+    seen = set()
+    # utf-8-sig 兼容带BOM的CSV（Excel导出）
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as stream:
+        reader = _READERS[detect_format(path, stream)]
+        for link in reader(stream):
+            stats["total"] += 1
+            url = normalize_url(link["url"])
+            if url is None:
+                stats["invalid"] += 1
+                continue
+            if url in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(url)
+            stats["imported"] += 1
+            yield {
+                "name": link["name"] or urlsplit(url).hostname,
+                "url": url,
+                "description": link["description"],
+                "category": link["category"] or DEFAULT_CATEGORY
+            }
+
+
+def iter_export(links: Iterable[Dict[str, str]], export_format: str) -> Iterator[str]:
+    """逐条生成导出内容；HTML按分类分组，要求链接已按分类排列"""
+    export_format = export_format.upper()
+    if export_format == "JSON":
+        yield "["
+        for index, link in enumerate(links):
+            record = {field: link.get(field, "") for field in _CSV_FIELDS}
+            yield ("," if index else "") + "\n  " + json.dumps(record, ensure_ascii=False)
+        yield "\n]\n"
+    elif export_format == "CSV":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=_CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for link in links:
+            writer.writerow(link)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif export_format == "HTML":
+        yield ("<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+               '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+               "<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n")
+        category = None
+        for link in links:
+            if link["category"] != category:
+                if category is not None:
+                    yield "    </DL><p>\n"
+                category = link["category"]
+                yield f"    <DT><H3>{html.escape(category)}</H3>\n    <DL><p>\n"
+            yield f'        <DT><A HREF="{html.escape(link["url"], quote=True)}">{html.escape(link["name"])}</A>\n'
+            if link.get("description"):
+                yield f"        <DD>{html.escape(link['description'])}\n"
+        if category is not None:
+            yield "    </DL><p>\n"
+        yield "</DL><p>\n"
+    else:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+
+
+def export_to_file(links: Iterable[Dict[str, str]], export_format: str, output_dir: str,
+                   ttl: float = 86400.0) -> str:
+    """导出到输出目录中的新文件（同时清理超过保留时间的旧导出文件），返回文件路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    expire_before = time.time() - ttl
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        try:
+            if os.path.getmtime(path) < expire_before:
+                os.remove(path)
+        except OSError:
+            pass
+
+    export_format = export_format.upper()
+    fd, path = tempfile.mkstemp(prefix="links_", suffix=EXPORT_FORMATS[export_format], dir=output_dir)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        for chunk in iter_export(links, export_format):
+            f.write(chunk)
+    return path
+
+
+# 导出接口
+__all__ = [
+    "DEFAULT_CATEGORY", "EXPORT_FORMATS", "normalize_url", "BookmarkParser", "iter_bookmarks_html",
+    "iter_json_links", "iter_csv_links", "detect_format", "iter_import", "iter_export", "export_to_file"
+]
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网站预览模块
+通过共享的异步HTTP连接池批量抓取网站标题和图标：只解析页面<head>，按ETag/Last-Modified条件请求重新验证；
+图标统一缩放为固定尺寸的PNG，按内容哈希保存在磁盘上（相同图标只存一份）。
+渲染时把一组链接的图标拼成一张雪碧图，以data URI内联在页面中，数百个链接也不产生额外请求
+创建时间: 2025-06-19
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from modules.async_http import AsyncHttpPool, httpx
+from modules.module_loader import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+# 雪碧图每行的图标数
+_SPRITE_COLUMNS = 16
+
+# 图标解码前允许的最大边长：超过的（多为解压炸弹）直接拒绝
+_MAX_ICON_SIDE = 1024
+
+
+class HeadParser(HTMLParser):
+    """只解析<head>：提取<title>和图标链接，遇到<body>后停止"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.icons: List[Tuple[int, str]] = []
+        self.done = False
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag == "link":
+            attributes = dict(attrs)
+            rel = (attributes.get("rel") or "").lower().split()
+            href = attributes.get("href")
+            if href and "icon" in rel:
+                # 优先标准图标，其次apple-touch-icon
+                self.icons.append((0 if "apple-touch-icon" not in rel else 1, href))
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+    def icon_href(self) -> Optional[str]:
+        return min(self.icons)[1] if self.icons else None
+
+
+def normalize_icon(data: bytes, size: int, max_side: int = _MAX_ICON_SIDE) -> Optional[bytes]:
+    """将图标解码并等比缩放到 size×size 的透明PNG（无法解码或尺寸超过 max_side 时返回None，如SVG）"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # 只读取了文件头，解码像素前先检查声明的尺寸
+            if max(image.size) > max_side:
+                return None
+            # ICO包含多个尺寸时PIL默认读取最大的一个
+            icon = image.convert("RGBA")
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        return None
+    icon.thumbnail((size, size), Image.Resampling.LANCZOS)
+    canvas = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    canvas.paste(icon, ((size - icon.width) // 2, (size - icon.height) // 2))
+    output = io.BytesIO()
+    canvas.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+class LinkPreviewFetcher:
+    """网站标题与图标的抓取和缓存"""
+
+    def __init__(self, cache_dir: str, pool: Optional[AsyncHttpPool] = None, icon_size: int = 32,
+                 display_size: int = 20, concurrency: int = 16, ttl: float = 86400.0,
+                 max_html_bytes: int = 256 * 1024, max_icon_bytes: int = 256 * 1024, sprite_cache: int = 64):
+        self.cache_dir = cache_dir
+        self.pool = pool or AsyncHttpPool()
+        self.icon_size = icon_size
+        self.display_size = display_size
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.max_html_bytes = max_html_bytes
+        self.max_icon_bytes = max_icon_bytes
+        self.sprite_cache = sprite_cache
+
+        self._meta: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._meta_lock = threading.Lock()
+        self._sprites: "OrderedDict[str, str]" = OrderedDict()
+        self._sprites_lock = threading.Lock()
+        # 任一链接的标题或图标变化时递增，渲染缓存据此判断是否需要重建
+        self._revisions = itertools.count(1)
+        self.revision = next(self._revisions)
+        # 只在事件循环线程中访问
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self.stats = {"fetches": 0, "not_modified": 0, "icons_downloaded": 0, "errors": 0}
+
+    # ---------- 磁盘缓存 ----------
+
+    def _meta_path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "meta", digest[:2], f"{digest}.json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "icons", digest[:2], f"{digest}.png")
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """已缓存的预览信息 {"title", "icon", ...}（从未抓取过时返回None）"""
+        with self._meta_lock:
+            if url in self._meta:
+                return self._meta[url]
+        try:
+            with open(self._meta_path(url), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+        with self._meta_lock:
+            return self._meta.setdefault(url, meta)
+
+    def _store(self, url: str, meta: Dict[str, Any], previous: Optional[Dict[str, Any]]):
+        self._write_atomic(self._meta_path(url), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        with self._meta_lock:
+            self._meta[url] = meta
+            if previous is None or (previous.get("title"), previous.get("icon")) != (meta["title"], meta["icon"]):
+                self.revision = next(self._revisions)
+
+    def _save_icon(self, data: bytes) -> Optional[str]:
+        """规范化图标并按内容哈希保存，返回哈希（无法解码时返回None）"""
+        normalized = normalize_icon(data, self.icon_size)
+        if normalized is None:
+            return None
+        digest = hashlib.sha256(normalized).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            self._write_atomic(path, normalized)
+        return digest
+
+    # ---------- 抓取 ----------
+
+    @staticmethod
+    def _conditional_headers(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, str]:
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    async def _fetch_page(self, url: str, meta: Dict[str, Any]):
+        """抓取页面<head>，更新标题和图标地址；304时保持不变"""
+        client = self.pool.client
+        headers = self._conditional_headers(meta.get("page_etag"), meta.get("page_last_modified"))
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                self.stats["not_modified"] += 1
+                return
+            if response.status_code >= 400:
+                raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request,
+                                            response=response)
+
+            parser = HeadParser()
+            if "html" in response.headers.get("content-type", "html"):
+                received = 0
+                async for chunk in response.aiter_text():
+                    parser.feed(chunk)
+                    received += len(chunk)
+                    if parser.done or received >= self.max_html_bytes:
+                        break
+
+            base_url = str(response.url)
+            icon_href = parser.icon_href()
+            meta["title"] = " ".join(parser.title.split())[:200]
+            meta["icon_url"] = urljoin(base_url, icon_href) if icon_href else urljoin(base_url, "/favicon.ico")
+            meta["page_etag"] = response.headers.get("etag")
+            meta["page_last_modified"] = response.headers.get("last-modified")
+
+    async def _fetch_icon(self, meta: Dict[str, Any]):
+        """下载图标（图标地址未变时按ETag重新验证）"""
+        icon_url = meta.get("icon_url")
+        if not icon_url:
+            return
+        headers = {}
+        if icon_url == meta.get("icon_source"):
+            headers = self._conditional_headers(meta.get("icon_etag"), meta.get("icon_last_modified"))
+
+        client = self.pool.client
+        async with client.stream("GET", icon_url, headers=headers) as response:
+            if response.status_code == 304:
+                self.stats["not_modified"] += 1
+                return
+            if response.status_code >= 400:
+                meta["icon"] = None
+                return
+            data = bytearray()
+            async for chunk in response.aiter_bytes():
+                data.extend(chunk)
+                if len(data) > self.max_icon_bytes:
+                    meta["icon"] = None
+                    return
+
+        self.stats["icons_downloaded"] += 1
+        # 解码缩放在线程池中执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        meta["icon"] = await loop.run_in_executor(None, self._save_icon, bytes(data))
+        meta["icon_source"] = icon_url
+        meta["icon_etag"] = response.headers.get("etag")
+        meta["icon_last_modified"] = response.headers.get("last-modified")
+
+    async def _fetch(self, url: str) -> Optional[Dict[str, Any]]:
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        previous = await loop.run_in_executor(None, self.get, url)
+        meta = dict(previous or {"url": url, "title": "", "icon": None})
+
+        async with self._limit, self.pool.host_limit(url):
+            self.stats["fetches"] += 1
+            try:
+                await self._fetch_page(url, meta)
+                await self._fetch_icon(meta)
+                meta.pop("error", None)
+            except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+                self.stats["errors"] += 1
+                meta["error"] = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        meta["fetched_at"] = time.time()
+        await loop.run_in_executor(None, self._store, url, meta, previous)
+        return meta
+
+    async def _fetch_shared(self, url: str) -> Optional[Dict[str, Any]]:
+        # 同一URL同时只抓取一次
+        future = self._in_flight.get(url)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(url))
+            self._in_flight[url] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def _fetch_all(self, urls: List[str]) -> List[Optional[Dict[str, Any]]]:
+        return await asyncio.gather(*(self._fetch_shared(url) for url in urls))
+
+    def _stale(self, urls: Iterable[str], force: bool) -> List[str]:
+        now = time.time()
+        stale = []
+        for url in dict.fromkeys(urls):
+            meta = None if force else self.get(url)
+            if meta is None or now - meta.get("fetched_at", 0) > self.ttl:
+                stale.append(url)
+        return stale
+
+    def prefetch(self, urls: Iterable[str], force: bool = False, timeout: Optional[float] = None) -> int:
+        """批量抓取缓存过期或未抓取过的链接，返回实际抓取的数量"""
+        stale = self._stale(urls, force)
+        if stale:
+            self.pool.run(self._fetch_all(stale), timeout)
+        return len(stale)
+
+    def prefetch_async(self, urls: Iterable[str]):
+        """后台抓取，不等待结果（如新添加的链接）"""
+        stale = self._stale(urls, False)
+        if stale:
+            self.pool.submit(self._fetch_all(stale))
+
+    def start_background(self, url_source: Callable[[], Iterable[str]], interval: float):
+        """后台线程定期预取 url_source() 返回的全部链接（重复调用无副作用）"""
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop_event.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, args=(url_source, interval),
+                name="link-preview-prefetch", daemon=True
+            )
+            self._sweeper.start()
+
+    def _sweep_loop(self, url_source: Callable[[], Iterable[str]], interval: float):
+        while not self._stop_event.is_set():
+            try:
+                self.prefetch(url_source())
+            except Exception:
+                # 单轮预取失败不影响后续预取
+                pass
+            self._stop_event.wait(interval)
+
+    def stop(self):
+        """停止后台预取"""
+        self._stop_event.set()
+
+    # ---------- 雪碧图 ----------
+
+    def _build_sprite(self, digests: List[str]) -> str:
+        columns = min(_SPRITE_COLUMNS, len(digests))
+        rows = (len(digests) + columns - 1) // columns
+        size = self.icon_size
+        sprite = Image.new("RGBA", (columns * size, rows * size), (0, 0, 0, 0))
+        for index, digest in enumerate(digests):
+            try:
+                with Image.open(self._blob_path(digest)) as icon:
+                    sprite.paste(icon.convert("RGBA"), ((index % columns) * size, (index // columns) * size))
+            except OSError:
+                continue
+        output = io.BytesIO()
+        sprite.save(output, format="PNG", optimize=True)
+        return "data:image/png;base64," + base64.b64encode(output.getvalue()).decode("ascii")
+
+    def card_assets(self, links: List[Dict[str, str]]) -> Tuple[str, Dict[str, Dict[str, str]]]:
+        """一组链接的雪碧图样式和每个链接的图标/标题，返回 (<style>片段, URL -> {"icon_class", "icon_style", "title"})
+
+        相同的图标在雪碧图中只出现一次；雪碧图按图标组合缓存。
+        """
+        previews = {}
+        digests = []
+        for link in links:
+            meta = self.get(link["url"])
+            if meta is None:
+                continue
+            previews[link["url"]] = meta
+            if meta.get("icon"):
+                digests.append(meta["icon"])
+        digests = sorted(set(digests))
+
+        style = ""
+        sprite_class = ""
+        if digests:
+            sprite_id = hashlib.sha1("".join(digests).encode("ascii")).hexdigest()[:12]
+            sprite_class = f"nav-favicon-{sprite_id}"
+            with self._sprites_lock:
+                cached = self._sprites.get(sprite_id)
+                if cached is not None:
+                    self._sprites.move_to_end(sprite_id)
+            if cached is None:
+                cached = self._build_sprite(digests)
+                with self._sprites_lock:
+                    self._sprites[sprite_id] = cached
+                    while len(self._sprites) > self.sprite_cache:
+                        self._sprites.popitem(last=False)
+            columns = min(_SPRITE_COLUMNS, len(digests))
+            rows = (len(digests) + columns - 1) // columns
+            display = self.display_size
+            style = (f"<style>.{sprite_class}{{display:inline-block;flex:none;width:{display}px;height:{display}px;"
+                     f"background-image:url({cached});background-size:{columns * display}px {rows * display}px;}}</style>")
+
+        positions = {digest: index for index, digest in enumerate(digests)}
+        columns = min(_SPRITE_COLUMNS, len(digests)) or 1
+        assets = {}
+        for url, meta in previews.items():
+            asset = {"icon_class": "", "icon_style": "", "title": meta.get("title", "")}
+            if meta.get("icon"):
+                index = positions[meta["icon"]]
+                asset["icon_class"] = sprite_class
+                asset["icon_style"] = (f"background-position:{-(index % columns) * self.display_size}px "
+                                       f"{-(index // columns) * self.display_size}px")
+            assets[url] = asset
+        return style, assets
+
+
+_fetcher: Optional[LinkPreviewFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_preview_fetcher(**options) -> LinkPreviewFetcher:
+    """获取进程内共享的预览抓取器（参数只在首次创建时生效）"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = LinkPreviewFetcher(**options)
+        return _fetcher
+
+
+# 导出接口
+__all__ = ["HeadParser", "normalize_icon", "LinkPreviewFetcher", "get_preview_fetcher"]
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导航链接搜索模块
+对名称、描述、URL及拼音建立 1~3 字符的n-gram倒排索引，
+查询时求倒排表交集后再精确打分；无完全匹配时按三元组重合度做模糊匹配。
+支持增量添加/删除，万级链接下单次查询在毫秒级
+创建时间: 2025-06-19
+"""
+
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+_CJK = re.compile(r"[㐀-鿿]")
+
+# 各字段匹配的得分权重
+_FIELD_WEIGHTS = {"name": 3.0, "url": 2.0, "pinyin": 1.5, "description": 1.0}
+
+# 模糊匹配至少需要重合的查询三元组比例
+_FUZZY_THRESHOLD = 0.5
+
+
+def normalize(text: str) -> str:
+    """统一全半角和大小写"""
+    return unicodedata.normalize("NFKC", text or "").lower().strip()
+
+
+def ngrams(text: str, max_n: int = 3) -> Set[str]:
+    """文本中所有长度为 1~max_n 的片段（空白不参与）"""
+    grams = set()
+    for token in set(text.split()):
+        length = len(token)
+        grams.update(token[start:start + n] for n in range(1, max_n + 1) for start in range(length - n + 1))
+    return grams
+
+
+def _load_pinyin():
+    """pypinyin用于拼音全拼或首字母搜索中文（已列入依赖；缺失时只是不建立拼音索引）"""
+    try:
+        from pypinyin import lazy_pinyin
+    except ImportError:
+        return None
+    return lazy_pinyin
+
+
+def pinyin_forms(text: str) -> str:
+    """中文的全拼和首字母（未安装pypinyin或不含中文时为空）"""
+    if not _CJK.search(text):
+        return ""
+    lazy_pinyin = _load_pinyin()
+    if lazy_pinyin is None:
+        return ""
+    syllables = [syllable for syllable in lazy_pinyin(text) if syllable.strip()]
+    return " ".join(("".join(syllables), "".join(syllable[0] for syllable in syllables)))
+
+
+def url_text(url: str) -> str:
+    """URL中有检索价值的部分：去掉协议和www前缀的主机名与路径"""
+    parts = urlsplit(url)
+    host = parts.netloc or parts.path
+    if host.startswith("www."):
+        host = host[4:]
+    return normalize(host + (parts.path if parts.netloc else ""))
+
+
+class LinkSearchIndex:
+    """链接倒排索引（以URL作为文档键，同一URL重复添加时替换）"""
+
+    def __init__(self, links: Iterable[Dict[str, str]] = ()):
+        self._postings: Dict[str, Set[int]] = {}
+        self._docs: Dict[int, Tuple[Dict[str, str], Dict[str, str], Tuple[Tuple[float, str], ...]]] = {}
+        self._by_url: Dict[str, int] = {}
+        self._next_id = 0
+        self._lock = threading.RLock()
+        for link in links:
+            self.add(link)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, link: Dict[str, str]):
+        """增量添加（或替换同一URL的）链接"""
+        name = normalize(link.get("name", ""))
+        description = normalize(link.get("description", ""))
+        fields = {
+            "name": name,
+            "description": description,
+            "url": url_text(link.get("url", "")),
+            "pinyin": pinyin_forms(name + " " + description)
+        }
+        # 打分用的字段文本前加空格，"词首匹配"只需一次子串查找
+        scoring = tuple(sorted(
+            ((weight, " " + fields[field]) for field, weight in _FIELD_WEIGHTS.items() if fields[field]),
+            reverse=True
+        ))
+        with self._lock:
+            self.remove(link.get("url", ""))
+            doc_id = self._next_id
+            self._next_id += 1
+            self._docs[doc_id] = (link, fields, scoring)
+            self._by_url[link.get("url", "")] = doc_id
+            for gram in ngrams(" ".join(fields.values())):
+                self._postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, url: str):
+        """按URL删除链接"""
+        with self._lock:
+            doc_id = self._by_url.pop(url, None)
+            if doc_id is None:
+                return
+            _, fields, _ = self._docs.pop(doc_id)
+            for gram in ngrams(" ".join(fields.values())):
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(doc_id)
+                    if not posting:
+                        del self._postings[gram]
+
+    def _candidates(self, terms: List[str]) -> Optional[Set[int]]:
+        """每个查询词的n-gram倒排表求交集（从最短的倒排表开始）"""
+        result: Optional[Set[int]] = None
+        for term in terms:
+            grams = {term} if len(term) <= 3 else {term[i:i + 3] for i in range(len(term) - 2)}
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            for posting in postings:
+                result = set(posting) if result is None else result & posting
+                if not result:
+                    return set()
+        return result
+
+    def _fuzzy_candidates(self, query: str) -> Dict[int, float]:
+        """按三元组重合比例召回（容忍错别字和漏字）"""
+        grams = [query[i:i + 3] for i in range(len(query) - 2)]
+        if not grams:
+            return {}
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._postings.get(gram, ()))
+        return {doc_id: count / len(grams) for doc_id, count in counts.items()
+                if count / len(grams) >= _FUZZY_THRESHOLD}
+
+    @staticmethod
+    def _score(scoring: Tuple[Tuple[float, str], ...], name_length: int, terms: List[str]) -> float:
+        score = 0.0
+        for term in terms:
+            word_start = " " + term
+            best = 0.0
+            # 字段按权重从高到低排列，命中更高等级后即可停止
+            for weight, text in scoring:
+                if term not in text:
+                    continue
+                if text == " " + term:
+                    best = max(best, weight * 10)
+                    break
+                best = max(best, weight * (5 if word_start in text else 2))
+            score += best
+        # 同等匹配下名称越短越靠前
+        return score - name_length * 0.01
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[float, Dict[str, str]]]:
+        """返回按得分排序的 (得分, 链接)"""
+        query = normalize(query)
+        terms = query.split()
+        if not terms:
+            return []
+
+        with self._lock:
+            candidates = self._candidates(terms)
+            scored = []
+            for doc_id in candidates or ():
+                link, fields, scoring = self._docs[doc_id]
+                score = self._score(scoring, len(fields["name"]), terms)
+                if score > 0:
+                    scored.append((score, link))
+
+            if not scored:
+                for doc_id, overlap in self._fuzzy_candidates(query.replace(" ", "")).items():
+                    scored.append((overlap, self._docs[doc_id][0]))
+
+        return heapq.nlargest(limit, scored, key=lambda item: item[0])
+
+
+# 导出接口
+__all__ = ["LinkSearchIndex", "normalize", "ngrams", "pinyin_forms", "url_text"]
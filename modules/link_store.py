@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自定义链接存储模块
+SQLite持久化的按用户隔离链接库：写入先更新内存缓存并排队，由后台线程批量提交；
+读取优先命中内存缓存，其他进程提交修改后自动失效重新加载
+创建时间: 2025-06-19
+"""
+
+import atexit
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS custom_links (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    UNIQUE (owner, url)
+);
+CREATE INDEX IF NOT EXISTS idx_custom_links_owner_category ON custom_links (owner, category, id);
+CREATE INDEX IF NOT EXISTS idx_custom_links_url ON custom_links (url);
+"""
+
+_UPSERT = """
+INSERT INTO custom_links (owner, category, name, url, description, created_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (owner, url) DO UPDATE SET
+    category = excluded.category, name = excluded.name, description = excluded.description
+"""
+
+logger = logging.getLogger(__name__)
+
+# 提交失败后后台线程重试前的等待秒数
+_RETRY_DELAY = 1.0
+
+# 批量导入：解析结果按块写入临时表，再整体合并（WHERE true 用于消除 INSERT ... SELECT ... ON CONFLICT 的语法歧义）
+_IMPORT_CHUNK = 1000
+
+_STAGE = "CREATE TEMP TABLE staged_links (category TEXT, name TEXT, url TEXT, description TEXT)"
+
+_INSERT_STAGED = """
+INSERT INTO custom_links (owner, category, name, url, description, created_at)
+SELECT ?, category, name, url, description, ? FROM staged_links WHERE true ORDER BY rowid
+ON CONFLICT (owner, url) DO UPDATE SET
+    category = excluded.category, name = excluded.name, description = excluded.description
+"""
+
+# 全局递增的修订号：缓存内容每次变化都取一个新值，渲染缓存据此判断是否需要重建
+_revisions = itertools.count(1)
+
+
+class OwnerLinks:
+    """单个用户的链接缓存（分类按首次出现的顺序排列）"""
+
+    def __init__(self):
+        self.revision = next(_revisions)
+        self.categories: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+        self.category_revisions: Dict[str, int] = {}
+        self.by_url: Dict[str, Dict[str, str]] = {}
+
+    def _touch(self, category: str):
+        revision = next(_revisions)
+        self.revision = revision
+        self.category_revisions[category] = revision
+
+    def put(self, link: Dict[str, str]):
+        """添加链接；同一URL已存在时更新（可能移动到新分类）"""
+        existing = self.by_url.get(link["url"])
+        if existing is not None:
+            old_category = existing["category"]
+            links = self.categories[old_category]
+            links.remove(existing)
+            if not links:
+                del self.categories[old_category]
+                del self.category_revisions[old_category]
+            else:
+                self._touch(old_category)
+        self.categories.setdefault(link["category"], []).append(link)
+        self.by_url[link["url"]] = link
+        self._touch(link["category"])
+
+    def links(self) -> List[Dict[str, str]]:
+        return [link for links in self.categories.values() for link in links]
+
+
+class LinkStore:
+    """按用户隔离的自定义链接库"""
+
+    def __init__(self, path: str, flush_interval: float = 0.2, flush_batch: int = 200, cache_owners: int = 256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.cache_owners = cache_owners
+
+        self._connection: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._cache: "OrderedDict[str, OwnerLinks]" = OrderedDict()
+        self._cache_lock = threading.RLock()
+        self._data_version = None
+
+        self._pending: List[Tuple[str, tuple]] = []
+        self._pending_cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _check_external_changes(self):
+        """其他进程提交修改后 data_version 会变化，此时清空读缓存"""
+        with self._db_lock:
+            version = self._connect().execute("PRAGMA data_version").fetchone()[0]
+        if self._data_version is not None and version != self._data_version:
+            with self._cache_lock:
+                self._cache.clear()
+        self._data_version = version
+
+    def _load(self, owner: str) -> OwnerLinks:
+        owner_links = OwnerLinks()
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT category, name, url, description FROM custom_links WHERE owner = ? ORDER BY id",
+                (owner,)
+            ).fetchall()
+        for category, name, url, description in rows:
+            owner_links.put({"name": name, "url": url, "description": description, "category": category})
+        return owner_links
+
+    def get(self, owner: str) -> OwnerLinks:
+        """读取用户的链接（缓存未命中时从数据库加载）"""
+        self._check_external_changes()
+        with self._cache_lock:
+            owner_links = self._cache.get(owner)
+            if owner_links is None:
+                # 尚未提交的写入已反映在缓存中，重新加载前先落盘
+                self.flush()
+                owner_links = self._load(owner)
+                self._cache[owner] = owner_links
+                while len(self._cache) > self.cache_owners:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(owner)
+            return owner_links
+
+    def read(self, owner: str, reader: Callable[[OwnerLinks], Any]) -> Any:
+        """在缓存锁内读取用户的链接，避免与并发写入交错"""
+        with self._cache_lock:
+            return reader(self.get(owner))
+
+    def all_urls(self, limit: Optional[int] = None) -> List[str]:
+        """所有用户的链接URL（去重）；指定 limit 时只取最近添加的 limit 个"""
+        self.flush()
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT url FROM custom_links GROUP BY url ORDER BY MAX(id) DESC LIMIT ?",
+                (-1 if limit is None else limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add(self, owner: str, link: Dict[str, str]):
+        """添加或更新链接：立即更新缓存，数据库写入排队批量提交"""
+        with self._cache_lock:
+            self.get(owner).put(link)
+            self._enqueue("upsert", (owner, link["category"], link["name"], link["url"], link["description"], time.time()))
+
+    def add_many(self, owner: str, links: Iterable[Dict[str, str]]) -> int:
+        """批量添加或更新链接，返回条数
+
+        links 可以是流式解析的生成器：按块写入独立连接上的临时表（解析在任何锁之外完成，内存只与块大小相关），
+        解析完成后在单个事务中与排队的写入一起合并到链接表；解析出错时数据库和缓存都不变。
+        """
+        with self._db_lock:
+            # 确保数据库和表结构已创建
+            self._connect()
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            connection.execute(_STAGE)
+            count = 0
+            links = iter(links)
+            while True:
+                chunk = [(link["category"], link["name"], link["url"], link["description"])
+                         for link in itertools.islice(links, _IMPORT_CHUNK)]
+                if not chunk:
+                    break
+                connection.executemany("INSERT INTO staged_links VALUES (?, ?, ?, ?)", chunk)
+                count += len(chunk)
+
+            with self._flush_lock:
+                # 先提交排队中的写入，保证与之前的操作顺序一致
+                with self._pending_cond:
+                    pending, self._pending = self._pending, []
+                try:
+                    with connection:
+                        self._apply(connection, pending)
+                        connection.execute(_INSERT_STAGED, (owner, time.time()))
+                except Exception:
+                    # 导入随事务回滚、由调用方处理；之前排队的写入放回队列
+                    self._requeue(pending)
+                    raise
+        finally:
+            connection.close()
+
+        with self._db_lock:
+            # 自身的提交不应使其他用户的读缓存失效
+            self._data_version = self._connect().execute("PRAGMA data_version").fetchone()[0]
+        # 用户的缓存下次读取时按数据库重新加载（之后排队的写入会在重新加载前落盘）
+        with self._cache_lock:
+            self._cache.pop(owner, None)
+        return count
+
+    def iter_links(self, owner: str) -> Iterator[Dict[str, str]]:
+        """从数据库逐条读取用户的链接（按分类分组，分类按首次添加的顺序），用于导出"""
+        self.flush()
+        # 独立的只读连接：WAL模式下读取不阻塞写入，也不占用共享连接
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            rows = connection.execute(
+                "SELECT category, name, url, description FROM custom_links WHERE owner = ? "
+                "ORDER BY MIN(id) OVER (PARTITION BY category), id",
+                (owner,)
+            )
+            for category, name, url, description in rows:
+                yield {"name": name, "url": url, "description": description, "category": category}
+        finally:
+            connection.close()
+
+    def clear(self, owner: str):
+        """删除用户的全部链接"""
+        with self._cache_lock:
+            self._cache[owner] = OwnerLinks()
+            self._enqueue("clear", (owner,))
+
+    def _enqueue(self, operation: str, params: tuple):
+        with self._pending_cond:
+            self._pending.append((operation, params))
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="link-store-writer", daemon=True)
+                self._writer.start()
+            if len(self._pending) >= self.flush_batch:
+                self._pending_cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._pending_cond:
+                self._pending_cond.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # 数据库被锁定、磁盘已满等：写入已放回队列，稍后重试，线程不退出
+                logger.exception("链接库写入失败，%.0f 秒后重试", _RETRY_DELAY)
+                time.sleep(_RETRY_DELAY)
+
+    def _requeue(self, pending: List[Tuple[str, tuple]]):
+        """提交失败的写入放回队首，保持与之后排队的写入的顺序"""
+        with self._pending_cond:
+            self._pending[:0] = pending
+
+    def flush(self):
+        """按顺序提交所有排队的写入（单个事务）；失败时写入留在队列中并抛出异常"""
+        with self._flush_lock:
+            with self._pending_cond:
+                pending, self._pending = self._pending, []
+            if pending:
+                try:
+                    self._commit(pending)
+                except Exception:
+                    self._requeue(pending)
+                    raise
+
+    @staticmethod
+    def _apply(connection: sqlite3.Connection, pending: List[Tuple[str, tuple]]):
+        # 连续的同类操作合并为一次 executemany
+        for operation, group in itertools.groupby(pending, key=lambda item: item[0]):
+            params = [item[1] for item in group]
+            if operation == "upsert":
+                connection.executemany(_UPSERT, params)
+            else:
+                connection.executemany("DELETE FROM custom_links WHERE owner = ?", params)
+
+    def _commit(self, pending: List[Tuple[str, tuple]]):
+        with self._db_lock:
+            connection = self._connect()
+            with connection:
+                self._apply(connection, pending)
+            # 自身提交不应使读缓存失效
+            self._data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+
+
+_stores: Dict[str, LinkStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_link_store(path: str, **options) -> LinkStore:
+    """获取进程内共享的链接库，进程退出前提交排队中的写入"""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = LinkStore(path, **options)
+            _stores[path] = store
+            atexit.register(store.flush)
+        return store
+
+
+# 导出接口
+__all__ = ["OwnerLinks", "LinkStore", "get_link_store"]
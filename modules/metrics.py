@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+处理性能统计模块
+为处理器方法记录耗时直方图、输入输出大小、错误数和并发数，
+并以Prometheus文本格式通过 /metrics 暴露
+创建时间: 2025-06-19
+"""
+
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+# 耗时分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 数据大小分桶（字节）
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 5 * 1024 ** 2, 20 * 1024 ** 2, 100 * 1024 ** 2, 500 * 1024 ** 2)
+
+METRIC_HELP = {
+    "chainsuite_operation_duration_seconds": ("histogram", "处理器方法耗时"),
+    "chainsuite_operation_input_bytes": ("histogram", "处理器输入大小"),
+    "chainsuite_operation_output_bytes": ("histogram", "处理器输出大小"),
+    "chainsuite_operation_calls_total": ("counter", "处理器调用次数"),
+    "chainsuite_operation_errors_total": ("counter", "处理器失败次数"),
+    "chainsuite_operation_in_flight": ("gauge", "正在执行的处理器调用数")
+}
+
+HISTOGRAM_BUCKETS = {
+    "chainsuite_operation_duration_seconds": LATENCY_BUCKETS,
+    "chainsuite_operation_input_bytes": SIZE_BUCKETS,
+    "chainsuite_operation_output_bytes": SIZE_BUCKETS
+}
+
+
+class MetricsRegistry:
+    """按线程分片聚合的指标注册表
+
+    每个线程只写自己的分片，热路径上不加锁；导出时再汇总所有分片。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[str, Dict[Tuple, Any]]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[str, Dict[Tuple, Any]]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {"counters": {}, "gauges": {}, "histograms": {}}
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Tuple, value: float = 1.0):
+        """计数器/仪表累加（仪表可传负值）"""
+        kind = "gauges" if METRIC_HELP[name][0] == "gauge" else "counters"
+        values = self._shard()[kind]
+        key = (name, labels)
+        values[key] = values.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Tuple, value: float):
+        """记录一次直方图观测"""
+        histograms = self._shard()["histograms"]
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = [[0] * (len(HISTOGRAM_BUCKETS[name]) + 1), 0.0, 0]
+            histograms[key] = entry
+        entry[0][bisect.bisect_left(HISTOGRAM_BUCKETS[name], value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def collect(self) -> Dict[str, Dict[Tuple, Any]]:
+        """汇总所有线程分片"""
+        with self._shards_lock:
+            shards = list(self._shards)
+
+        merged = {"counters": {}, "gauges": {}, "histograms": {}}
+        for shard in shards:
+            for kind in ("counters", "gauges"):
+                for key, value in list(shard[kind].items()):
+                    merged[kind][key] = merged[kind].get(key, 0.0) + value
+            for key, (buckets, total, count) in list(shard["histograms"].items()):
+                target = merged["histograms"].get(key)
+                if target is None:
+                    merged["histograms"][key] = [list(buckets), total, count]
+                else:
+                    target[0] = [a + b for a, b in zip(target[0], buckets)]
+                    target[1] += total
+                    target[2] += count
+        return merged
+
+    def render_prometheus(self) -> str:
+        """生成Prometheus文本格式"""
+        merged = self.collect()
+        by_name: Dict[str, List[str]] = {name: [] for name in METRIC_HELP}
+
+        for kind in ("counters", "gauges"):
+            for (name, labels), value in sorted(merged[kind].items()):
+                by_name[name].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), (buckets, total, count) in sorted(merged["histograms"].items()):
+            cumulative = 0
+            for bound, bucket_count in zip(HISTOGRAM_BUCKETS[name] + (float("inf"),), buckets):
+                cumulative += bucket_count
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                by_name[name].append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            by_name[name].append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            by_name[name].append(f"{name}_count{_format_labels(labels)} {count}")
+
+        lines = []
+        for name, samples in by_name.items():
+            metric_type, help_text = METRIC_HELP[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, float]:
+        """汇总调用次数、错误数和平均耗时，供状态面板显示"""
+        merged = self.collect()
+        calls = sum(v for (name, _), v in merged["counters"].items() if name == "chainsuite_operation_calls_total")
+        errors = sum(v for (name, _), v in merged["counters"].items() if name == "chainsuite_operation_errors_total")
+        in_flight = sum(v for (name, _), v in merged["gauges"].items() if name == "chainsuite_operation_in_flight")
+        total_seconds = sum(
+            entry[1] for (name, _), entry in merged["histograms"].items()
+            if name == "chainsuite_operation_duration_seconds"
+        )
+        return {
+            "calls": calls,
+            "errors": errors,
+            "in_flight": in_flight,
+            "error_rate": errors / calls if calls else 0.0,
+            "avg_seconds": total_seconds / calls if calls else 0.0
+        }
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def estimate_size(value: Any) -> int:
+    """估算输入/输出大小（字节）"""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        # 批处理模式下输入为列表
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, str):
+        # 视频等文件以路径形式传递
+        try:
+            return os.path.getsize(value) if os.path.isfile(value) else 0
+        except OSError:
+            return 0
+    size = getattr(value, "size", None)
+    bands = getattr(value, "getbands", None)
+    if isinstance(size, tuple) and len(size) == 2 and bands is not None:
+        # PIL图像：按解码后的像素字节数估算
+        return size[0] * size[1] * len(bands())
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return 0
+
+
+def _is_failed_result(result: Any) -> bool:
+    """处理器约定返回 (结果..., 状态文本)，失败时状态以❌开头"""
+    if isinstance(result, tuple) and len(result) >= 2 and isinstance(result[-1], str):
+        return result[-1].lstrip().startswith("❌")
+    return False
+
+
+REGISTRY = MetricsRegistry()
+
+
+def instrument(func: Callable, module_name: str, operation: str,
+               registry: MetricsRegistry = REGISTRY) -> Callable:
+    """包装单个处理函数，记录耗时、大小、错误和并发数
+
+    生成器函数（流式输出）按整个迭代过程计时，以最后一次产出的结果判断成败。
+    """
+    labels = (("module", module_name), ("operation", operation))
+
+    def record(start: float, input_bytes: int, failed: bool, result: Any):
+        elapsed = time.perf_counter() - start
+        registry.inc("chainsuite_operation_in_flight", labels, -1)
+        registry.inc("chainsuite_operation_calls_total", labels)
+        registry.observe("chainsuite_operation_duration_seconds", labels, elapsed)
+        registry.observe("chainsuite_operation_input_bytes", labels, input_bytes)
+        if failed:
+            registry.inc("chainsuite_operation_errors_total", labels)
+        else:
+            output = result[0] if isinstance(result, tuple) else result
+            registry.observe("chainsuite_operation_output_bytes", labels, estimate_size(output))
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            input_bytes = estimate_size(args[0]) if args else 0
+            registry.inc("chainsuite_operation_in_flight", labels, 1)
+            start = time.perf_counter()
+            failed = True
+            result = None
+            try:
+                for result in func(*args, **kwargs):
+                    yield result
+                failed = _is_failed_result(result)
+            finally:
+                record(start, input_bytes, failed, result)
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        input_bytes = estimate_size(args[0]) if args else 0
+        registry.inc("chainsuite_operation_in_flight", labels, 1)
+        start = time.perf_counter()
+        failed = True
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            failed = _is_failed_result(result)
+            return result
+        finally:
+            record(start, input_bytes, failed, result)
+
+    return wrapper
+
+
+def instrument_processor(processor: Any, module_name: str,
+                         registry: MetricsRegistry = REGISTRY) -> Any:
+    """为处理器实例的所有公开方法加上指标统计（并接入请求性能分析）"""
+    from modules.profiling import profiled
+
+    for attr in dir(type(processor)):
+        if attr.startswith("_"):
+            continue
+        method = getattr(processor, attr)
+        if callable(method):
+            wrapped = profiled(method, module_name, attr)
+            setattr(processor, attr, instrument(wrapped, module_name, attr, registry))
+    return processor
+
+
+def create_metrics_routes(registry: MetricsRegistry = REGISTRY) -> List[Any]:
+    """创建挂载在Gradio服务上的 /metrics 路由"""
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    async def metrics_endpoint(request):
+        return PlainTextResponse(
+            registry.render_prometheus(),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    return [Route("/metrics", metrics_endpoint, methods=["GET"])]
+
+
+# 导出接口
+__all__ = [
+    "MetricsRegistry", "REGISTRY", "estimate_size",
+    "instrument", "instrument_processor", "create_metrics_routes"
+]
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型注册模块
+将ONNX模型转换为“计算图 + 外部权重文件”格式并缓存，ONNX Runtime在CPU上会以mmap方式
+映射外部权重，多个会话、多个工作进程共享同一份物理内存页
+创建时间: 2025-06-19
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict
+
+from config import MODEL_REGISTRY_CONFIG
+from modules.content_hash import file_fingerprint
+
+_WEIGHTS_FILE = "weights.bin"
+
+
+def _onnx_available() -> bool:
+    try:
+        import onnx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ModelRegistry:
+    """模型注册表：首次使用某个模型时转换并记录，之后直接返回缓存的可映射版本"""
+
+    def __init__(self, cache_dir: str, mmap_weights: bool = True, size_threshold: int = 1024):
+        self.cache_dir = cache_dir
+        self.mmap_weights = mmap_weights
+        self.size_threshold = size_threshold
+        self._resolved: Dict[str, str] = {}
+        self._loaded: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _convert(self, model_path: str, target_dir: str) -> str:
+        """转换为外部权重格式；先写入临时目录再原子改名，多进程同时转换也安全"""
+        import onnx
+
+        target = os.path.join(target_dir, "model.onnx")
+        if os.path.exists(target):
+            return target
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".convert_", dir=self.cache_dir)
+        try:
+            model = onnx.load(model_path)
+            onnx.save_model(
+                model,
+                os.path.join(staging, "model.onnx"),
+                save_as_external_data=True,
+                all_tensors_to_one_file=True,
+                location=_WEIGHTS_FILE,
+                size_threshold=self.size_threshold
+            )
+            try:
+                os.rename(staging, target_dir)
+            except OSError:
+                # 其他进程已完成转换
+                if not os.path.exists(target):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return target
+
+    def resolve(self, model_path: str) -> str:
+        """返回实际交给ONNX Runtime加载的模型路径（未安装onnx或关闭mmap时返回原路径）"""
+        source = os.path.abspath(model_path)
+        if not self.mmap_weights or not _onnx_available():
+            return source
+
+        with self._lock:
+            resolved = self._resolved.get(source)
+            if resolved is not None:
+                return resolved
+
+            start = time.perf_counter()
+            target_dir = os.path.join(self.cache_dir, file_fingerprint(source))
+            resolved = self._convert(source, target_dir)
+            self._resolved[source] = resolved
+            weights = os.path.join(target_dir, _WEIGHTS_FILE)
+            self._loaded[source] = {
+                "path": resolved,
+                "weights_bytes": os.path.getsize(weights) if os.path.exists(weights) else 0,
+                "prepare_seconds": time.perf_counter() - start
+            }
+            return resolved
+
+    def session_config(self) -> Dict[str, str]:
+        """创建会话时附加的配置项"""
+        if not self.mmap_weights:
+            return {}
+        # 预打包会把权重复制为进程私有的重排副本，关闭后才能真正共享映射页
+        return {"session.disable_prepacking": "1"}
+
+    def loaded_models(self) -> Dict[str, Dict[str, Any]]:
+        """已准备的模型信息"""
+        with self._lock:
+            return {path: dict(info) for path, info in self._loaded.items()}
+
+
+MODEL_REGISTRY = ModelRegistry(
+    MODEL_REGISTRY_CONFIG["cache_dir"],
+    mmap_weights=MODEL_REGISTRY_CONFIG["mmap_weights"],
+    size_threshold=MODEL_REGISTRY_CONFIG["size_threshold"]
+)
+
+
+def process_memory() -> Dict[str, int]:
+    """当前进程的内存占用（字节）：RSS、PSS和共享页，非Linux平台只返回RSS"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+        return {
+            "rss": fields.get("Rss", 0),
+            "pss": fields.get("Pss", 0),
+            "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+        }
+    except OSError:
+        import psutil
+        return {"rss": psutil.Process().memory_info().rss, "pss": 0, "shared": 0}
+
+
+# 导出接口
+__all__ = ["ModelRegistry", "MODEL_REGISTRY", "process_memory"]
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模块加载器
+根据config.py中的MODULE_IMPORTS导入功能模块并记录导入耗时。所有标签页仍在启动时构建，
+因此功能模块本身只是推迟到构建界面时导入；真正按需导入的是PIL、numpy等重量级依赖
+（通过 lazy_import 在处理器首次使用时导入）。导入失败的模块记录完整堆栈，并显示为错误提示标签页
+创建时间: 2025-06-19
+"""
+
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 延迟依赖的首次导入耗时（模块名 -> 秒）
+DEPENDENCY_IMPORT_TIMES: Dict[str, float] = {}
+_dependency_lock = threading.RLock()
+
+
+class LazyModule:
+    """延迟导入代理：首次访问属性时才真正导入模块"""
+
+    def __init__(self, module_name: str):
+        self._module_name = module_name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _dependency_lock:
+                if self._module is None:
+                    already_loaded = self._module_name in sys.modules
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._module_name)
+                    if not already_loaded:
+                        DEPENDENCY_IMPORT_TIMES[self._module_name] = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __repr__(self) -> str:
+        state = "已导入" if self._module is not None else "未导入"
+        return f"<LazyModule {self._module_name} ({state})>"
+
+
+def lazy_import(module_name: str) -> LazyModule:
+    """返回延迟导入的模块代理，用于PIL、numpy等重量级依赖"""
+    return LazyModule(module_name)
+
+
+class ModuleLoader:
+    """配置驱动的功能模块加载器"""
+
+    def __init__(self, module_imports: Dict[str, Dict[str, Any]], lazy: bool = True):
+        self.module_imports = module_imports
+        self.lazy = lazy
+        self.loaded_modules: Dict[str, Any] = {}
+        self.import_times: Dict[str, float] = {}
+        self.failed_modules: Dict[str, str] = {}
+        self.build_time: Optional[float] = None
+
+        if not self.lazy:
+            self.preload_all()
+
+    def enabled_modules(self) -> List[str]:
+        """按配置顺序返回启用的模块名"""
+        return [key for key, spec in self.module_imports.items() if spec.get("enabled", True)]
+
+    def load(self, key: str):
+        """导入指定模块（已导入则直接返回）"""
+        if key in self.loaded_modules:
+            return self.loaded_modules[key]
+
+        spec = self.module_imports[key]
+        start = time.perf_counter()
+        module = importlib.import_module(spec["module"])
+        self.import_times[key] = time.perf_counter() - start
+        self.loaded_modules[key] = module
+        return module
+
+    def _record_failure(self, key: str, error: Exception):
+        self.failed_modules[key] = f"{type(error).__name__}: {error}"
+        logger.error("功能模块 %s（%s）加载失败", key, self.module_imports[key]["module"], exc_info=error)
+
+    def get_factory(self, key: str) -> Callable[[], Any]:
+        """获取模块的界面创建函数；导入失败时记录堆栈，返回显示错误信息的标签页创建函数"""
+        try:
+            module = self.load(key)
+            return getattr(module, self.module_imports[key]["factory"])
+        except Exception as e:
+            self._record_failure(key, e)
+            return self._error_factory(key)
+
+    def _error_factory(self, key: str) -> Callable[[], Any]:
+        def create_error_interface():
+            import gradio as gr
+
+            with gr.Tab(f"❌ {key}"):
+                gr.Markdown(
+                    f"### 模块加载失败\n\n`{self.module_imports[key]['module']}` 导入出错，"
+                    f"此功能暂不可用：\n\n```\n{self.failed_modules[key]}\n```\n\n完整堆栈见服务端日志。"
+                )
+        return create_error_interface
+
+    def preload_all(self):
+        """立即导入全部启用模块及其声明的重量级依赖（非延迟模式）"""
+        for key in self.enabled_modules():
+            try:
+                self.load(key)
+            except Exception as e:
+                self._record_failure(key, e)
+                continue
+            for dependency in self.module_imports[key].get("dependencies", []):
+                lazy_import(dependency)._load()
+
+    def format_import_report(self) -> str:
+        """生成启动耗时与导入耗时明细"""
+        lines = [f"   • 加载模式: {'构建界面时导入（依赖首次使用时导入）' if self.lazy else '启动时全部导入'}"]
+        if self.build_time is not None:
+            lines.append(f"   • 界面构建: {self.build_time * 1000:.1f} ms")
+
+        total = sum(self.import_times.values())
+        lines.append(f"   • 模块导入: {total * 1000:.1f} ms（{len(self.loaded_modules)} 个模块）")
+        for key, seconds in sorted(self.import_times.items(), key=lambda item: -item[1]):
+            lines.append(f"     - {key}: {seconds * 1000:.1f} ms")
+
+        if DEPENDENCY_IMPORT_TIMES:
+            lines.append("   • 依赖首次导入:")
+            for name, seconds in sorted(DEPENDENCY_IMPORT_TIMES.items(), key=lambda item: -item[1]):
+                lines.append(f"     - {name}: {seconds * 1000:.1f} ms")
+
+        for key, error in self.failed_modules.items():
+            lines.append(f"   • ❌ {key} 加载失败: {error}")
+
+        return "\n".join(lines)
+
+
+# 导出接口
+__all__ = ["LazyModule", "lazy_import", "ModuleLoader", "DEPENDENCY_IMPORT_TIMES"]
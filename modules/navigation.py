@@ -7,141 +7,437 @@
 """
 
 import gradio as gr
-import json
-from typing import Dict, List, Any
-from config import NAVIGATION_CONFIG
+import csv
+import html
+import itertools
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from config import NAVIGATION_CONFIG, STATIC_ASSETS_CONFIG
+from modules.async_http import get_http_pool
+from modules.link_health import get_link_checker
+from modules.link_io import EXPORT_FORMATS, export_to_file, iter_import
+from modules.link_preview import LinkPreviewFetcher, get_preview_fetcher
+from modules.link_search import LinkSearchIndex
+from modules.link_store import get_link_store
+from modules.queue_config import event_options
+from modules.static_assets import file_fingerprint, fingerprint, get_asset_cache
+
+# 预编译的HTML模板（分类区块 + 链接卡片），渲染时只做格式化和列表拼接
+_SECTION_TEMPLATE = """
+        <div style="margin-bottom: 25px;">
+            <h3 style="color: {color}; display: flex; align-items: center; gap: 8px; margin-bottom: 15px;">
+                <span style="font-size: 1.5em;">{icon}</span>
+                {title}
+            </h3>
+            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 15px;">
+{cards}
+            </div>
+        </div>
+        """
+
+_CARD_TEMPLATE = """
+                <a href="{url}" target="_blank" class="nav-link" title="{page_title}"
+                   style="display: block; padding: 15px; background: #f8fafc; border-radius: 12px;
+                          text-decoration: none; color: #1f2937; border-left: 4px solid {color};
+                          transition: all 0.3s ease; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+                    <div style="font-weight: 600; font-size: 1.1em; margin-bottom: 5px;
+                                display: flex; align-items: center; gap: 8px;">
+                        {favicon}{name}
+                    </div>
+                    <div style="color: #6b7280; font-size: 0.9em; line-height: 1.4;">
+                        {description}
+                    </div>
+                </a>
+            """
+
+_EMPTY_CUSTOM_HTML = """
+            <div style="text-align: center; padding: 40px; color: #6b7280;">
+                <p style="font-size: 1.1em;">暂无自定义链接</p>
+                <p style="font-size: 0.9em;">使用右侧面板添加您常用的网站链接</p>
+            </div>
+            """
+
+_EMPTY_SEARCH_HTML = """
+            <div style="text-align: center; padding: 20px; color: #6b7280;">
+                <p>未找到匹配的链接</p>
+            </div>
+            """
+
+CUSTOM_LINK_ICON = "📌"
+CUSTOM_LINK_COLOR = "#8b5cf6"
+SEARCH_RESULT_ICON = "🔍"
+SEARCH_RESULT_COLOR = "#0ea5e9"
+
+_HEALTH_ROW_TEMPLATE = """
+                    <tr>
+                        <td style="padding: 6px 10px;"><a href="{url}" target="_blank">{name}</a></td>
+                        <td style="padding: 6px 10px;">{state}</td>
+                        <td style="padding: 6px 10px; color: #6b7280;">{detail}</td>
+                    </tr>"""
+
+
+def render_section(title: str, icon: str, color: str, links: List[Dict[str, str]],
+                   previews: Optional[LinkPreviewFetcher] = None) -> str:
+    """渲染一个分类区块（链接字段经过HTML转义）
+
+    提供 previews 时卡片显示已抓取的网站图标（整个区块共用一张内联雪碧图）和网页标题。
+    """
+    style, assets = previews.card_assets(links) if previews is not None else ("", {})
+    cards = []
+    for link in links:
+        asset = assets.get(link["url"], {})
+        page_title = asset.get("title", "")
+        favicon = (f'<span class="{asset["icon_class"]}" style="{asset["icon_style"]}"></span>'
+                   if asset.get("icon_class") else "")
+        cards.append(_CARD_TEMPLATE.format(
+            url=html.escape(link["url"], quote=True),
+            color=color,
+            page_title=html.escape(page_title, quote=True),
+            favicon=favicon,
+            name=html.escape(link["name"]),
+            # 没有描述时显示网页标题
+            description=html.escape(link.get("description") or page_title)
+        ))
+    return style + _SECTION_TEMPLATE.format(color=color, icon=icon, title=html.escape(title), cards="".join(cards))
+
+
+DEFAULT_OWNER = "default"
+
+
+def resolve_owner(browser_id: str, request: Optional[gr.Request]) -> Tuple[str, str]:
+    """确定自定义链接的归属，返回 (归属键, 浏览器ID)
+
+    登录用户按用户名隔离；未登录时使用保存在浏览器本地的随机ID（首次访问时生成）。
+    """
+    username = getattr(request, "username", None) if request is not None else None
+    if username:
+        return f"user:{username}", browser_id
+    if not browser_id:
+        browser_id = uuid.uuid4().hex
+    return f"browser:{browser_id}", browser_id
+
 
 class NavigationManager:
-    """导航管理器"""
+    """导航管理器
+
+    自定义链接按用户保存在SQLite链接库中。渲染结果按分类缓存：预设分类只在网站预览更新后重新渲染；
+    自定义链接的每个分类带修订号，只有 add_custom_link / clear_custom_links 会改变修订号，
+    未变化的分类直接复用已渲染的片段。网站图标和标题由预览抓取器在后台获取。
+
+    链接搜索使用n-gram倒排索引：预设链接的索引启动时建立一次；自定义链接的索引按用户建立，
+    添加链接时增量更新，链接库缓存被重新加载（如其他进程修改）时重建。
+
+    链接健康检查由共享的异步检查器完成，结果按TTL缓存；嵌入网站前先查询是否允许iframe嵌入。
+    """
     
     def __init__(self):
         self.name = "平台导航"
         self.description = "常用平台和工具导航"
         self.config = NAVIGATION_CONFIG
-        self.custom_links = []
+        self.store = get_link_store(**self.config["store"])
+        # 分类名 -> (预览修订号, HTML)；渲染结果同时保存在静态资源缓存中，重启后来源未变则直接读取
+        self._preset_fragments: Dict[str, Tuple[int, str]] = {}
+        self.assets = get_asset_cache(
+            cache_dir=STATIC_ASSETS_CONFIG["cache_dir"],
+            compress_min_size=STATIC_ASSETS_CONFIG["compress_min_size"]
+        )
+        self._asset_source = file_fingerprint(os.path.abspath(__file__))
+        # 归属键 -> {"revision", "html", "fragments"}，按最近使用淘汰
+        self._render_states: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._preset_index = LinkSearchIndex(
+            dict(link, category=category_name)
+            for category_name, category_data in self.config["categories"].items()
+            for link in category_data.get("links", [])
+        )
+        # 归属键 -> {"links": 建立索引时的OwnerLinks, "revision", "index"}，按最近使用淘汰
+        self._search_states: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        
+        http_pool = get_http_pool(**self.config["http"])
+        health_config = self.config["health"]
+        self.checker = get_link_checker(
+            pool=http_pool,
+            ttl=health_config["ttl"],
+            failure_ttl=health_config["failure_ttl"],
+            cache_entries=health_config["cache_entries"]
+        )
+        preview_config = self.config["preview"]
+        self.previews: Optional[LinkPreviewFetcher] = None
+        if preview_config["enabled"]:
+            self.previews = get_preview_fetcher(
+                pool=http_pool,
+                cache_dir=preview_config["cache_dir"],
+                icon_size=preview_config["icon_size"],
+                display_size=preview_config["display_size"],
+                concurrency=preview_config["concurrency"],
+                ttl=preview_config["ttl"],
+                max_html_bytes=preview_config["max_html_bytes"],
+                max_icon_bytes=preview_config["max_icon_bytes"]
+            )
         
     def get_category_links(self, category: str) -> List[Dict[str, str]]:
         """获取指定分类的链接"""
         return self.config["categories"].get(category, {}).get("links", [])
     
-    def add_custom_link(self, name: str, url: str, description: str, category: str) -> str:
-        """添加自定义链接"""
+    def add_custom_link(self, name: str, url: str, description: str, category: str,
+                        owner: str = DEFAULT_OWNER) -> str:
+        """添加自定义链接（同一用户的相同URL只保留一条，再次添加时更新）"""
         if not name.strip() or not url.strip():
             return "❌ 名称和URL不能为空"
         
+        url = url.strip()
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
         custom_link = {
-            "name": name,
+            "name": name.strip(),
             "url": url,
-            "description": description,
-            "category": category
+            "description": description or "",
+            "category": category or "其他"
         }
         
-        self.custom_links.append(custom_link)
+        def apply(owner_links):
+            # 在链接库缓存锁内写入，索引与缓存内容同步时只需增量添加这一条
+            state = self._search_states.get(owner)
+            in_sync = (state is not None and state["links"] is owner_links
+                       and state["revision"] == owner_links.revision)
+            self.store.add(owner, custom_link)
+            if in_sync:
+                state["index"].add(custom_link)
+                state["revision"] = owner_links.revision
+        
+        self.store.read(owner, apply)
+        if self.previews is not None:
+            self.previews.prefetch_async([url])
         return f"✅ 成功添加自定义链接：{name}"
     
-    def get_custom_links(self) -> List[Dict[str, str]]:
+    def import_links(self, path: str, owner: str = DEFAULT_OWNER) -> str:
+        """从书签HTML/JSON/CSV文件批量导入（流式解析，URL规范化去重后整批写入）"""
+        if not path:
+            return "❌ 请先上传书签文件"
+        
+        max_links = self.config["transfer"]["max_links"]
+        stats: Dict[str, int] = {}
+        links = iter_import(path, stats)
+        try:
+            imported = self.store.add_many(owner, itertools.islice(links, max_links))
+            truncated = next(links, None) is not None
+        except (OSError, ValueError, csv.Error) as e:
+            return f"❌ 导入失败: {str(e)}"
+        finally:
+            links.close()
+        
+        return (f"✅ 导入 {imported} 个链接（共读取 {stats['total']} 条，重复 {stats['duplicates']} 条，"
+                f"无效 {stats['invalid']} 条）" + (f"，超过上限 {max_links}，其余未导入" if truncated else ""))
+    
+    def export_links(self, export_format: str, owner: str = DEFAULT_OWNER) -> Tuple[Optional[str], str]:
+        """导出自定义链接，返回 (文件路径, 状态)"""
+        transfer_config = self.config["transfer"]
+        count = [0]
+        
+        def counted():
+            for link in self.store.iter_links(owner):
+                count[0] += 1
+                yield link
+        
+        path = export_to_file(counted(), export_format, transfer_config["export_dir"], transfer_config["export_ttl"])
+        if not count[0]:
+            os.remove(path)
+            return None, "❌ 暂无自定义链接可导出"
+        return path, f"✅ 已导出 {count[0]} 个链接（{export_format}）"
+    
+    def get_custom_links(self, owner: str = DEFAULT_OWNER) -> List[Dict[str, str]]:
         """获取自定义链接列表"""
-        return self.custom_links
+        return self.store.read(owner, lambda owner_links: owner_links.links())
     
-    def clear_custom_links(self) -> str:
+    def clear_custom_links(self, owner: str = DEFAULT_OWNER) -> str:
         """清空自定义链接"""
-        self.custom_links.clear()
+        self.store.clear(owner)
+        self._search_states.pop(owner, None)
         return "✅ 已清空所有自定义链接"
     
+    def _preview_revision(self) -> int:
+        return self.previews.revision if self.previews is not None else 0
+    
     def generate_category_html(self, category_name: str, category_data: Dict[str, Any]) -> str:
-        """生成分类HTML"""
-        icon = category_data.get("icon", "🔗")
-        color = category_data.get("color", "#3b82f6")
-        links = category_data.get("links", [])
-        
-        html = f"""
-        <div style="margin-bottom: 25px;">
-            <h3 style="color: {color}; display: flex; align-items: center; gap: 8px; margin-bottom: 15px;">
-                <span style="font-size: 1.5em;">{icon}</span>
-                {category_name}
-            </h3>
-            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 15px;">
-        """
-        
-        for link in links:
-            html += f"""
-                <a href="{link['url']}" target="_blank" class="nav-link" 
-                   style="display: block; padding: 15px; background: #f8fafc; border-radius: 12px; 
-                          text-decoration: none; color: #1f2937; border-left: 4px solid {color};
-                          transition: all 0.3s ease; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                    <div style="font-weight: 600; font-size: 1.1em; margin-bottom: 5px;">
-                        {link['name']}
-                    </div>
-                    <div style="color: #6b7280; font-size: 0.9em; line-height: 1.4;">
-                        {link['description']}
-                    </div>
-                </a>
-            """
-        
-        html += """
-            </div>
-        </div>
-        """
-        
-        return html
+        """生成分类HTML（预设分类内容固定，只在网站预览更新后重新渲染）"""
+        revision = self._preview_revision()
+        cached = self._preset_fragments.get(category_name)
+        if cached is None or cached[0] != revision:
+            links = category_data.get("links", [])
+            # 来源：模板代码、分类配置和各链接已抓取的标题/图标
+            previews = [self.previews.get(link["url"]) or {} for link in links] if self.previews is not None else []
+            source = fingerprint(
+                self._asset_source, category_name, category_data,
+                [(preview.get("title"), preview.get("icon")) for preview in previews]
+            )
+            fragment = self.assets.text(
+                f"nav-{fingerprint(category_name)[:12]}",
+                source,
+                lambda: render_section(
+                    category_name,
+                    category_data.get("icon", "🔗"),
+                    category_data.get("color", "#3b82f6"),
+                    links,
+                    self.previews
+                )
+            )
+            cached = (revision, fragment)
+            self._preset_fragments[category_name] = cached
+        return cached[1]
     
-    def generate_custom_links_html(self) -> str:
-        """生成自定义链接HTML"""
-        if not self.custom_links:
-            return """
-            <div style="text-align: center; padding: 40px; color: #6b7280;">
-                <p style="font-size: 1.1em;">暂无自定义链接</p>
-                <p style="font-size: 0.9em;">使用右侧面板添加您常用的网站链接</p>
-            </div>
-            """
-        
-        # 按分类组织自定义链接
-        categories = {}
-        for link in self.custom_links:
-            category = link.get("category", "其他")
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(link)
-        
-        html = ""
-        for category, links in categories.items():
-            html += f"""
-            <div style="margin-bottom: 25px;">
-                <h3 style="color: #8b5cf6; display: flex; align-items: center; gap: 8px; margin-bottom: 15px;">
-                    <span style="font-size: 1.5em;">📌</span>
-                    {category}
-                </h3>
-                <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 15px;">
-            """
+    def precompile(self):
+        """预先渲染全部预设分类（来源未变时从静态资源缓存读取）"""
+        for category_name, category_data in self.config["categories"].items():
+            self.generate_category_html(category_name, category_data)
+    
+    def _render_owner(self, owner: str, owner_links) -> str:
+        with self._lock:
+            state = self._render_states.get(owner)
+            if state is None:
+                state = {"revision": None, "html": "", "fragments": {}}
+                self._render_states[owner] = state
+                while len(self._render_states) > self.store.cache_owners:
+                    self._render_states.popitem(last=False)
+            else:
+                self._render_states.move_to_end(owner)
             
-            for link in links:
-                html += f"""
-                    <a href="{link['url']}" target="_blank" class="nav-link"
-                       style="display: block; padding: 15px; background: #f8fafc; border-radius: 12px;
-                              text-decoration: none; color: #1f2937; border-left: 4px solid #8b5cf6;
-                              transition: all 0.3s ease; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                        <div style="font-weight: 600; font-size: 1.1em; margin-bottom: 5px;">
-                            {link['name']}
-                        </div>
-                        <div style="color: #6b7280; font-size: 0.9em; line-height: 1.4;">
-                            {link['description']}
-                        </div>
-                    </a>
-                """
+            revision = (owner_links.revision, self._preview_revision())
+            if state["revision"] == revision:
+                return state["html"]
             
-            html += """
-                </div>
+            # 按分类组织自定义链接（分类顺序为首次添加的顺序）
+            parts = []
+            fragments = {}
+            for category, links in owner_links.categories.items():
+                category_revision = (owner_links.category_revisions[category], revision[1])
+                cached = state["fragments"].get(category)
+                if cached is None or cached[0] != category_revision:
+                    cached = (category_revision, render_section(
+                        category, CUSTOM_LINK_ICON, CUSTOM_LINK_COLOR, links, self.previews
+                    ))
+                fragments[category] = cached
+                parts.append(cached[1])
+            
+            state["fragments"] = fragments
+            state["html"] = "".join(parts) if parts else _EMPTY_CUSTOM_HTML
+            state["revision"] = revision
+            return state["html"]
+    
+    def generate_custom_links_html(self, owner: str = DEFAULT_OWNER) -> str:
+        """生成自定义链接HTML（修订号未变时直接返回上次结果，只重新渲染有变化的分类）"""
+        return self.store.read(owner, lambda owner_links: self._render_owner(owner, owner_links))
+    
+    def _owner_index(self, owner: str, owner_links) -> LinkSearchIndex:
+        """用户自定义链接的搜索索引（须在链接库缓存锁内调用）"""
+        state = self._search_states.get(owner)
+        if state is None or state["links"] is not owner_links or state["revision"] != owner_links.revision:
+            state = {
+                "links": owner_links,
+                "revision": owner_links.revision,
+                "index": LinkSearchIndex(owner_links.links())
+            }
+            self._search_states[owner] = state
+            while len(self._search_states) > self.store.cache_owners:
+                self._search_states.popitem(last=False)
+        else:
+            self._search_states.move_to_end(owner)
+        return state["index"]
+    
+    def search_links(self, query: str, owner: str = DEFAULT_OWNER, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """在预设链接和用户的自定义链接中搜索，按匹配得分排序"""
+        limit = limit or self.config["search"]["limit"]
+        results = self._preset_index.search(query, limit)
+        results += self.store.read(owner, lambda owner_links: self._owner_index(owner, owner_links).search(query, limit))
+        results.sort(key=lambda item: item[0], reverse=True)
+        return [link for _, link in results[:limit]]
+    
+    def generate_search_html(self, query: str, owner: str = DEFAULT_OWNER) -> str:
+        """生成搜索结果HTML（查询为空时不显示）"""
+        if not query.strip():
+            return ""
+        links = self.search_links(query, owner)
+        if not links:
+            return _EMPTY_SEARCH_HTML
+        return render_section(f"搜索结果（{len(links)}）", SEARCH_RESULT_ICON, SEARCH_RESULT_COLOR, links,
+                              self.previews)
+    
+    def get_preset_links(self) -> List[Dict[str, str]]:
+        """所有预设分类的链接"""
+        return [link for category in self.config["categories"].values() for link in category.get("links", [])]
+    
+    def all_link_urls(self) -> List[str]:
+        """预设链接和用户自定义链接的URL（后台检查使用），自定义链接只取最近添加的 max_urls 个"""
+        return ([link["url"] for link in self.get_preset_links()]
+                + self.store.all_urls(self.config["health"]["max_urls"]))
+    
+    def start_health_checks(self):
+        """按配置启动后台链接检查"""
+        health_config = self.config["health"]
+        if health_config["background"]:
+            self.checker.start_background(self.all_link_urls, health_config["interval"])
+    
+    def start_preview_prefetch(self):
+        """启动后台网站预览预取（首轮立即执行）"""
+        if self.previews is not None:
+            self.previews.start_background(self.all_link_urls, self.config["preview"]["interval"])
+    
+    def check_embeddable(self, url: str) -> Dict[str, Any]:
+        """检查网站能否访问以及是否允许被嵌入（优先使用缓存结果）"""
+        return self.checker.check(url)
+    
+    def generate_health_html(self, owner: str = DEFAULT_OWNER, force: bool = False) -> str:
+        """检查预设链接和用户的自定义链接，列出无法访问或禁止嵌入的链接"""
+        links = self.get_preset_links() + self.get_custom_links(owner)
+        results = self.checker.check_many((link["url"] for link in links), force=force)
+        
+        rows = []
+        broken = blocked = 0
+        for link in links:
+            result = results[link["url"]]
+            if not result["ok"]:
+                broken += 1
+                state = "❌ 无法访问"
+                detail = f"HTTP {result['status']}" if result["status"] else result["error"]
+            elif result["embeddable"] is False:
+                blocked += 1
+                state = "⚠️ 禁止嵌入"
+                detail = result["embed_reason"]
+            else:
+                continue
+            rows.append(_HEALTH_ROW_TEMPLATE.format(
+                url=html.escape(link["url"], quote=True),
+                name=html.escape(link["name"]),
+                state=state,
+                detail=html.escape(detail)
+            ))
+        
+        summary = (f"共检查 {len(results)} 个链接：{len(results) - broken} 个可访问，"
+                   f"{broken} 个无法访问，{blocked} 个禁止iframe嵌入")
+        if not rows:
+            return f'<div style="padding: 15px; color: #059669;">✅ {summary}</div>'
+        return f"""
+            <div style="padding: 15px;">
+                <p style="margin-bottom: 10px;">{summary}</p>
+                <table style="width: 100%; border-collapse: collapse;">
+                    <tr style="background: #f1f5f9;">
+                        <th style="padding: 6px 10px; text-align: left;">链接</th>
+                        <th style="padding: 6px 10px; text-align: left;">状态</th>
+                        <th style="padding: 6px 10px; text-align: left;">详情</th>
+                    </tr>{"".join(rows)}
+                </table>
             </div>
             """
-        
-        return html
 
 def create_navigation_interface():
     """创建导航界面"""
     manager = NavigationManager()
+    manager.precompile()
+    manager.start_health_checks()
+    manager.start_preview_prefetch()
     
     with gr.Tab("🧭 平台导航"):
         gr.Markdown("""
@@ -149,20 +445,44 @@ def create_navigation_interface():
         快速访问常用的开发工具、设计平台、AI工具和学习资源，支持添加自定义链接。
         """)
         
+        # 自定义链接（按用户隔离：浏览器本地保存随机ID，登录用户使用用户名）
+        if hasattr(gr, "BrowserState"):
+            owner_id = gr.BrowserState("", storage_key="chainsuite_link_owner")
+        else:
+            owner_id = gr.State("")
+        
+        # 链接搜索（输入时实时更新，只处理最后一次输入）
+        search_box = gr.Textbox(
+            label="🔍 搜索链接",
+            placeholder="输入名称、描述、网址或拼音，例如：github、代码、sheji"
+        )
+        search_results = gr.HTML()
+        
+        def search_links(query, browser_id, request: gr.Request):
+            owner, browser_id = resolve_owner(browser_id, request)
+            return manager.generate_search_html(query, owner), browser_id
+        
+        search_box.change(
+            fn=search_links,
+            inputs=[search_box, owner_id],
+            outputs=[search_results, owner_id],
+            trigger_mode="always_last",
+            **event_options("html")
+        )
+        
         with gr.Tabs():
             # 预设分类导航
             for category_name, category_data in manager.config["categories"].items():
                 with gr.Tab(f"{category_data['icon']} {category_name}"):
-                    category_html = manager.generate_category_html(category_name, category_data)
-                    gr.HTML(category_html)
+                    # 传入函数，每次页面加载时取最新渲染结果（网站预览在后台陆续抓取）
+                    gr.HTML(lambda name=category_name, data=category_data: manager.generate_category_html(name, data))
             
-            # 自定义链接
-            with gr.Tab("📌 自定义链接"):
+            with gr.Tab("📌 自定义链接") as custom_tab:
                 with gr.Row():
                     with gr.Column(scale=2):
                         # 显示自定义链接
                         custom_links_display = gr.HTML(
-                            value=manager.generate_custom_links_html(),
+                            value=_EMPTY_CUSTOM_HTML,
                             label="我的自定义链接"
                         )
                     
@@ -196,6 +516,23 @@ def create_navigation_interface():
                             add_btn = gr.Button("➕ 添加链接", variant="primary")
                             add_status = gr.Textbox(label="状态", interactive=False)
                         
+                        gr.Markdown("### 📥 导入 / 导出")
+                        with gr.Group():
+                            import_file = gr.File(
+                                label="书签文件（浏览器导出的HTML、JSON或CSV）",
+                                file_types=[".html", ".htm", ".json", ".jsonl", ".csv"],
+                                type="filepath"
+                            )
+                            import_btn = gr.Button("📥 导入链接", variant="secondary")
+                            export_format = gr.Radio(
+                                choices=list(EXPORT_FORMATS),
+                                value="HTML",
+                                label="导出格式"
+                            )
+                            export_btn = gr.Button("📤 导出链接", variant="secondary")
+                            export_file = gr.File(label="导出文件", interactive=False)
+                            transfer_status = gr.Textbox(label="导入导出状态", interactive=False)
+                        
                         gr.Markdown("### 🗑️ 管理链接")
                         clear_btn = gr.Button("清空所有自定义链接", variant="secondary")
                         clear_status = gr.Textbox(label="操作状态", interactive=False)
@@ -205,29 +542,96 @@ def create_navigation_interface():
                         - 添加您常用的网站链接
                         - 支持分类管理
                         - 链接会在新标签页打开
+                        - 链接保存在服务器上，只对您本人可见
+                        - 支持导入浏览器书签（分类取书签文件夹名），重复网址自动合并
                         - 可随时清空重新添加
                         """)
                 
                 # 事件绑定
-                def add_link_and_refresh(name, url, desc, category):
-                    status = manager.add_custom_link(name, url, desc, category)
-                    new_html = manager.generate_custom_links_html()
-                    return new_html, status, "", "", "", "其他"
+                def show_links(browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    return manager.generate_custom_links_html(owner), browser_id
+                
+                custom_tab.select(
+                    fn=show_links,
+                    inputs=[owner_id],
+                    outputs=[custom_links_display, owner_id],
+                    **event_options("html")
+                )
+                
+                def add_link_and_refresh(name, url, desc, category, browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    status = manager.add_custom_link(name, url, desc, category, owner)
+                    new_html = manager.generate_custom_links_html(owner)
+                    return new_html, status, "", "", "", "其他", browser_id
                 
                 add_btn.click(
                     fn=add_link_and_refresh,
-                    inputs=[link_name, link_url, link_description, link_category],
-                    outputs=[custom_links_display, add_status, link_name, link_url, link_description, link_category]
+                    inputs=[link_name, link_url, link_description, link_category, owner_id],
+                    outputs=[custom_links_display, add_status, link_name, link_url, link_description,
+                             link_category, owner_id],
+                    **event_options("html")
+                )
+                
+                def import_and_refresh(path, browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    status = manager.import_links(path, owner)
+                    return manager.generate_custom_links_html(owner), status, browser_id
+                
+                import_btn.click(
+                    fn=import_and_refresh,
+                    inputs=[import_file, owner_id],
+                    outputs=[custom_links_display, transfer_status, owner_id],
+                    **event_options("links")
+                )
+                
+                def export_for_owner(export_format, browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    path, status = manager.export_links(export_format, owner)
+                    return path, status, browser_id
+                
+                export_btn.click(
+                    fn=export_for_owner,
+                    inputs=[export_format, owner_id],
+                    outputs=[export_file, transfer_status, owner_id],
+                    **event_options("links")
                 )
                 
-                def clear_links_and_refresh():
-                    status = manager.clear_custom_links()
-                    new_html = manager.generate_custom_links_html()
-                    return new_html, status
+                def clear_links_and_refresh(browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    status = manager.clear_custom_links(owner)
+                    new_html = manager.generate_custom_links_html(owner)
+                    return new_html, status, browser_id
                 
                 clear_btn.click(
                     fn=clear_links_and_refresh,
-                    outputs=[custom_links_display, clear_status]
+                    inputs=[owner_id],
+                    outputs=[custom_links_display, clear_status, owner_id],
+                    **event_options("html")
+                )
+            
+            # 链接健康检查
+            with gr.Tab("🩺 链接检查"):
+                gr.Markdown("""
+                ### 链接健康检查
+                检查预设链接和您的自定义链接能否访问、是否允许嵌入。结果会缓存一段时间，
+                后台也会定期检查全部链接。
+                """)
+                
+                with gr.Row():
+                    force_check = gr.Checkbox(label="忽略缓存重新检查", value=False)
+                    check_btn = gr.Button("🩺 检查链接", variant="primary")
+                health_display = gr.HTML()
+                
+                def check_links(force, browser_id, request: gr.Request):
+                    owner, browser_id = resolve_owner(browser_id, request)
+                    return manager.generate_health_html(owner, force), browser_id
+                
+                check_btn.click(
+                    fn=check_links,
+                    inputs=[force_check, owner_id],
+                    outputs=[health_display, owner_id],
+                    **event_options("links")
                 )
             
             # 网站嵌入（iframe）
@@ -269,7 +673,8 @@ def create_navigation_interface():
                             quick_btn = gr.Button(site_name, size="sm")
                             quick_btn.click(
                                 lambda url=site_url: url,
-                                outputs=[iframe_url]
+                                outputs=[iframe_url],
+                                **event_options("html")
                             )
                 
                 # iframe显示区域
@@ -294,18 +699,43 @@ def create_navigation_interface():
                     if not url.startswith(('http://', 'https://')):
                         url = 'https://' + url
                     
-                    iframe_html = f"""
+                    # 先检查网站状态，禁止嵌入的网站不再渲染空白的iframe
+                    result = manager.check_embeddable(url)
+                    # 以下片段中的URL统一转义（与 render_section 一致）
+                    safe_url = html.escape(url, quote=True)
+                    if not result["ok"]:
+                        reason = f"HTTP {result['status']}" if result["status"] else result["error"]
+                        warning = f"⚠️ 网站当前无法访问（{html.escape(reason)}），嵌入可能显示空白"
+                    elif result["embeddable"] is False:
+                        return f"""
+                        <div style="text-align: center; padding: 40px; background: #fffbeb; border-radius: 12px; color: #92400e;">
+                            <p>⚠️ 该网站禁止被嵌入（{html.escape(result['embed_reason'])}）</p>
+                            <a href="{safe_url}" target="_blank" style="color: #3b82f6; text-decoration: none;">
+                                🔗 在新标签页中打开
+                            </a>
+                        </div>
+                        """
+                    else:
+                        warning = ""
+                    
+                    warning_html = f"""
+                    <div style="margin-bottom: 10px; padding: 10px; background: #fffbeb; border-radius: 8px; color: #92400e;">
+                        {warning}
+                    </div>
+                    """ if warning else ""
+                    
+                    iframe_html = warning_html + f"""
                     <div style="border-radius: 12px; overflow: hidden; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
-                        <iframe src="{url}" 
+                        <iframe src="{safe_url}" 
                                 width="100%" 
                                 height="{height}px" 
                                 frameborder="0"
                                 style="border-radius: 12px;">
-                            <p>您的浏览器不支持iframe，请直接访问：<a href="{url}" target="_blank">{url}</a></p>
+                            <p>您的浏览器不支持iframe，请直接访问：<a href="{safe_url}" target="_blank">{safe_url}</a></p>
                         </iframe>
                     </div>
                     <div style="margin-top: 10px; text-align: center;">
-                        <a href="{url}" target="_blank" style="color: #3b82f6; text-decoration: none;">
+                        <a href="{safe_url}" target="_blank" style="color: #3b82f6; text-decoration: none;">
                             🔗 在新标签页中打开
                         </a>
                     </div>
@@ -316,12 +746,13 @@ def create_navigation_interface():
                 embed_btn.click(
                     fn=embed_website,
                     inputs=[iframe_url, iframe_height],
-                    outputs=[iframe_display]
+                    outputs=[iframe_display],
+                    **event_options("links")
                 )
                 
                 gr.Markdown("""
                 **注意事项：**
-                - 某些网站可能不允许嵌入显示
+                - 嵌入前会检查网站的 X-Frame-Options / CSP 设置，禁止嵌入的网站请在新标签页打开
                 - 如遇到显示问题，请尝试在新标签页打开
                 - 嵌入的网站功能完全正常，支持登录和操作
                 - 建议使用HTTPS协议的网站以获得最佳体验
@@ -338,6 +769,11 @@ def create_navigation_interface():
             - **AI工具**：ChatGPT、Midjourney、Claude等AI服务
             - **学习资源**：Coursera、edX、Khan Academy等学习平台
             
+            **链接搜索：**
+            - 同时搜索预设链接和自定义链接
+            - 支持名称、描述、网址匹配及拼写容错
+            - 支持拼音全拼和首字母搜索（如 sheji、sj）
+            
             **自定义链接管理：**
             - 添加个人常用网站
             - 支持分类整理
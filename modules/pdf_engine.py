@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF处理引擎
+基于PyMuPDF（可选依赖）的逐页文本提取、多进程页面渲染和PDF内嵌图片压缩。
+各操作均为生成器，逐页产出结果，内存占用只与单页相关。
+本模块不导入gradio，进程池子进程只需加载本模块
+创建时间: 2025-06-19
+"""
+
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from config import DOCUMENT_PROCESSING_CONFIG
+from modules.image_codec import DEFAULT_QUALITY, FILE_EXTENSIONS, save_image
+
+ENGINE_CONFIG = DOCUMENT_PROCESSING_CONFIG["engine"]
+
+
+def pymupdf_available() -> bool:
+    """检查是否安装了PyMuPDF"""
+    try:
+        import pymupdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def page_count(path: str) -> int:
+    """PDF页数"""
+    import pymupdf
+
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+
+def new_job_dir(prefix: str) -> str:
+    """创建本次处理的输出目录，并清理超过保留时间的旧目录"""
+    root = ENGINE_CONFIG["output_dir"]
+    os.makedirs(root, exist_ok=True)
+    expire_before = time.time() - ENGINE_CONFIG["job_ttl"]
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < expire_before:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+    return tempfile.mkdtemp(prefix=prefix, dir=root)
+
+
+def iter_page_text(path: str) -> Iterator[Tuple[int, int, str]]:
+    """逐页提取文本，产出 (页码, 总页数, 文本)"""
+    import pymupdf
+
+    with pymupdf.open(path) as doc:
+        total = doc.page_count
+        for page in doc:
+            yield page.number, total, page.get_text()
+
+
+def _render_pages(path: str, pages: List[int], dpi: int, output_dir: str,
+                  image_format: str = "PNG", quality: int = DEFAULT_QUALITY) -> List[str]:
+    """子进程：渲染若干页为图片文件，返回文件路径（只传路径，避免在进程间传输像素）
+
+    PNG由PyMuPDF直接编码；JPEG/WEBP使用与图片压缩相同的编码参数。
+    """
+    import pymupdf
+    from PIL import Image
+
+    image_format = image_format.upper()
+    extension = FILE_EXTENSIONS[image_format]
+    paths = []
+    with pymupdf.open(path) as doc:
+        for number in pages:
+            output_path = os.path.join(output_dir, f"page_{number + 1:04d}{extension}")
+            pixmap = doc.load_page(number).get_pixmap(dpi=dpi)
+            if image_format == "PNG":
+                pixmap.save(output_path)
+            else:
+                mode = "L" if pixmap.n == 1 else "RGB"
+                image = Image.frombytes(mode, (pixmap.width, pixmap.height), pixmap.samples)
+                with open(output_path, "wb") as f:
+                    save_image(image, f, image_format, quality)
+            paths.append(output_path)
+    return paths
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Tuple[ProcessPoolExecutor, int]:
+    """进程内共享的渲染进程池（首次使用时创建），返回 (进程池, 进程数)"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool_workers = ENGINE_CONFIG.get("workers") or os.cpu_count() or 1
+            # spawn方式启动：Gradio进程中有大量线程，fork可能复制到被占用的锁
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_process_pool_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool, _process_pool_workers
+
+
+def page_chunks(total: int, chunk_size: int) -> Iterator[List[int]]:
+    """划分渲染任务：第一页单独成块以便尽快返回首页结果"""
+    if total <= 0:
+        return
+    yield [0]
+    for start in range(1, total, chunk_size):
+        yield list(range(start, min(start + chunk_size, total)))
+
+
+def iter_rendered_pages(path: str, dpi: int, output_dir: str, image_format: str = "PNG",
+                        quality: int = DEFAULT_QUALITY) -> Iterator[Tuple[int, int, str]]:
+    """多进程渲染页面，按页码顺序产出 (页码, 总页数, 图片路径)
+
+    同时提交的任务数限制为进程数的2倍，调用方停止迭代时取消尚未开始的任务。
+    """
+    total = page_count(path)
+    pool, workers = get_process_pool()
+    chunks = page_chunks(total, max(1, ENGINE_CONFIG["pages_per_task"]))
+    pending = deque()
+
+    def fill():
+        while len(pending) < workers * 2:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            pending.append((chunk, pool.submit(_render_pages, path, chunk, dpi, output_dir, image_format, quality)))
+
+    try:
+        fill()
+        while pending:
+            chunk, future = pending.popleft()
+            paths = future.result()
+            fill()
+            for number, image_path in zip(chunk, paths):
+                yield number, total, image_path
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def _image_dpi(page, xref: int, pixel_width: int) -> float:
+    """图片在页面上的实际分辨率（同一图片多处引用时取最大显示尺寸）"""
+    rects = page.get_image_rects(xref)
+    width_points = max((rect.width for rect in rects), default=0)
+    if width_points <= 0:
+        return 0.0
+    return pixel_width / (width_points / 72.0)
+
+
+def iter_compress_pdf(path: str, output_path: str, max_dpi: int, quality: int) -> Iterator[Tuple[int, int, int]]:
+    """逐页压缩内嵌图片，每处理完一页产出 (已处理页数, 总页数, 累计节省字节)
+
+    超过 max_dpi 的图片按比例缩小并重新编码为JPEG，仅在结果更小时替换；
+    带透明蒙版的图片和无法解码的图片保持不变。迭代结束时写出压缩后的PDF。
+    """
+    import pymupdf
+    from PIL import Image
+
+    saved = 0
+    seen = set()
+    with pymupdf.open(path) as doc:
+        total = doc.page_count
+        for page in doc:
+            for info in page.get_images(full=True):
+                xref, smask = info[0], info[1]
+                if xref in seen or smask:
+                    continue
+                seen.add(xref)
+
+                extracted = doc.extract_image(xref)
+                if not extracted:
+                    continue
+                original_size = len(extracted["image"])
+                try:
+                    with Image.open(io.BytesIO(extracted["image"])) as image:
+                        dpi = _image_dpi(page, xref, image.width)
+                        if dpi > max_dpi:
+                            factor = max_dpi / dpi
+                            image = image.resize(
+                                (max(1, int(image.width * factor)), max(1, int(image.height * factor))),
+                                Image.Resampling.LANCZOS
+                            )
+                        buffer = io.BytesIO()
+                        save_image(image, buffer, "JPEG", quality)
+                except (Image.UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+                    # PIL无法解码的图片（如JBIG2、JPX、部分CMYK/ICC图片）保持原样，不影响其他图片
+                    continue
+
+                if buffer.tell() < original_size:
+                    page.replace_image(xref, stream=buffer.getvalue())
+                    saved += original_size - buffer.tell()
+            yield page.number + 1, total, saved
+
+        doc.save(output_path, garbage=3, deflate=True)
+
+
+# 导出接口
+__all__ = [
+    "pymupdf_available", "page_count", "new_job_dir", "iter_page_text", "get_process_pool",
+    "page_chunks", "iter_rendered_pages", "iter_compress_pdf"
+]
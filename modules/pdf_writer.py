@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式PDF写入模块
+每页一张JPEG图片（DCTDecode，直接嵌入JPEG字节无需解码），逐页写入文件，
+内存中只保留对象偏移量；原本就是JPEG的图片不重新编码
+创建时间: 2025-06-19
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from modules.image_codec import DEFAULT_QUALITY, encode_image
+from modules.module_loader import lazy_import
+
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+_COLOR_SPACES = {"RGB": b"/DeviceRGB", "L": b"/DeviceGray"}
+
+# PDF对象编号：1为目录，2为页面树，之后每页占用 图片/内容/页面 三个对象
+_CATALOG_ID = 1
+_PAGES_ID = 2
+
+
+class StreamingPdfWriter:
+    """逐页写入的最小PDF生成器"""
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self._offsets = {}
+        self._page_ids: List[int] = []
+        self._next_id = _PAGES_ID + 1
+        self.output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(_CATALOG_ID, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    def _write_object(self, object_id: int, body: bytes, stream: Optional[bytes] = None):
+        self._offsets[object_id] = self.output.tell()
+        self.output.write(b"%d 0 obj\n" % object_id)
+        self.output.write(body)
+        if stream is not None:
+            self.output.write(b"\nstream\n")
+            self.output.write(stream)
+            self.output.write(b"\nendstream")
+        self.output.write(b"\nendobj\n")
+
+    def add_jpeg_page(self, jpeg: bytes, width: int, height: int, mode: str = "RGB", dpi: float = 72.0):
+        """添加一页，页面尺寸由像素尺寸和DPI决定"""
+        image_id, content_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+
+        self._write_object(image_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                                     b"/ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+                           % (width, height, _COLOR_SPACES[mode], len(jpeg)), jpeg)
+
+        page_width = width * 72.0 / dpi
+        page_height = height * 72.0 / dpi
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (page_width, page_height)
+        self._write_object(content_id, b"<< /Length %d >>" % len(content), content)
+
+        self._write_object(page_id, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                                    b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+                           % (page_width, page_height, image_id, content_id))
+        self._page_ids.append(page_id)
+
+    def close(self):
+        """写入页面树、交叉引用表和文件尾"""
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._write_object(_PAGES_ID, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)))
+
+        xref_offset = self.output.tell()
+        size = self._next_id
+        self.output.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for object_id in range(1, size):
+            self.output.write(b"%010d 00000 n \n" % self._offsets[object_id])
+        self.output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_offset))
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+
+def prepare_jpeg_page(path: str, quality: int = DEFAULT_QUALITY,
+                      default_dpi: float = 150.0) -> Tuple[bytes, int, int, str, float]:
+    """读取一张图片并准备为PDF页面，返回 (JPEG字节, 宽, 高, 色彩模式, DPI)
+
+    无需旋转的RGB/灰度JPEG直接使用原文件字节；其他图片按图片压缩的参数重新编码。
+    """
+    with Image.open(path) as image:
+        dpi = image.info.get("dpi", (default_dpi,))[0] or default_dpi
+        orientation = image.getexif().get(0x0112, 1)
+        if image.format == "JPEG" and image.mode in _COLOR_SPACES and orientation == 1:
+            with open(path, "rb") as f:
+                return f.read(), image.width, image.height, image.mode, float(dpi)
+
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L", "RGBA", "LA", "P"):
+            image = image.convert("RGB")
+        # 透明图像由编码函数合成到白色背景
+        jpeg = encode_image(image, "JPEG", quality)
+        mode = "L" if image.mode == "L" else "RGB"
+        return jpeg, image.width, image.height, mode, float(dpi)
+
+
+def iter_images_to_pdf(paths: List[str], output_path: str, quality: int = DEFAULT_QUALITY,
+                       default_dpi: float = 150.0, workers: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """将多张图片按顺序合并为PDF，每写入一页产出 (已写入页数, 总页数)
+
+    解码和编码在线程池中并行（PIL编解码时释放GIL），同时准备的页数限制为线程数的2倍，
+    页面按输入顺序写入文件。
+    """
+    total = len(paths)
+    workers = workers or os.cpu_count() or 1
+    with open(output_path, "wb") as f, ThreadPoolExecutor(max_workers=workers) as executor:
+        writer = StreamingPdfWriter(f)
+        window = workers * 2
+        remaining = iter(paths)
+        pending = deque()
+
+        def fill():
+            while len(pending) < window:
+                path = next(remaining, None)
+                if path is None:
+                    return
+                pending.append(executor.submit(prepare_jpeg_page, path, quality, default_dpi))
+
+        fill()
+        while pending:
+            jpeg, width, height, mode, dpi = pending.popleft().result()
+            fill()
+            writer.add_jpeg_page(jpeg, width, height, mode, dpi)
+            yield writer.page_count, total
+        writer.close()
+
+
+# 导出接口
+__all__ = ["StreamingPdfWriter", "prepare_jpeg_page", "iter_images_to_pdf"]
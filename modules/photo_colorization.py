@@ -1,27 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片上色模块
+在Lab色彩空间中以固定低分辨率预测ab色度通道，再放大叠加到原分辨率的L亮度通道，
+模型计算量与输入尺寸无关
+创建时间: 2025-06-19
+"""
+
+from __future__ import annotations
+
 import gradio as gr
+import threading
+import time
+from typing import List, Optional, Tuple
 from config import PHOTO_COLORIZATION_CONFIG
+from modules.batching import get_batcher
+from modules.inference import get_session_pool
+from modules.metrics import instrument_processor
+from modules.module_loader import lazy_import
+from modules.queue_config import event_options
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# sRGB(D65) 与 XYZ 的转换矩阵
+_RGB_TO_XYZ = (
+    (0.4124564, 0.3575761, 0.1804375),
+    (0.2126729, 0.7151522, 0.0721750),
+    (0.0193339, 0.1191920, 0.9503041)
+)
+_XYZ_TO_RGB = (
+    (3.2404542, -1.5371385, -0.4985314),
+    (-0.9692660, 1.8760108, 0.0415560),
+    (0.0556434, -0.2040259, 1.0572252)
+)
+_WHITE_POINT = (0.95047, 1.0, 1.08883)
+
+
+def _srgb_to_linear(rgb):
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(linear):
+    linear = np.clip(linear, 0.0, 1.0)
+    return np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+
+
+def _lab_f(t):
+    return np.where(t > 0.008856, np.cbrt(t), 7.787 * t + 16.0 / 116.0)
+
+
+def _lab_f_inv(t):
+    cube = t ** 3
+    return np.where(cube > 0.008856, cube, (t - 16.0 / 116.0) / 7.787)
+
+
+def rgb_to_lightness(rgb):
+    """只计算L通道（原分辨率下无需计算完整Lab）"""
+    y = _srgb_to_linear(rgb) @ np.asarray(_RGB_TO_XYZ[1], dtype=np.float32)
+    return (116.0 * _lab_f(y) - 16.0).astype(np.float32)
+
+
+def lab_to_rgb(lightness, ab):
+    """Lab转sRGB，输入 HxW 的L和 HxWx2 的ab，输出 0~1 的 HxWx3"""
+    fy = (lightness + 16.0) / 116.0
+    fx = fy + ab[:, :, 0] / 500.0
+    fz = fy - ab[:, :, 1] / 200.0
+    xyz = np.stack([_lab_f_inv(fx), _lab_f_inv(fy), _lab_f_inv(fz)], axis=-1)
+    xyz *= np.asarray(_WHITE_POINT, dtype=np.float32)
+    linear = xyz @ np.asarray(_XYZ_TO_RGB, dtype=np.float32).T
+    return _linear_to_srgb(linear).astype(np.float32)
+
+
+class PhotoColorizationProcessor:
+    """图片上色处理器"""
+
+    def __init__(self):
+        self.name = PHOTO_COLORIZATION_CONFIG["name"]
+        self.description = PHOTO_COLORIZATION_CONFIG["description"]
+        self.engine_config = PHOTO_COLORIZATION_CONFIG["engine"]
+
+    def _warmup(self, session):
+        size = self.engine_config["input_size"]
+        input_name = session.get_inputs()[0].name
+        session.run(None, {input_name: np.zeros((1, 1, size, size), dtype=np.float32)})
+
+    def _pool(self):
+        return get_session_pool(
+            self.engine_config["model_path"],
+            size=self.engine_config.get("pool_size"),
+            intra_op_threads=self.engine_config.get("intra_op_threads", 1),
+            warmup=self._warmup
+        )
+
+    def prewarm(self):
+        """后台预先创建并预热全部会话"""
+        pool = self._pool()
+        if pool is not None:
+            threading.Thread(target=pool.prewarm, name="colorization-prewarm", daemon=True).start()
+
+    def _predict_ab(self, session, small_lightness):
+        """对 Nx1xSxS 的归一化L批次预测ab，模型输入批次固定为1时逐张推理"""
+        input_meta = session.get_inputs()[0]
+        if input_meta.shape and input_meta.shape[0] == 1 and len(small_lightness) > 1:
+            outputs = [session.run(None, {input_meta.name: item[None]})[0] for item in small_lightness]
+            return np.concatenate(outputs, axis=0)
+        return session.run(None, {input_meta.name: small_lightness})[0]
+
+    def _run_model(self, smalls: List) -> List:
+        """借出一个会话，对一组 1xSxS 的归一化L执行一次批量推理"""
+        with self._pool().acquire() as session:
+            return list(self._predict_ab(session, np.stack(smalls)))
+
+    def colorize_batch(self, images: List) -> Tuple[List, List[str]]:
+        """批量上色：低分辨率L交给调度器，与其他并发请求合并推理"""
+        pool = self._pool()
+        if pool is None:
+            message = "❌ 未配置上色模型，请在 config.py 的 PHOTO_COLORIZATION_CONFIG['engine']['model_path'] 中指定ONNX模型"
+            return [None] * len(images), [message if image is not None else "❌ 请上传图片" for image in images]
+
+        size = self.engine_config["input_size"]
+        l_center = self.engine_config["l_center"]
+        l_scale = self.engine_config["l_scale"]
+        ab_scale = self.engine_config["ab_scale"]
+
+        results: List[Optional[Image.Image]] = [None] * len(images)
+        statuses = ["❌ 请上传图片"] * len(images)
+        valid = [index for index, image in enumerate(images) if image is not None]
+        if not valid:
+            return results, statuses
+
+        try:
+            start = time.perf_counter()
+            rgb_images = [images[index].convert("RGB") for index in valid]
+
+            # 模型输入：固定尺寸的低分辨率L
+            smalls = [
+                ((rgb_to_lightness(np.asarray(image.resize((size, size), Image.Resampling.BILINEAR),
+                                              dtype=np.float32) / 255.0) - l_center) / l_scale)[None]
+                for image in rgb_images
+            ]
+
+            # 每个调度线程独占一个会话，线程数与会话池大小一致
+            batcher = get_batcher("photo_colorization", self._run_model, workers=pool.size)
+            predicted_ab = batcher.run(smalls) if batcher is not None else self._run_model(smalls)
+            predicted_ab = [ab * ab_scale for ab in predicted_ab]
+            inference_time = time.perf_counter() - start
+
+            for position, index in enumerate(valid):
+                image = rgb_images[position]
+                width, height = image.size
+                # 原分辨率只做L计算和ab放大，计算量与像素数线性相关
+                lightness = rgb_to_lightness(np.asarray(image, dtype=np.float32) / 255.0)
+                ab = np.stack([
+                    np.asarray(Image.fromarray(channel.astype(np.float32), mode="F").resize(
+                        (width, height), Image.Resampling.BICUBIC))
+                    for channel in predicted_ab[position]
+                ], axis=-1)
+                rgb = lab_to_rgb(lightness, ab)
+                results[index] = Image.fromarray((rgb * 255.0 + 0.5).astype(np.uint8))
+                statuses[index] = f"""✅ 图片上色完成！
+
+**上色信息：**
+• 处理引擎：ONNX Runtime（会话池 {pool.size} 个）
+• 图片尺寸：{width} x {height}
+• 模型分辨率：{size} x {size}
+• 批处理数量：{len(valid)}
+• 模型推理：{inference_time:.2f} 秒
+• 总耗时：{time.perf_counter() - start:.2f} 秒"""
+
+        except Exception as e:
+            for index in valid:
+                results[index] = None
+                statuses[index] = f"❌ 上色失败: {str(e)}"
+
+        return results, statuses
+
+    def colorize(self, image: Image.Image) -> Tuple[Optional[Image.Image], str]:
+        """为单张图片上色"""
+        results, statuses = self.colorize_batch([image])
+        return results[0], statuses[0]
+
 
 def create_photo_colorization_interface():
+    """创建图片上色界面"""
+    processor = PhotoColorizationProcessor()
+    if PHOTO_COLORIZATION_CONFIG["engine"].get("prewarm"):
+        processor.prewarm()
+    processor = instrument_processor(processor, "photo_colorization")
+    config = PHOTO_COLORIZATION_CONFIG['functions']['图片上色']
+
     with gr.Tab("🎨 图片上色"):
         gr.Markdown(f"## {PHOTO_COLORIZATION_CONFIG['name']}")
         gr.Markdown(PHOTO_COLORIZATION_CONFIG['description'])
-        
-        config = PHOTO_COLORIZATION_CONFIG['functions']['图片上色']
-        
-        inputs = []
-        for input_type in config['inputs']:
-            if input_type == 'image':
-                inputs.append(gr.Image(type="pil", label="上传图片"))
-                
-        outputs = []
-        for output_type in config['outputs']:
-            if output_type == 'image':
-                outputs.append(gr.Image(type="pil", label="处理结果"))
-                
-        gr.Interface(
-            fn=lambda x: x,  # Placeholder function
-            inputs=inputs,
-            outputs=outputs,
-            title=PHOTO_COLORIZATION_CONFIG['name'],
-            description=config['description']
-        )
\ No newline at end of file
+
+        with gr.Row():
+            with gr.Column():
+                colorize_input = gr.Image(type="pil", label="上传图片", sources=["upload", "clipboard"])
+                colorize_btn = gr.Button("🎨 开始上色", variant="primary")
+
+            with gr.Column():
+                colorize_output = gr.Image(type="pil", label="处理结果")
+                colorize_status = gr.Textbox(label="上色状态", interactive=False, lines=8)
+
+        gr.Markdown(config['description'])
+
+        colorize_btn.click(
+            fn=processor.colorize,
+            inputs=[colorize_input],
+            outputs=[colorize_output, colorize_status],
+            **event_options("ai")
+        )
+
+
+# 导出接口
+__all__ = ["PhotoColorizationProcessor", "create_photo_colorization_interface"]
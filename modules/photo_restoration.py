@@ -1,27 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+老照片修复模块
+划痕/污点检测 + 修补 + 降噪，纯CPU运行，大图按行分块处理（不创建整图大小的浮点数组）
+创建时间: 2025-06-19
+"""
+
+from __future__ import annotations
+
 import gradio as gr
+import time
+from typing import List, Optional, Tuple
 from config import PHOTO_RESTORATION_CONFIG
+from modules.batching import get_batcher
+from modules.inference import get_onnx_session
+from modules.metrics import instrument_processor
+from modules.module_loader import lazy_import
+from modules.queue_config import event_options
+from modules.tiling import run_tiled
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageFilter = lazy_import("PIL.ImageFilter")
+
+
+def _load_cv2():
+    """OpenCV为可选依赖，安装后使用更高质量的修补和降噪算法"""
+    try:
+        import cv2
+    except ImportError:
+        return None
+    return cv2
+
+
+class PhotoRestorationProcessor:
+    """老照片修复处理器"""
+
+    def __init__(self):
+        self.name = PHOTO_RESTORATION_CONFIG["name"]
+        self.description = PHOTO_RESTORATION_CONFIG["description"]
+        self.engine_config = PHOTO_RESTORATION_CONFIG["engine"]
+
+    def _session(self):
+        return get_onnx_session(
+            self.engine_config["model_path"],
+            self.engine_config.get("intra_op_threads")
+        )
+
+    def _keep_components(self, area, width, height):
+        """按连通区域的面积和外接框判断形状：细长的划痕，或小而紧凑的污点"""
+        config = self.engine_config
+        length = np.hypot(width, height)
+        thickness = area / np.maximum(length, 1.0)
+        scratch = (length >= config["min_scratch_length"]) & (length >= config["scratch_elongation"] * thickness)
+        spot = ((area >= config["min_spot_area"]) & (area <= config["max_spot_area"])
+                & (area * 2 >= width * height))
+        return scratch | spot
+
+    def _filter_shapes(self, mask):
+        """只保留形状像缺陷的8连通区域"""
+        cv2 = _load_cv2()
+        if cv2 is not None:
+            _, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+            keep = self._keep_components(
+                stats[:, cv2.CC_STAT_AREA], stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+            keep[0] = False
+            return keep[labels]
+
+        # 无OpenCV时按行程标记：每行的连续像素段为一个行程，相邻行重叠（含对角）的行程属于同一区域
+        padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask > 0
+        edges = np.diff(padded, axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        ends = np.nonzero(edges == -1)[1]
+        parent = list(range(len(rows)))
+
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        row_bounds = np.searchsorted(rows, np.arange(mask.shape[0] + 1))
+        for row in range(mask.shape[0] - 1):
+            a, a_end = row_bounds[row], row_bounds[row + 1]
+            b, b_end = a_end, row_bounds[row + 2]
+            while a < a_end and b < b_end:
+                if starts[a] <= ends[b] and starts[b] <= ends[a]:
+                    parent[find(a)] = find(b)
+                if ends[a] < ends[b]:
+                    a += 1
+                else:
+                    b += 1
+
+        if not parent:
+            return mask > 0
+        labels = np.unique([find(index) for index in range(len(parent))], return_inverse=True)[1]
+        count = labels.max() + 1
+        area = np.bincount(labels, weights=ends - starts, minlength=count)
+        top = np.full(count, mask.shape[0])
+        bottom = np.zeros(count, dtype=np.intp)
+        left = np.full(count, mask.shape[1])
+        right = np.zeros(count, dtype=np.intp)
+        np.minimum.at(top, labels, rows)
+        np.maximum.at(bottom, labels, rows + 1)
+        np.minimum.at(left, labels, starts)
+        np.maximum.at(right, labels, ends)
+        keep = self._keep_components(area, right - left, bottom - top)
+
+        filtered = np.zeros(mask.shape, dtype=bool)
+        for row, start, end in zip(rows[keep[labels]], starts[keep[labels]], ends[keep[labels]]):
+            filtered[row, start:end] = True
+        return filtered
+
+    def _detect_defects(self, tile_u8, sensitivity: float):
+        """检测划痕和污点：与局部中值差异过大、且形状细长或为小污点的结构视为缺陷"""
+        gray_image = Image.fromarray(tile_u8).convert("L")
+        gray = np.asarray(gray_image, dtype=np.int16)
+        median = np.asarray(gray_image.filter(ImageFilter.MedianFilter(5)), dtype=np.int16)
+
+        # 灵敏度 0~1 映射为 60~12 的灰度差阈值
+        threshold = 12 + (1 - sensitivity) * 48
+        mask = (np.abs(gray - median) > threshold).astype(np.uint8)
+        mask = self._filter_shapes(mask).astype(np.uint8) * 255
+        # 略微膨胀，覆盖缺陷边缘
+        mask = np.asarray(Image.fromarray(mask).filter(ImageFilter.MaxFilter(3)))
+        return mask
+
+    def _restore_tile_classical(self, tile_u8, sensitivity: float, denoise: float):
+        """传统算法修复单个图块，返回 (结果, 缺陷像素数)"""
+        cv2 = _load_cv2()
+        mask = self._detect_defects(tile_u8, sensitivity)
+        defect_pixels = int(np.count_nonzero(mask))
+
+        if defect_pixels:
+            if cv2 is not None:
+                repaired = cv2.inpaint(tile_u8, mask, 3, cv2.INPAINT_TELEA)
+            else:
+                median_color = np.asarray(Image.fromarray(tile_u8).filter(ImageFilter.MedianFilter(5)))
+                repaired = np.where(mask[:, :, None] > 0, median_color, tile_u8)
+        else:
+            repaired = tile_u8
+
+        if denoise > 0:
+            if cv2 is not None:
+                bgr = cv2.cvtColor(repaired, cv2.COLOR_RGB2BGR)
+                strength = 3 + denoise * 12
+                bgr = cv2.fastNlMeansDenoisingColored(bgr, None, strength, strength, 7, 21)
+                repaired = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            else:
+                smooth = np.asarray(Image.fromarray(repaired).filter(ImageFilter.MedianFilter(3)), dtype=np.float32)
+                repaired = (repaired.astype(np.float32) * (1 - denoise) + smooth * denoise).astype(np.uint8)
+
+        return repaired, defect_pixels
+
+    def _run_model(self, tiles: List) -> List:
+        """对一组 HxWxC 图块执行一次批量推理"""
+        session = self._session()
+        input_name = session.get_inputs()[0].name
+        # NHWC -> NCHW
+        batch = np.ascontiguousarray(np.stack(tiles).transpose(0, 3, 1, 2))
+        outputs = session.run(None, {input_name: batch})[0]
+        return list(np.clip(outputs.transpose(0, 2, 3, 1), 0.0, 1.0))
+
+    def _restore_image(self, image: Image.Image, denoise: float, sensitivity: float) -> Tuple[Image.Image, str, int]:
+        """分块修复整张图像，返回 (结果图像, 使用的引擎, 缺陷像素数)"""
+        session = self._session()
+        defect_counter = [0]
+
+        if session is not None:
+            # 同时处理的多个请求的图块由调度器合并为一次推理
+            batcher = get_batcher("photo_restoration", self._run_model)
+
+            def process_batch(batch):
+                tiles = list(batch)
+                return np.stack(batcher.run(tiles) if batcher is not None else self._run_model(tiles))
+
+            engine = "ONNX Runtime"
+        else:
+            def process_batch(batch):
+                results = []
+                for tile in batch:
+                    tile_u8 = (tile * 255.0 + 0.5).astype(np.uint8)
+                    repaired, defects = self._restore_tile_classical(tile_u8, sensitivity, denoise)
+                    defect_counter[0] += defects
+                    results.append(repaired.astype(np.float32) / 255.0)
+                return np.stack(results)
+
+            engine = "OpenCV" if _load_cv2() is not None else "PIL"
+
+        restored = run_tiled(
+            image,
+            process_batch,
+            tile=self.engine_config["tile_size"],
+            overlap=self.engine_config["tile_overlap"],
+            batch_size=self.engine_config["tile_batch_size"]
+        )
+        return restored, engine, defect_counter[0]
+
+    def restore_photo(self, image: Image.Image, denoise_strength: float = 0.5,
+                      scratch_sensitivity: float = 0.5) -> Tuple[Optional[Image.Image], str]:
+        """修复老照片"""
+        if image is None:
+            return None, "❌ 请上传图片"
+
+        try:
+            start = time.perf_counter()
+            source = image if image.mode == "RGB" else image.convert("RGB")
+            restored_image, engine, defects = self._restore_image(source, denoise_strength, scratch_sensitivity)
+            elapsed = time.perf_counter() - start
+
+            status = f"""✅ 照片修复完成！
+
+**修复信息：**
+• 处理引擎：{engine}
+• 图片尺寸：{image.size[0]} x {image.size[1]}
+• 划痕灵敏度：{scratch_sensitivity:.1f}
+• 降噪强度：{denoise_strength:.1f}
+• 缺陷像素：{defects if engine != 'ONNX Runtime' else '由模型处理'}
+• 处理耗时：{elapsed:.2f} 秒"""
+
+            return restored_image, status
+
+        except Exception as e:
+            return None, f"❌ 修复失败: {str(e)}"
+
 
 def create_photo_restoration_interface():
+    """创建老照片修复界面"""
+    processor = instrument_processor(PhotoRestorationProcessor(), "photo_restoration")
+    config = PHOTO_RESTORATION_CONFIG['functions']['老照片修复']
+
     with gr.Tab("🖼️ 老照片修复"):
         gr.Markdown(f"## {PHOTO_RESTORATION_CONFIG['name']}")
         gr.Markdown(PHOTO_RESTORATION_CONFIG['description'])
-        
-        config = PHOTO_RESTORATION_CONFIG['functions']['老照片修复']
-        
-        inputs = []
-        for input_type in config['inputs']:
-            if input_type == 'image':
-                inputs.append(gr.Image(type="pil", label="上传图片"))
-                
-        outputs = []
-        for output_type in config['outputs']:
-            if output_type == 'image':
-                outputs.append(gr.Image(type="pil", label="处理结果"))
-                
-        gr.Interface(
-            fn=lambda x: x,  # Placeholder function
-            inputs=inputs,
-            outputs=outputs,
-            title=PHOTO_RESTORATION_CONFIG['name'],
-            description=config['description']
-        )
\ No newline at end of file
+
+        with gr.Row():
+            with gr.Column():
+                restore_input = gr.Image(type="pil", label="上传图片", sources=["upload", "clipboard"])
+                denoise_slider = gr.Slider(
+                    minimum=0.0,
+                    maximum=1.0,
+                    step=0.1,
+                    value=0.5,
+                    label="降噪强度"
+                )
+                sensitivity_slider = gr.Slider(
+                    minimum=0.0,
+                    maximum=1.0,
+                    step=0.1,
+                    value=0.5,
+                    label="划痕检测灵敏度"
+                )
+                restore_btn = gr.Button("🖼️ 开始修复", variant="primary")
+
+            with gr.Column():
+                restore_output = gr.Image(type="pil", label="处理结果")
+                restore_status = gr.Textbox(label="修复状态", interactive=False, lines=8)
+
+        gr.Markdown(config['description'])
+
+        restore_btn.click(
+            fn=processor.restore_photo,
+            inputs=[restore_input, denoise_slider, sensitivity_slider],
+            outputs=[restore_output, restore_status],
+            **event_options("ai")
+        )
+
+
+# 导出接口
+__all__ = ["PhotoRestorationProcessor", "create_photo_restoration_interface"]
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能分析模块
+按需对处理器调用进行采样分析，保存折叠栈（collapsed stack）文件，
+可直接导入 speedscope / flamegraph.pl 查看火焰图
+创建时间: 2025-06-19
+"""
+
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config import PROFILING_CONFIG
+
+
+class SamplingProfiler:
+    """采样式分析器：后台线程定期抓取目标线程的调用栈"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ","))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+
+def current_request() -> Any:
+    """当前Gradio事件的请求（处理函数线程中由Gradio设置；不在事件中时为None）"""
+    context = sys.modules.get("gradio.context")
+    if context is None:
+        return None
+    return context.LocalContext.request.get(None)
+
+
+def request_owner(request: Any) -> Optional[str]:
+    """分析结果的归属：登录用户按用户名，未登录时按页面会话"""
+    if request is None:
+        return None
+    username = getattr(request, "username", None)
+    if username:
+        return f"user:{username}"
+    session_hash = getattr(request, "session_hash", None)
+    return f"session:{session_hash}" if session_hash else None
+
+
+def describe_argument(value: Any) -> Any:
+    """提取参数的可记录信息（图像只记录尺寸和模式）"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if os.path.isfile(value):
+            return {"type": "file", "name": os.path.basename(value), "bytes": os.path.getsize(value)}
+        return value[:200]
+    size = getattr(value, "size", None)
+    if isinstance(size, tuple) and hasattr(value, "mode"):
+        return {"type": "image", "width": size[0], "height": size[1], "mode": value.mode}
+    return type(value).__name__
+
+
+class ProfileStore:
+    """分析结果存储：每次分析保存 .folded 栈文件和 .json 元数据"""
+
+    def __init__(self, output_dir: str, max_profiles: int = 50):
+        self.output_dir = output_dir
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, samples: Counter, metadata: Dict[str, Any]) -> str:
+        """写入分析结果并清理超出保留数量的旧文件，返回折叠栈文件路径"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        folded_path = os.path.join(self.output_dir, f"{profile_id}.folded")
+        metadata = {**metadata, "id": profile_id, "samples": sum(samples.values())}
+
+        with open(folded_path, "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.output_dir, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+        with self._lock:
+            self._prune()
+        return folded_path
+
+    def _prune(self):
+        profiles = sorted(name for name in os.listdir(self.output_dir) if name.endswith(".json"))
+        for name in profiles[:-self.max_profiles] if self.max_profiles > 0 else []:
+            profile_id = name[:-len(".json")]
+            for suffix in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.output_dir, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list_recent(self, limit: int = 20, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按时间倒序列出最近的分析结果；指定 owner 时只列出该归属的结果"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        profiles = sorted((name for name in os.listdir(self.output_dir) if name.endswith(".json")), reverse=True)
+        records = []
+        for name in profiles:
+            if len(records) >= limit:
+                break
+            try:
+                with open(os.path.join(self.output_dir, name), encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if owner is not None and record.get("owner") != owner:
+                continue
+            record["path"] = os.path.join(self.output_dir, f"{record['id']}.folded")
+            records.append(record)
+        return records
+
+
+class RequestProfiler:
+    """请求级分析开关与入口"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.enabled = config.get("enabled", False)
+        self.interval = config.get("interval", 0.005)
+        self.store = ProfileStore(config["output_dir"], config.get("max_profiles", 50))
+
+    def run(self, func: Callable, module_name: str, operation: str, args: tuple, kwargs: dict):
+        """在采样分析下执行处理函数"""
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        started_at = datetime.now().isoformat(timespec="seconds")
+        start = time.perf_counter()
+        profiler.start()
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            samples = profiler.stop()
+            self.store.save(samples, {
+                "owner": request_owner(current_request()),
+                "module": module_name,
+                "operation": operation,
+                "started_at": started_at,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                "interval_ms": self.interval * 1000,
+                "args": [describe_argument(arg) for arg in args],
+                "kwargs": {key: describe_argument(value) for key, value in kwargs.items()},
+                "error": error
+            })
+
+
+PROFILER = RequestProfiler(PROFILING_CONFIG)
+
+
+def profiled(func: Callable, module_name: str, operation: str,
+             profiler: RequestProfiler = PROFILER) -> Callable:
+    """包装处理函数：分析开启时在采样分析下执行"""
+    if inspect.isgeneratorfunction(func):
+        # 流式输出的各次迭代可能在不同线程执行，无法按单一线程采样，直接透传
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        return profiler.run(func, module_name, operation, args, kwargs)
+
+    return wrapper
+
+
+def create_profiling_interface():
+    """创建性能分析结果界面
+
+    分析开关影响所有用户，只能在启动时开启（launch(profile_requests=True) 或配置），界面上不提供；
+    未开启时不显示本标签页。每个用户只能看到和下载自己的请求产生的分析结果。
+    """
+    if not PROFILER.enabled:
+        return
+
+    import gradio as gr
+    from modules.queue_config import event_options
+
+    def list_profiles(request: gr.Request):
+        owner = request_owner(request)
+        if owner is None:
+            return [], None
+        records = PROFILER.store.list_recent(owner=owner)
+        rows = [
+            [r["id"], r["module"], r["operation"], r["duration_ms"], r["samples"],
+             json.dumps(r["args"], ensure_ascii=False), r.get("error") or ""]
+            for r in records
+        ]
+        files = [r["path"] for r in records if os.path.exists(r["path"])]
+        return rows, files or None
+
+    with gr.Tab("🔬 性能分析"):
+        gr.Markdown("""
+        ### 请求性能分析
+        本次启动已开启请求分析：图像工具和视频工具的每次处理都会在采样分析器下运行，并保存折叠栈文件。
+        列表只包含当前会话（登录后为当前用户）的处理产生的结果。
+        下载的 `.folded` 文件可直接拖入 [speedscope](https://www.speedscope.app) 查看火焰图。
+        """)
+
+        refresh_btn = gr.Button("🔄 刷新列表", variant="secondary")
+        profiles_table = gr.Dataframe(
+            headers=["ID", "模块", "操作", "耗时(ms)", "采样数", "参数", "错误"],
+            interactive=False
+        )
+        profile_files = gr.File(label="下载分析文件", file_count="multiple", interactive=False)
+
+        refresh_btn.click(fn=list_profiles, outputs=[profiles_table, profile_files], **event_options("html"))
+
+
+# 导出接口
+__all__ = [
+    "SamplingProfiler", "ProfileStore", "RequestProfiler", "current_request", "request_owner",
+    "PROFILER", "profiled", "create_profiling_interface"
+]
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+队列与并发配置模块
+按工具类别为Gradio事件提供并发上限和独立队列参数
+创建时间: 2025-06-19
+"""
+
+from typing import Any, Dict
+
+from config import QUEUE_CONFIG
+
+
+def event_options(category: str) -> Dict[str, Any]:
+    """获取某类事件的监听参数（传给 .click / .change 等）
+
+    配置了 queue=False 的类别直接绕过队列执行；
+    其余类别使用同一个 concurrency_id，共享该类别的并发上限。
+    """
+    settings = QUEUE_CONFIG["categories"][category]
+    if not settings.get("queue", True):
+        return {"queue": False}
+    return {
+        "concurrency_limit": settings["concurrency_limit"],
+        "concurrency_id": settings.get("concurrency_id", category)
+    }
+
+
+def total_concurrency() -> int:
+    """所有排队类别的并发上限之和，用于确定工作线程数"""
+    return sum(
+        settings["concurrency_limit"]
+        for settings in QUEUE_CONFIG["categories"].values()
+        if settings.get("queue", True)
+    )
+
+
+# 导出接口
+__all__ = ["event_options", "total_concurrency"]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求合并模块
+相同输入、相同参数的并发请求只执行一次计算，其余请求等待并共享结果
+创建时间: 2025-06-19
+"""
+
+import functools
+import threading
+from typing import Any, Callable, Dict
+
+from modules.content_hash import make_cache_key
+
+
+class _InFlightCall:
+    """一次正在执行的计算"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键去重的并发执行器"""
+
+    def __init__(self):
+        self._calls: Dict[str, _InFlightCall] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executions": 0, "coalesced": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """执行fn；若相同键的计算正在进行，则等待其完成并返回同一结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """当前正在执行的不同计算数"""
+        with self._lock:
+            return len(self._calls)
+
+
+SINGLE_FLIGHT = SingleFlight()
+
+
+def coalesced(method: Callable) -> Callable:
+    """处理器方法装饰器：合并相同内容、相同参数的并发调用"""
+    operation = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not args or args[0] is None:
+            return method(self, *args, **kwargs)
+        key = make_cache_key(operation, args, kwargs)
+        return SINGLE_FLIGHT.do(key, lambda: method(self, *args, **kwargs))
+
+    return wrapper
+
+
+# 导出接口
+__all__ = ["SingleFlight", "SINGLE_FLIGHT", "coalesced"]
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+处理结果缓存模块
+以输入内容哈希 + 操作名 + 参数为键的两级缓存（内存LRU + 磁盘）。
+缓存保存和返回的都是图像副本，调用方原地修改结果不会影响缓存
+创建时间: 2025-06-19
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import RESULT_CACHE_CONFIG
+from modules.content_hash import make_cache_key
+from modules.request_coalescing import SINGLE_FLIGHT
+
+
+def _image_nbytes(image) -> int:
+    return image.size[0] * image.size[1] * len(image.getbands())
+
+
+class ResultCache:
+    """两级结果缓存：内存LRU按条目数和字节数限制，磁盘按总大小淘汰最久未用的条目"""
+
+    def __init__(self, memory_items: int = 128, memory_bytes: int = 512 * 1024 ** 2,
+                 disk_dir: Optional[str] = None, disk_bytes: int = 2 * 1024 ** 3):
+        self.memory_items = memory_items
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+
+        self._memory: "OrderedDict[str, Tuple[Any, str, int]]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used: Optional[int] = None
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache-writer")
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0
+        }
+
+    def get(self, key: str) -> Optional[Tuple[Any, str]]:
+        """查询缓存（返回图像副本），命中磁盘时回填内存"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+        if entry is not None:
+            # 在锁外复制，大图复制不阻塞其他查询
+            return entry[0].copy(), entry[1]
+
+        loaded = self._load_from_disk(key)
+        with self._lock:
+            if loaded is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+        self._put_memory(key, loaded[0], loaded[1])
+        return loaded[0].copy(), loaded[1]
+
+    def put(self, key: str, image, status: str):
+        """写入内存，并在后台线程写入磁盘"""
+        # 保存副本：调用方之后修改自己的结果不影响缓存（复制时在当前线程完成延迟解码）
+        image = image.copy()
+        self._put_memory(key, image, status)
+        if self.disk_dir:
+            self._writer.submit(self._save_to_disk, key, image, status)
+
+    def _put_memory(self, key: str, image, status: str):
+        nbytes = _image_nbytes(image)
+        if nbytes > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_used -= self._memory.pop(key)[2]
+            self._memory[key] = (image, status, nbytes)
+            self._memory_used += nbytes
+            while self._memory and (len(self._memory) > self.memory_items or self._memory_used > self.memory_bytes):
+                _, (_, _, evicted_bytes) = self._memory.popitem(last=False)
+                self._memory_used -= evicted_bytes
+                self.stats["memory_evictions"] += 1
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        shard_dir = os.path.join(self.disk_dir, key[:2])
+        return os.path.join(shard_dir, f"{key}.png"), os.path.join(shard_dir, f"{key}.json")
+
+    def _load_from_disk(self, key: str) -> Optional[Tuple[Any, str]]:
+        if not self.disk_dir:
+            return None
+        from PIL import Image
+
+        image_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                status = json.load(f)["status"]
+            with Image.open(image_path) as cached:
+                image = cached.copy()
+            # 更新访问时间，淘汰时按最久未访问排序
+            os.utime(image_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return image, status
+
+    def _save_to_disk(self, key: str, image, status: str):
+        image_path, meta_path = self._paths(key)
+        try:
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            tmp_path = image_path + ".tmp"
+            image.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, image_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"status": status}, f, ensure_ascii=False)
+        except (OSError, ValueError):
+            # 某些色彩模式无法保存为PNG，只保留内存缓存
+            return
+
+        with self._disk_lock:
+            if self._disk_used is None:
+                self._disk_used = self._scan_disk_usage()
+            else:
+                self._disk_used += os.path.getsize(image_path) + os.path.getsize(meta_path)
+            if self._disk_used > self.disk_bytes:
+                self._evict_disk()
+
+    def _scan_disk_usage(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    def _evict_disk(self):
+        """删除最久未访问的条目，直到总大小降到上限的90%"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".png"):
+                    path = os.path.join(root, name)
+                    meta_path = path[:-len(".png")] + ".json"
+                    size = os.path.getsize(path) + (os.path.getsize(meta_path) if os.path.exists(meta_path) else 0)
+                    entries.append((os.path.getmtime(path), path, meta_path, size))
+        entries.sort()
+
+        target = self.disk_bytes * 0.9
+        for _, path, meta_path, size in entries:
+            if self._disk_used <= target:
+                break
+            for victim in (path, meta_path):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            self._disk_used -= size
+            self.stats["disk_evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计（命中、未命中、淘汰、占用）"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_used
+        stats["disk_bytes"] = self._disk_used or 0
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+RESULT_CACHE = ResultCache(
+    memory_items=RESULT_CACHE_CONFIG["memory_items"],
+    memory_bytes=RESULT_CACHE_CONFIG["memory_bytes"],
+    disk_dir=RESULT_CACHE_CONFIG["disk_dir"],
+    disk_bytes=RESULT_CACHE_CONFIG["disk_bytes"]
+)
+
+
+def cached_operation(method: Callable) -> Callable:
+    """处理器方法装饰器：结果为 (图像, 状态) 时按输入内容缓存"""
+    operation = method.__qualname__
+    signature = inspect.signature(method)
+    self_name, image_name = list(signature.parameters)[:2]
+
+    def compute_and_store(key: str, instance: Any, args: tuple, kwargs: Dict[str, Any]):
+        image, status = method(instance, *args, **kwargs)
+        if RESULT_CACHE_CONFIG["enabled"] and image is not None and not status.lstrip().startswith("❌"):
+            RESULT_CACHE.put(key, image, status)
+        return image, status
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # 按签名归一化参数（补全默认值），位置参数和关键字参数传入相同的值时缓存键相同
+        try:
+            bound = signature.bind(self, *args, **kwargs)
+        except TypeError:
+            return method(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        del arguments[self_name]
+        if arguments[image_name] is None:
+            return method(self, *args, **kwargs)
+
+        key = make_cache_key(operation, (), arguments)
+        cached = RESULT_CACHE.get(key) if RESULT_CACHE_CONFIG["enabled"] else None
+        if cached is not None:
+            image, status = cached
+            return image, f"{status}\n• 结果缓存：命中"
+
+        # 未命中时合并相同的并发请求，只有实际执行计算的请求写入缓存
+        return SINGLE_FLIGHT.do(key, lambda: compute_and_store(key, self, args, kwargs))
+
+    return wrapper
+
+
+# 导出接口
+__all__ = ["ResultCache", "RESULT_CACHE", "cached_operation"]
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态资源缓存模块
+页头页脚、说明文档、导航分类和自定义CSS等静态内容只在来源变化时渲染一次：
+结果按内容哈希写入带版本号的文件（同时预压缩gzip/brotli），清单记录来源指纹，
+重启或热重载时来源未变则直接读取。资源通过 /static-assets/ 路由提供，
+文件名含内容哈希，可设置一年的强缓存
+创建时间: 2025-06-19
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ASSET_ROUTE = "/static-assets"
+
+_CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".md": "text/markdown; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".json": "application/json; charset=utf-8"
+}
+
+# 预压缩格式：(Content-Encoding, 文件后缀)，按优先级排列
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _load_brotli():
+    """brotli为可选依赖，安装后额外生成 .br 预压缩文件"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def fingerprint(*parts: Any) -> str:
+    """来源指纹：任意可JSON序列化的参数和字节串的哈希"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(json.dumps(part, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def file_fingerprint(*paths: str) -> str:
+    """源代码文件内容的指纹（模板写在代码中时，代码变化即需重新渲染）"""
+    contents = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        except OSError:
+            contents.append(path.encode("utf-8"))
+    return fingerprint(*contents)
+
+
+class StaticAssetCache:
+    """带版本号的静态资源缓存"""
+
+    def __init__(self, cache_dir: str, compress_min_size: int = 512, gzip_level: int = 9, brotli_quality: int = 11):
+        self.cache_dir = cache_dir
+        self.compress_min_size = compress_min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+        self._manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._manifest: Optional[Dict[str, Dict[str, str]]] = None
+        self._contents: Dict[str, str] = {}
+        # 文件名 -> 资源名，路由只提供清单中的文件
+        self._files: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.stats = {"rendered": 0, "reused": 0}
+
+    def _load_manifest(self) -> Dict[str, Dict[str, str]]:
+        if self._manifest is None:
+            try:
+                with open(self._manifest_path, encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+            self._files = {entry["file"]: name for name, entry in self._manifest.items()}
+        return self._manifest
+
+    def _save_manifest(self):
+        tmp_path = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _write(self, filename: str, data: bytes):
+        path = os.path.join(self.cache_dir, filename)
+        if os.path.exists(path):
+            # 文件名含内容哈希，已存在即内容相同
+            return
+        variants = [(path, data)]
+        if len(data) >= self.compress_min_size:
+            variants.append((path + ".gz", gzip.compress(data, compresslevel=self.gzip_level, mtime=0)))
+            brotli = _load_brotli()
+            if brotli is not None:
+                variants.append((path + ".br", brotli.compress(data, quality=self.brotli_quality)))
+        # 压缩文件先写，原文件最后写入，原文件存在即表示全部写完
+        for variant_path, variant_data in reversed(variants):
+            tmp_path = f"{variant_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(variant_data)
+            os.replace(tmp_path, variant_path)
+
+    def get(self, name: str, source: str, render: Callable[[], str], suffix: str = ".html") -> Dict[str, str]:
+        """取得资源：来源指纹与清单一致时直接读取缓存文件，否则调用 render() 重新生成
+
+        返回 {"content", "hash", "file", "url"}。
+        """
+        with self._lock:
+            manifest = self._load_manifest()
+            entry = manifest.get(name)
+            if entry is not None and entry["source"] == source:
+                content = self._contents.get(name)
+                if content is None:
+                    try:
+                        with open(os.path.join(self.cache_dir, entry["file"]), encoding="utf-8") as f:
+                            content = f.read()
+                    except OSError:
+                        content = None
+                if content is not None:
+                    self._contents[name] = content
+                    self.stats["reused"] += 1
+                    return dict(entry, content=content, url=f"{ASSET_ROUTE}/{entry['file']}")
+
+            content = render()
+            data = content.encode("utf-8")
+            content_hash = hashlib.sha256(data).hexdigest()
+            filename = f"{name}.{content_hash[:16]}{suffix}"
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._write(filename, data)
+
+            if entry is not None:
+                self._files.pop(entry["file"], None)
+            entry = {"source": source, "hash": content_hash, "file": filename}
+            manifest[name] = entry
+            self._files[filename] = name
+            self._contents[name] = content
+            self._save_manifest()
+            self.stats["rendered"] += 1
+            return dict(entry, content=content, url=f"{ASSET_ROUTE}/{filename}")
+
+    def text(self, name: str, source: str, render: Callable[[], str], suffix: str = ".html") -> str:
+        """只取资源内容"""
+        return self.get(name, source, render, suffix)["content"]
+
+    def resolve(self, filename: str, accept_encoding: str = "") -> Optional[Tuple[str, str, Optional[str], str]]:
+        """路由查找：返回 (文件路径, Content-Type, Content-Encoding, ETag)，不是本缓存的文件时返回None"""
+        with self._lock:
+            self._load_manifest()
+            name = self._files.get(filename)
+            if name is None:
+                return None
+            content_hash = self._manifest[name]["hash"]
+        path = os.path.join(self.cache_dir, filename)
+        content_type = _CONTENT_TYPES.get(os.path.splitext(filename)[1], "application/octet-stream")
+        accepted = {token.split(";")[0].strip() for token in accept_encoding.lower().split(",")}
+        for encoding, extension in _ENCODINGS:
+            if encoding in accepted and os.path.exists(path + extension):
+                return path + extension, content_type, encoding, f'"{content_hash[:16]}-{encoding}"'
+        return path, content_type, None, f'"{content_hash[:16]}"'
+
+    def prune(self):
+        """删除清单中已不再引用的旧版本文件"""
+        with self._lock:
+            current = {entry["file"] for entry in self._load_manifest().values()}
+            if not os.path.isdir(self.cache_dir):
+                return
+            for filename in os.listdir(self.cache_dir):
+                base = filename
+                for _, extension in _ENCODINGS:
+                    if base.endswith(extension):
+                        base = base[:-len(extension)]
+                        break
+                if base != "manifest.json" and base not in current:
+                    try:
+                        os.remove(os.path.join(self.cache_dir, filename))
+                    except OSError:
+                        pass
+
+
+def create_asset_routes(cache: StaticAssetCache) -> List[Any]:
+    """创建 /static-assets/{文件名} 路由：一年强缓存、按Accept-Encoding返回预压缩文件、支持ETag/304"""
+    from starlette.responses import FileResponse, Response
+    from starlette.routing import Route
+
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "Vary": "Accept-Encoding"}
+
+    async def asset_endpoint(request):
+        resolved = cache.resolve(request.path_params["filename"], request.headers.get("accept-encoding", ""))
+        if resolved is None:
+            return Response(status_code=404)
+        path, content_type, encoding, etag = resolved
+        response_headers = dict(headers, ETag=etag)
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=response_headers)
+        if encoding:
+            response_headers["Content-Encoding"] = encoding
+        return FileResponse(path, media_type=content_type, headers=response_headers)
+
+    return [Route(ASSET_ROUTE + "/{filename}", asset_endpoint, methods=["GET", "HEAD"])]
+
+
+_cache: Optional[StaticAssetCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache(**options) -> StaticAssetCache:
+    """获取进程内共享的静态资源缓存（参数只在首次创建时生效）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = StaticAssetCache(**options)
+        return _cache
+
+
+# 导出接口
+__all__ = [
+    "ASSET_ROUTE", "fingerprint", "file_fingerprint", "StaticAssetCache",
+    "create_asset_routes", "get_asset_cache"
+]
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+系统状态采样模块
+后台线程按固定周期采集系统资源，状态面板直接读取最新快照
+创建时间: 2025-06-19
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from config import SYSTEM_MONITOR_CONFIG
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class SystemStatusSampler:
+    """后台系统状态采样器（环形缓冲区保存最近的快照）"""
+
+    def __init__(self, interval: float = 2.0, history_size: int = 60, disk_path: str = "/"):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process = None
+
+    def start(self):
+        """启动采样线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="system-status-sampler",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """停止采样线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception:
+                # 单次采样失败不影响后续采样
+                pass
+            self._stop_event.wait(self.interval)
+
+    def sample(self) -> Dict[str, Any]:
+        """采集一次快照并写入环形缓冲区"""
+        import psutil
+
+        if self._process is None:
+            self._process = psutil.Process(os.getpid())
+            # 首次调用只建立基准，返回值无意义
+            psutil.cpu_percent(interval=None)
+            self._process.cpu_percent(interval=None)
+
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+
+        with self._process.oneshot():
+            rss = self._process.memory_info().rss
+            process_cpu = self._process.cpu_percent(interval=None)
+            num_threads = self._process.num_threads()
+            try:
+                open_files = len(self._process.open_files())
+            except (psutil.AccessDenied, OSError):
+                open_files = -1
+
+        snapshot = {
+            "timestamp": time.time(),
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": memory.percent,
+            "memory_used": memory.used,
+            "memory_total": memory.total,
+            "disk_percent": disk.percent,
+            "disk_used": disk.used,
+            "disk_total": disk.total,
+            "process_rss": rss,
+            "process_cpu_percent": process_cpu,
+            "process_threads": num_threads,
+            "process_open_files": open_files
+        }
+
+        with self._lock:
+            self.history.append(snapshot)
+        return snapshot
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """获取最新快照，尚无数据时返回None"""
+        with self._lock:
+            return self.history[-1] if self.history else None
+
+    def series(self, field: str) -> List[float]:
+        """获取某一指标的历史序列"""
+        with self._lock:
+            return [snapshot[field] for snapshot in self.history]
+
+
+def render_sparkline(values: List[float], maximum: Optional[float] = None) -> str:
+    """将数值序列渲染为字符迷你走势图"""
+    if not values:
+        return ""
+    top = maximum if maximum is not None else max(values)
+    if top <= 0:
+        return SPARK_CHARS[0] * len(values)
+    last = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[min(last, max(0, int(value / top * last)))] for value in values)
+
+
+_sampler: Optional[SystemStatusSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_system_sampler() -> SystemStatusSampler:
+    """获取进程内共享的采样器，首次调用时启动采样线程"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = SystemStatusSampler(
+                interval=SYSTEM_MONITOR_CONFIG["interval"],
+                history_size=SYSTEM_MONITOR_CONFIG["history_size"],
+                disk_path=SYSTEM_MONITOR_CONFIG["disk_path"]
+            )
+            _sampler.start()
+        return _sampler
+
+
+# 导出接口
+__all__ = ["SystemStatusSampler", "render_sparkline", "get_system_sampler"]
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块推理模块
+将大图切分为带重叠的等尺寸图块，按批次处理后加权融合回整图。
+浮点融合缓冲只保留一行图块（内存与 图块高度 x 图像宽度 成正比），完成的行立即写入uint8输出图像，
+因此大尺寸扫描件除输入和输出图像本身外，不再需要整图大小的浮点数组
+创建时间: 2025-06-19
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from modules.module_loader import lazy_import
+
+np = lazy_import("numpy")
+
+
+def tile_origins(length: int, tile: int, overlap: int) -> List[int]:
+    """计算一个维度上各图块的起点（最后一块贴齐边缘）"""
+    if length <= tile:
+        return [0]
+    step = max(1, tile - overlap)
+    origins = list(range(0, length - tile, step))
+    origins.append(length - tile)
+    return origins
+
+
+def iter_tiles(height: int, width: int, tile: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """按行优先顺序遍历图块左上角坐标 (y, x)"""
+    for y in tile_origins(height, tile, overlap):
+        for x in tile_origins(width, tile, overlap):
+            yield y, x
+
+
+def blend_window(tile: int, overlap: int):
+    """重叠区域线性过渡的二维权重窗口（中心为1，边缘渐变但始终大于0）"""
+    window = np.ones(tile, dtype=np.float32)
+    if overlap > 0:
+        ramp = np.linspace(1.0 / (overlap + 1), 1.0, overlap, endpoint=False, dtype=np.float32)
+        window[:overlap] = ramp
+        window[-overlap:] = ramp[::-1]
+    return np.outer(window, window)[:, :, None]
+
+
+def pad_to_tile(array, tile: int):
+    """图像小于图块尺寸时镜像填充，保证所有图块尺寸一致便于批处理"""
+    height, width = array.shape[:2]
+    pad_h = max(0, tile - height)
+    pad_w = max(0, tile - width)
+    if pad_h == 0 and pad_w == 0:
+        return array
+    return np.pad(array, ((0, pad_h), (0, pad_w), (0, 0)), mode="symmetric")
+
+
+def run_tiled(image, process_batch: Callable, tile: int = 512, overlap: int = 32,
+              scale: int = 1, batch_size: int = 4):
+    """按行分块处理并融合，返回输出PIL图像
+
+    Args:
+        image: 输入PIL图像（RGB等8位模式）
+        process_batch: 输入 NxTxTxC float32（0~1）图块批次，返回 Nx(T*scale)x(T*scale)xC 结果
+        tile: 图块边长
+        overlap: 相邻图块重叠像素数
+        scale: 输出相对输入的放大倍数
+        batch_size: 每批图块数（批次不跨图块行）
+    """
+    from PIL import Image
+
+    image.load()
+    width, height = image.size
+    padded_w, padded_h = max(width, tile), max(height, tile)
+    out_tile = tile * scale
+    band_w = padded_w * scale
+    output = Image.new(image.mode, (width * scale, height * scale))
+    window = blend_window(out_tile, overlap * scale)
+
+    def finish(top: int, values, weights):
+        """融合完成的行写入输出图像（裁掉填充部分）"""
+        rows = min(len(values), height * scale - top)
+        if rows <= 0:
+            return
+        pixels = values[:rows, :width * scale] / weights[:rows, :width * scale]
+        pixels = (np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+        output.paste(Image.fromarray(pixels.squeeze(axis=2) if pixels.shape[2] == 1 else pixels), (0, top))
+
+    carry = None
+    for y in tile_origins(padded_h, tile, overlap):
+        top = y * scale
+        values = weights = None
+        if carry is not None:
+            # 上一行图块中位于本行起点之前的部分不会再被覆盖，写入输出；重叠部分移入本行缓冲
+            carry_top, carry_values, carry_weights = carry
+            carry = None
+            finish(carry_top, carry_values[:top - carry_top], carry_weights[:top - carry_top])
+            shared = carry_top + out_tile - top
+            values = np.zeros((out_tile,) + carry_values.shape[1:], dtype=np.float32)
+            weights = np.zeros((out_tile, band_w, 1), dtype=np.float32)
+            values[:shared] = carry_values[top - carry_top:]
+            weights[:shared] = carry_weights[top - carry_top:]
+            del carry_values, carry_weights
+
+        batch, origins = [], []
+        row_origins = tile_origins(padded_w, tile, overlap)
+        for index, x in enumerate(row_origins):
+            crop = image.crop((x, y, min(x + tile, width), min(y + tile, height)))
+            array = np.asarray(crop, dtype=np.float32) / 255.0
+            batch.append(pad_to_tile(array if array.ndim == 3 else array[:, :, None], tile))
+            origins.append(x)
+            if len(batch) >= batch_size or index == len(row_origins) - 1:
+                results = process_batch(np.stack(batch))
+                if values is None:
+                    values = np.zeros((out_tile, band_w, results.shape[3]), dtype=np.float32)
+                    weights = np.zeros((out_tile, band_w, 1), dtype=np.float32)
+                for ox, result in zip(origins, results):
+                    ox *= scale
+                    values[:, ox:ox + out_tile] += result * window
+                    weights[:, ox:ox + out_tile] += window
+                batch, origins = [], []
+        carry = (top, values, weights)
+
+    finish(*carry)
+    return output
+
+
+def iter_context_tiles(width: int, height: int, tile: int, margin: int) -> Iterator[Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]]:
+    """将图像划分为互不重叠的核心区域，并为每块附加上下文边距
+
+    返回 (核心区域, 含边距区域)，均为 (left, top, right, bottom)。
+    处理时使用含边距区域，只写回核心区域，因此无需融合权重和浮点累加缓冲。
+    """
+    for top in range(0, height, tile):
+        for left in range(0, width, tile):
+            core = (left, top, min(left + tile, width), min(top + tile, height))
+            context = (
+                max(0, core[0] - margin),
+                max(0, core[1] - margin),
+                min(width, core[2] + margin),
+                min(height, core[3] + margin)
+            )
+            yield core, context
+
+
+def run_tiled_into(image, process_tile: Callable, scale: int, tile: int = 256, margin: int = 16,
+                   workers: Optional[int] = None):
+    """多线程分块处理，结果直接写入预先分配的输出图像
+
+    Args:
+        image: 输入PIL图像
+        process_tile: 输入PIL图块，返回尺寸放大 scale 倍的PIL图块
+        scale: 放大倍数
+        tile: 核心区域边长
+        margin: 上下文边距（应覆盖算法的感受野，避免接缝）
+        workers: 线程数（PIL和ONNX Runtime计算时均释放GIL）
+    """
+    from PIL import Image
+
+    # 先在当前线程完成解码，工作线程只做只读裁剪
+    image.load()
+    width, height = image.size
+    output = Image.new(image.mode, (width * scale, height * scale))
+
+    def handle(tiles):
+        core, context = tiles
+        result = process_tile(image.crop(context))
+        offset_x = (core[0] - context[0]) * scale
+        offset_y = (core[1] - context[1]) * scale
+        core_w = (core[2] - core[0]) * scale
+        core_h = (core[3] - core[1]) * scale
+        output.paste(
+            result.crop((offset_x, offset_y, offset_x + core_w, offset_y + core_h)),
+            (core[0] * scale, core[1] * scale)
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 消费迭代结果以便传播异常
+        for _ in executor.map(handle, iter_context_tiles(width, height, tile, margin)):
+            pass
+    return output
+
+
+# 导出接口
+__all__ = [
+    "tile_origins", "iter_tiles", "blend_window", "pad_to_tile", "run_tiled",
+    "iter_context_tiles", "run_tiled_into"
+]
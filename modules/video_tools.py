@@ -6,11 +6,13 @@
 创建时间: 2025-06-19
 """
 
-import gradio as gr
 import os
 import tempfile
 import time
 from typing import Optional, Tuple
+from modules.metrics import instrument_processor
+from modules.queue_config import event_options
+from modules.request_coalescing import coalesced
 
 class VideoToolProcessor:
     """视频工具处理器"""
@@ -19,6 +21,7 @@ class VideoToolProcessor:
         self.name = "视频工具"
         self.description = "视频处理和编辑功能"
         
+    @coalesced
     def convert_video_format(self, video_file, target_format: str) -> Tuple[Optional[str], str]:
         """视频格式转换"""
         if video_file is None:
@@ -49,6 +52,7 @@ class VideoToolProcessor:
         except Exception as e:
             return None, f"❌ 转换失败: {str(e)}"
     
+    @coalesced
     def compress_video(self, video_file, quality: str) -> Tuple[Optional[str], str]:
         """视频压缩"""
         if video_file is None:
@@ -92,6 +96,7 @@ class VideoToolProcessor:
         except Exception as e:
             return None, f"❌ 压缩失败: {str(e)}"
     
+    @coalesced
     def trim_video(self, video_file, start_time: int, end_time: int) -> Tuple[Optional[str], str]:
         """视频剪辑"""
         if video_file is None:
@@ -125,6 +130,7 @@ class VideoToolProcessor:
         except Exception as e:
             return None, f"❌ 剪辑失败: {str(e)}"
     
+    @coalesced
     def add_watermark(self, video_file, watermark_text: str, position: str) -> Tuple[Optional[str], str]:
         """添加水印"""
         if video_file is None:
@@ -167,6 +173,7 @@ class VideoToolProcessor:
         except Exception as e:
             return None, f"❌ 添加水印失败: {str(e)}"
     
+    @coalesced
     def extract_audio(self, video_file) -> Tuple[Optional[str], str]:
         """提取音频"""
         if video_file is None:
@@ -200,7 +207,10 @@ class VideoToolProcessor:
 
 def create_video_tools_interface():
     """创建视频工具界面"""
-    processor = VideoToolProcessor()
+    # gradio只在构建界面时导入，命令行批处理只需处理器
+    import gradio as gr
+    
+    processor = instrument_processor(VideoToolProcessor(), "video_tools")
     
     with gr.Tab("🎬 视频工具"):
         gr.Markdown("""
@@ -251,7 +261,8 @@ def create_video_tools_interface():
                         convert_btn.click(
                             fn=processor.convert_video_format,
                             inputs=[convert_input, target_format],
-                            outputs=[convert_output, convert_status]
+                            outputs=[convert_output, convert_status],
+                            **event_options("video")
                         )
                     
                     # 视频压缩
@@ -291,7 +302,8 @@ def create_video_tools_interface():
                         compress_btn.click(
                             fn=processor.compress_video,
                             inputs=[compress_input, quality_choice],
-                            outputs=[compress_output, compress_status]
+                            outputs=[compress_output, compress_status],
+                            **event_options("video")
                         )
             
             # 视频编辑
@@ -341,7 +353,8 @@ def create_video_tools_interface():
                         trim_btn.click(
                             fn=processor.trim_video,
                             inputs=[trim_input, start_time, end_time],
-                            outputs=[trim_output, trim_status]
+                            outputs=[trim_output, trim_status],
+                            **event_options("video")
                         )
                     
                     # 添加水印
@@ -380,7 +393,8 @@ def create_video_tools_interface():
                         watermark_btn.click(
                             fn=processor.add_watermark,
                             inputs=[watermark_input, watermark_text, watermark_position],
-                            outputs=[watermark_output, watermark_status]
+                            outputs=[watermark_output, watermark_status],
+                            **event_options("video")
                         )
             
             # 音频处理
@@ -416,7 +430,8 @@ def create_video_tools_interface():
                 extract_btn.click(
                     fn=processor.extract_audio,
                     inputs=[audio_input],
-                    outputs=[audio_output, extract_status]
+                    outputs=[audio_output, extract_status],
+                    **event_options("video")
                 )
         
         # 使用说明